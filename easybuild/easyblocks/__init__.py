@@ -32,6 +32,7 @@ easybuild.easyblocks package declaration
 @author: Jens Timmerman (Ghent University)
 """
 import os
+import sys
 from pkgutil import extend_path
 
 # note: release candidates should be versioned as a pre-release, e.g. "1.1rc1"
@@ -46,45 +47,125 @@ VERSION = '5.3.2.dev0'
 UNKNOWN = 'UNKNOWN'
 
 
+def _read_git_ref(git_dir, ref):
+    """Read commit ID for specified ref (e.g. refs/heads/main) from specified .git directory (or return None)."""
+    ref_path = os.path.join(git_dir, *ref.split('/'))
+    if os.path.isfile(ref_path):
+        with open(ref_path) as fh:
+            return fh.read().strip()
+
+    packed_refs_path = os.path.join(git_dir, 'packed-refs')
+    if os.path.isfile(packed_refs_path):
+        with open(packed_refs_path) as fh:
+            for line in fh:
+                parts = line.split()
+                if len(parts) == 2 and parts[1] == ref:
+                    return parts[0]
+    return None
+
+
 def get_git_revision():
     """
     Returns the git revision (e.g. aab4afc016b742c6d4b157427e192942d0e131fe),
     or UNKNOWN is getting the git revision fails
 
-    relies on GitPython (see http://gitorious.org/git-python)
+    git metadata is read directly, so no git command needs to be run (and GitPython is not required)
     """
+    # find .git in (parent directories of) location of this module, like git does
+    path = os.path.dirname(os.path.abspath(__file__))
+    git_dir = None
+    while git_dir is None:
+        candidate = os.path.join(path, '.git')
+        if os.path.exists(candidate):
+            git_dir = candidate
+        else:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return UNKNOWN
+            path = parent
+
     try:
-        from git import Git, GitCommandError
-    except ImportError:
-        return UNKNOWN
-    try:
-        path = os.path.dirname(__file__)
-        gitrepo = Git(path)
-        res = gitrepo.rev_list('-n', '1', 'HEAD').splitlines()[0]
-        # 'encode' may be required to make sure a regular string is returned rather than a unicode string
-        # (only needed in Python 2; in Python 3, regular strings are already unicode)
-        if not isinstance(res, str):
-            res = res.encode('ascii')
-    except GitCommandError:
-        res = UNKNOWN
-
-    return res
-
-
-git_rev = get_git_revision()
-if git_rev == UNKNOWN:
-    VERBOSE_VERSION = VERSION
+        # .git may be a file that points to actual git directory (for worktrees, submodules)
+        if os.path.isfile(git_dir):
+            with open(git_dir) as fh:
+                txt = fh.read().strip()
+            if not txt.startswith('gitdir:'):
+                return UNKNOWN
+            git_dir = os.path.join(path, txt[len('gitdir:'):].strip())
+
+        with open(os.path.join(git_dir, 'HEAD')) as fh:
+            head = fh.read().strip()
+
+        if head.startswith('ref:'):
+            ref = head[len('ref:'):].strip()
+            res = _read_git_ref(git_dir, ref)
+            # refs are stored in common directory for worktrees
+            commondir_path = os.path.join(git_dir, 'commondir')
+            if res is None and os.path.isfile(commondir_path):
+                with open(commondir_path) as fh:
+                    res = _read_git_ref(os.path.join(git_dir, fh.read().strip()), ref)
+        else:
+            # detached HEAD
+            res = head
+    except (IOError, OSError):
+        res = None
+
+    return res or UNKNOWN
+
+
+def _det_verbose_version():
+    """Determine verbose version, which includes git revision (if available)."""
+    git_rev = get_git_revision()
+    if git_rev == UNKNOWN:
+        return VERSION
+    else:
+        return "%s-r%s" % (VERSION, git_rev)
+
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        """
+        Lazily determine VERBOSE_VERSION on first access,
+        to avoid that the cost of determining the git revision is paid every time easyblocks are imported.
+        """
+        if name == 'VERBOSE_VERSION':
+            verbose_version = _det_verbose_version()
+            globals()['VERBOSE_VERSION'] = verbose_version
+            return verbose_version
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
 else:
-    VERBOSE_VERSION = "%s-r%s" % (VERSION, git_rev)
+    # lazy module attributes require Python 3.7 or newer (PEP 562)
+    VERBOSE_VERSION = _det_verbose_version()
 
-# extend path so python finds our easyblocks in the subdirectories where they are located
-subdirs = [chr(x) for x in range(ord('a'), ord('z') + 1)] + ['0']
-for subdir in subdirs:
-    __path__ = extend_path(__path__, '%s.%s' % (__name__, subdir))
 
-del subdir, subdirs, git_rev
-if 'x' in dir():
-    del x
+def _det_subdir_paths(paths):
+    """
+    Determine paths to subdirectories in which easyblocks are located, for specified easybuild/easyblocks paths;
+    this is equivalent to calling extend_path for each subdirectory,
+    but only requires scanning each easybuild/easyblocks directory once.
+    """
+    subdirs = [chr(x) for x in range(ord('a'), ord('z') + 1)] + ['0']
+
+    existing_subdirs = {}
+    for path in paths:
+        try:
+            with os.scandir(path) as entries:
+                existing_subdirs[path] = {e.name for e in entries if e.name in subdirs and e.is_dir()}
+        except OSError:
+            existing_subdirs[path] = set()
+
+    subdir_paths = []
+    for subdir in subdirs:
+        for path in paths:
+            subdir_path = os.path.join(path, subdir)
+            if subdir in existing_subdirs[path] and subdir_path not in paths + subdir_paths:
+                subdir_paths.append(subdir_path)
+
+    return subdir_paths
+
+
+# extend path so python finds our easyblocks in the subdirectories where they are located
+__path__ = __path__ + _det_subdir_paths(__path__)
 
 # let python know this is not the only place to look for easyblocks, so we can have multiple
 # easybuild/easyblocks paths in the Python search path, next to the official easyblocks distribution
@@ -43,19 +43,61 @@ import fileinput
 import glob
 import os
 import re
+import shutil
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 import easybuild.tools.toolchain as toolchain
 from easybuild.framework.easyblock import EasyBlock
 from easybuild.framework.easyconfig import CUSTOM
 from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.config import ERROR
-from easybuild.tools.filetools import apply_regex_substitutions, read_file, symlink, which, write_file
+from easybuild.tools.filetools import apply_regex_substitutions, mkdir, read_file, symlink, which, write_file
 from easybuild.tools.modules import get_software_root, get_software_version
 from easybuild.tools.run import run_shell_cmd
 from easybuild.tools.systemtools import AARCH64, POWER, RISCV64, UNKNOWN
 from easybuild.tools.systemtools import get_cpu_architecture, get_glibc_version, get_shared_lib_ext
 
+# extensions of header files that are installed by b2
+BOOST_HEADER_EXTENSIONS = ('.h', '.hpp', '.inc', '.ipp')
+
+
+def _link_or_copy_file(paths):
+    """Hardlink specified file to target location, or copy it (retaining timestamps) if that's not possible."""
+    src, target = paths
+    try:
+        if os.path.exists(target):
+            os.remove(target)
+        os.link(src, target)
+    except OSError:
+        shutil.copy2(src, target)
+
+
+def stage_headers(src_dir, target_dir, extensions=BOOST_HEADER_EXTENSIONS, max_workers=None):
+    """
+    Stage header files in specified source directory (recursively) in target directory, concurrently:
+    files are hardlinked if possible (if both directories are on the same filesystem), or copied otherwise.
+    Since timestamps are retained, b2 considers the staged headers to be up-to-date when installing.
+
+    :return: number of header files that were staged
+    """
+    file_pairs = []
+    for dirpath, _, filenames in os.walk(src_dir):
+        target_subdir = os.path.join(target_dir, os.path.relpath(dirpath, src_dir))
+        headers = [fn for fn in filenames if fn.endswith(extensions)]
+        if headers:
+            mkdir(target_subdir, parents=True)
+            file_pairs.extend((os.path.join(dirpath, fn), os.path.join(target_subdir, fn)) for fn in headers)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as thread_pool:
+            # consume results, to ensure errors are raised
+            list(thread_pool.map(_link_or_copy_file, file_pairs))
+    except (IOError, OSError, shutil.Error) as err:
+        raise EasyBuildError("Failed to stage headers from %s in %s: %s", src_dir, target_dir, err)
+
+    return len(file_pairs)
+
 
 class EB_Boost(EasyBlock):
     """Support for building Boost."""
@@ -277,29 +319,29 @@ class EB_Boost(EasyBlock):
             # Note: Can't use both --with-* and --without-*
             self.bjamoptions += " --without-mpi"
 
-        self.log.info("Building Boost libraries")
-        # build with specified options
-        cmd = ' '.join([
-            self.cfg['prebuildopts'],
-            os.path.join('.', self.bjamcmd),
-            self.bjamoptions,
-            self.paracmd,
-            self.cfg['buildopts'],
-        ])
-        run_shell_cmd(cmd)
+        # libraries are built and installed in a single b2 run in install step,
+        # to avoid that b2 has to scan the whole dependency graph twice
+        self.log.info("Boost libraries will be built and installed with: %s %s", self.bjamcmd, self.bjamoptions)
 
     def install_step(self):
-        """Install Boost by copying files to install dir."""
+        """Build and install Boost libraries with a single b2 run, after staging headers in install dir."""
 
-        # install boost libraries
-        self.log.info("Installing Boost libraries")
+        # stage headers in installation directory concurrently (hardlinked if possible),
+        # rather than letting b2 copy them one by one
+        if os.path.isdir('boost'):
+            cnt = stage_headers('boost', os.path.join(self.installdir, 'include', 'boost'),
+                                max_workers=self.cfg.parallel)
+            self.log.info("Staged %d Boost headers in installation directory", cnt)
 
+        self.log.info("Building and installing Boost libraries")
         cmd = ' '.join([
+            self.cfg['prebuildopts'],
             self.cfg['preinstallopts'],
             os.path.join('.', self.bjamcmd),
             self.bjamoptions,
             'install',
             self.paracmd,
+            self.cfg['buildopts'],
             self.cfg['installopts'],
         ])
         run_shell_cmd(cmd)
@@ -0,0 +1,49 @@
+##
+# Copyright 2009-2026 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://www.vscentrum.be),
+# Flemish Research Foundation (FWO) (http://www.fwo.be/en)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# https://github.com/easybuilders/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Determining the order in which to build items (like components or libraries) that depend on each other,
+such that items that do not depend on each other can be built concurrently.
+"""
+from easybuild.tools.build_log import EasyBuildError
+
+
+def det_build_order_levels(deps):
+    """
+    Determine order in which to build items with specified dependencies (dict with list of dependencies per item):
+    returns list of lists of items, where the items in each list only depend on items in earlier lists
+    (so they can be built concurrently)
+    """
+    levels = []
+    done = set()
+    todo = sorted(deps)
+    while todo:
+        level = [item for item in todo if all(dep in done or dep not in deps for dep in deps[item])]
+        if not level:
+            raise EasyBuildError("Circular dependencies found between %s", ', '.join(todo))
+        levels.append(level)
+        done.update(level)
+        todo = [item for item in todo if item not in done]
+
+    return levels
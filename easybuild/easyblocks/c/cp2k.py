@@ -39,6 +39,7 @@ EasyBuild support for building and installing CP2K, implemented as an easyblock
 
 import fileinput
 import glob
+import json
 import re
 import os
 import sys
@@ -50,11 +51,79 @@ from easybuild.framework.easyconfig import CUSTOM
 from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.environment import setvar
 from easybuild.tools.filetools import change_dir, copy_dir, copy_file, mkdir, write_file
-from easybuild.tools.config import build_option
+from easybuild.tools.config import build_option, log_path
 from easybuild.tools.modules import get_software_root, get_software_version
 from easybuild.tools.run import run_shell_cmd
 from easybuild.tools.systemtools import get_avail_core_count
 
+# possible outcomes of a test in the CP2K regression test suite
+REGTEST_STATUSES = ['OK', 'WRONG RESULT', 'WRONG', 'FAILED START', 'FAILED', 'RUNTIME FAIL', 'TIMED OUT', 'KILLED',
+                    'NEW']
+
+# name of file with outcome and timing of individual regression tests, written next to the logs in installation dir
+REGTEST_RESULTS_FILE = 'cp2k-regtest-results.json'
+
+
+def det_regtest_layout(cores, openmp=False, ompthreads=None):
+    """
+    Determine layout for running CP2K regression tests on the specified number of cores.
+
+    Each test is run with 4 cores if possible (some tests require/prefer square (n^2) numbers or powers of 2 (2^n)
+    of MPI ranks), using 2 MPI ranks x 2 OpenMP threads for OpenMP-enabled builds; multiple tests are run
+    concurrently to use all cores.
+
+    :param cores: number of cores available for running tests
+    :param openmp: whether CP2K was built with OpenMP support (psmp)
+    :param ompthreads: fixed number of OpenMP threads per MPI rank (e.g. as specified via omp_num_threads)
+    :return: tuple with number of MPI ranks and OpenMP threads per test, and maxtasks (total number of cores to use)
+    """
+    if ompthreads:
+        ompthreads = max(1, min(int(ompthreads), cores))
+    elif openmp and min(cores, 4) >= 2:
+        ompthreads = 2
+    else:
+        ompthreads = 1
+    mpiranks = max(1, min(cores, 4) // ompthreads)
+    cores_per_test = mpiranks * ompthreads
+    maxtasks = (cores // cores_per_test) * cores_per_test
+
+    return mpiranks, ompthreads, maxtasks
+
+
+def parse_regtest_output(txt):
+    """
+    Parse output of CP2K regression test, to determine outcome and timing of each individual test.
+
+    :param txt: output of CP2K regression test
+    :return: dict with test (<test directory>/<input file>) as key and dict with 'status' and 'time' (or None) as value
+    """
+    results = {}
+
+    test_dir_regex = re.compile(r'^\s*>>>\s+(?P<dir>\S+)')
+    status_pattern = '|'.join(re.escape(x) for x in REGTEST_STATUSES)
+    test_regex = re.compile(r'^\s+(?P<input>\S+\.inp)\s.*?\s(?P<status>%s)\b(?:.*?\(\s*(?P<time>[0-9.]+)\s+sec\))?'
+                            % status_pattern)
+
+    test_dir = None
+    for line in txt.splitlines():
+        res = test_dir_regex.match(line)
+        if res:
+            test_dir = res.group('dir')
+            # only retain relative path to test directory (e.g. QS/regtest-gpw-1)
+            test_dir = re.sub(r'^.*/(tests|TEST-[^/]+)/', '', test_dir)
+            continue
+
+        res = test_regex.match(line)
+        if res:
+            name = res.group('input') if test_dir is None else '%s/%s' % (test_dir, res.group('input'))
+            time = res.group('time')
+            results[name] = {
+                'status': res.group('status'),
+                'time': float(time) if time else None,
+            }
+
+    return results
+
 
 class EB_CP2K(EasyBlock):
     """
@@ -71,6 +140,9 @@ class EB_CP2K(EasyBlock):
 
         self.typearch = None
 
+        # outcome and timing of individual regression tests, see parse_regtest_output
+        self.regtest_results = None
+
         # this should be set to False for old versions of GCC (e.g. v4.1)
         self.compilerISO_C_BINDING = True
 
@@ -101,6 +173,9 @@ class EB_CP2K(EasyBlock):
             'runtest': [True, "Build and run CP2K tests", CUSTOM],
             'omp_num_threads': [None, "Value to set $OMP_NUM_THREADS to during testing", CUSTOM],
             'plumed': [None, "Enable PLUMED support", CUSTOM],
+            'regtest_use_all_cores': [False, "Use all available cores for regression test: run multiple tests "
+                                             "concurrently, with MPI ranks x OpenMP threads per test and maxtasks "
+                                             "determined based on available cores", CUSTOM],
             'type': ['popt', "Type of build ('popt' or 'psmp')", CUSTOM],
             'typeopt': [True, "Enable optimization", CUSTOM],
         }
@@ -713,7 +788,7 @@ class EB_CP2K(EasyBlock):
                 return
 
             if self.cfg['omp_num_threads']:
-                setvar('OMP_NUM_THREADS', self.cfg['omp_num_threads'])
+                setvar('OMP_NUM_THREADS', str(self.cfg['omp_num_threads']))
 
             # change to root of build dir
             change_dir(self.builddir)
@@ -755,12 +830,27 @@ class EB_CP2K(EasyBlock):
             else:
                 self.log.info("No reference output found for regression test, just continuing without it...")
 
-            # prefer using 4 cores, since some tests require/prefer square (n^2) numbers or powers of 2 (2^n)
-            test_core_cnt = min(self.cfg.parallel, 4)
-            if get_avail_core_count() < test_core_cnt:
-                raise EasyBuildError("Cannot run MPI tests as not enough cores (< %s) are available", test_core_cnt)
+            if self.cfg['regtest_use_all_cores']:
+                avail_cores = min(self.cfg.parallel, get_avail_core_count())
+                openmp = self.cfg['type'] == 'psmp'
+                # take into account number of OpenMP threads specified via omp_num_threads (if any)
+                fixed_ompthreads = self.cfg['omp_num_threads'] if openmp else None
+                # number of MPI ranks to use per test
+                test_core_cnt, ompthreads, maxtasks = det_regtest_layout(avail_cores, openmp=openmp,
+                                                                         ompthreads=fixed_ompthreads)
+                if openmp:
+                    setvar('OMP_NUM_THREADS', str(ompthreads))
+                self.log.info("Running regression test using %s MPI ranks x %s OpenMP threads per test, "
+                              "using %s cores in total", test_core_cnt, ompthreads, maxtasks)
             else:
-                self.log.info("Using %s cores for the MPI tests" % test_core_cnt)
+                # prefer using 4 cores, since some tests require/prefer square (n^2) numbers or powers of 2 (2^n)
+                test_core_cnt = min(self.cfg.parallel, 4)
+                maxtasks = self.cfg['maxtasks']
+                if get_avail_core_count() < test_core_cnt:
+                    raise EasyBuildError("Cannot run MPI tests as not enough cores (< %s) are available",
+                                         test_core_cnt)
+                else:
+                    self.log.info("Using %s cores for the MPI tests" % test_core_cnt)
 
             # configure regression test
             cfg_txt = '\n'.join([
@@ -779,7 +869,7 @@ class EB_CP2K(EasyBlock):
                 'cp2k_version': self.cfg['type'],
                 'triplet': self.typearch,
                 'cp2k_dir': os.path.basename(os.path.normpath(self.cfg['start_dir'])),
-                'maxtasks': self.cfg['maxtasks'],
+                'maxtasks': maxtasks,
                 'mpicmd_prefix': self.toolchain.mpi_cmd_for('', test_core_cnt),
             }
 
@@ -794,6 +884,23 @@ class EB_CP2K(EasyBlock):
             else:
                 raise EasyBuildError("Regression test failed (non-zero exit code): %s", regtest.output)
 
+            # report on outcome and timing of individual tests
+            test_results = parse_regtest_output(regtest.output)
+            if test_results:
+                # results are written to installation directory in install step
+                self.regtest_results = test_results
+                self.log.info("Found results for %d individual regression tests", len(test_results))
+
+                not_ok = ['%s (%s)' % (name, res['status']) for (name, res) in sorted(test_results.items())
+                          if res['status'] != 'OK']
+                if not_ok:
+                    self.log.warning("Regression tests with unexpected outcome: %s", ', '.join(not_ok))
+
+                timed = [(name, res['time']) for (name, res) in test_results.items() if res['time'] is not None]
+                slowest = sorted(timed, key=lambda x: x[1], reverse=True)[:10]
+                self.log.info("Slowest regression tests: %s",
+                              ', '.join('%s (%.2fs)' % (name, time) for (name, time) in slowest))
+
             # pattern to search for regression test summary
             re_pattern = r"number\s+of\s+%s\s+tests\s+(?P<cnt>[0-9]+)"
 
@@ -914,6 +1021,16 @@ class EB_CP2K(EasyBlock):
             except (OSError, IOError) as err:
                 raise EasyBuildError("Failed to copy regression test results dir: %s", err)
 
+        self.write_regtest_results()
+
+    def write_regtest_results(self):
+        """Write outcome and timing of individual regression tests (if any) next to the logs in installation dir"""
+        if self.regtest_results:
+            report_path = os.path.join(self.installdir, log_path(ec=self.cfg), REGTEST_RESULTS_FILE)
+            write_file(report_path, json.dumps(self.regtest_results, indent=2, sort_keys=True))
+            self.log.info("Results for %d individual regression tests written to %s",
+                          len(self.regtest_results), report_path)
+
     def sanity_check_step(self):
         """Custom sanity check for CP2K"""
 
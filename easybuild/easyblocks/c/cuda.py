@@ -41,12 +41,12 @@ from glob import glob
 
 import easybuild.tools.environment as env
 from easybuild.easyblocks.generic.binary import Binary
+from easybuild.easyblocks.elfscan import create_soname_symlinks, sanity_check_linked_shared_libs_elf_only
 from easybuild.framework.easyconfig import CUSTOM
 from easybuild.tools import LooseVersion
 from easybuild.tools.build_log import EasyBuildError
-from easybuild.tools.config import IGNORE
 from easybuild.tools.filetools import adjust_permissions, change_dir, copy_dir, expand_glob_paths
-from easybuild.tools.filetools import patch_perl_script_autoflush, remove_file, symlink, which, write_file
+from easybuild.tools.filetools import patch_perl_script_autoflush, remove_file, symlink, write_file
 from easybuild.tools.run import run_shell_cmd
 from easybuild.tools.systemtools import AARCH64, POWER, X86_64, get_cpu_architecture, get_shared_lib_ext
 
@@ -256,22 +256,6 @@ class EB_CUDA(Binary):
         for comp in (self.cfg['host_compilers'] or []):
             create_wrapper('nvcc_%s' % comp, comp)
 
-        ldconfig = which('ldconfig', log_ok=False, on_error=IGNORE)
-        sbin_dirs = ['/sbin', '/usr/sbin']
-        if not ldconfig:
-            # ldconfig is usually in /sbin or /usr/sbin
-            for cand_path in sbin_dirs:
-                if os.path.exists(os.path.join(cand_path, 'ldconfig')):
-                    ldconfig = os.path.join(cand_path, 'ldconfig')
-                    break
-
-        # fail if we couldn't find ldconfig, because it's really needed
-        if ldconfig:
-            self.log.info("ldconfig found at %s", ldconfig)
-        else:
-            path = os.environ.get('PATH', '')
-            raise EasyBuildError("Unable to find 'ldconfig' in $PATH (%s), nor in any of %s", path, sbin_dirs)
-
         stubs_dir = os.path.join(self.installdir, 'lib64', 'stubs')
 
         # Remove stubs which are not required as the full library is in $EBROOTCUDA/lib64 because this duplication
@@ -284,9 +268,10 @@ class EB_CUDA(Binary):
             else:
                 self.log.debug("Keeping stub library %s", stub_lib)
 
-        # Run ldconfig to create missing symlinks in the stubs directory (libcuda.so.1, etc)
-        cmd = ' '.join([ldconfig, '-N', stubs_dir])
-        run_shell_cmd(cmd)
+        # Create missing symlinks in the stubs directory (libcuda.so.1, etc), like 'ldconfig -N' would do,
+        # based on the SONAME of the stub libraries
+        for soname_link in create_soname_symlinks(stubs_dir):
+            self.log.info("Created symlink %s for stub library", soname_link)
 
         # GCC searches paths in LIBRARY_PATH and the system paths suffixed with ../lib64 or ../lib first
         # This means stubs/../lib64 is searched before the system /lib64 folder containing a potentially older libcuda.
@@ -325,6 +310,11 @@ class EB_CUDA(Binary):
 
         super().post_processing_step()
 
+    def sanity_check_linked_shared_libs(self, subdirs=None):
+        """Check for banned/required linked shared libraries, only for (dynamically linked) ELF files."""
+        return sanity_check_linked_shared_libs_elf_only(self, super().sanity_check_linked_shared_libs,
+                                                        subdirs=subdirs)
+
     def sanity_check_step(self):
         """Custom sanity check for CUDA."""
 
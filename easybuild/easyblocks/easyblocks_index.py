@@ -0,0 +1,267 @@
+##
+# Copyright 2009-2026 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://www.vscentrum.be),
+# Flemish Research Foundation (FWO) (http://www.fwo.be/en)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# https://github.com/easybuilders/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Index of easyblock classes included in easybuild-easyblocks.
+
+The index maps each easyblock class name to the module that provides it, its base classes,
+and the names of the custom easyconfig parameters it defines in extra_options.
+It is determined by parsing the easyblock modules (not importing them), and generated at installation time.
+When the index is loaded, it is validated (once per process) against the contents of the easyblock modules,
+so a stale index is never used; if needed, the index is rebuilt in memory (it is never written at runtime).
+
+Only depends on the Python standard library, since it is also used by setup.py.
+"""
+import ast
+import hashlib
+import importlib
+import json
+import os
+
+EASYBLOCKS_INDEX_FILENAME = 'easyblocks_index.json'
+EASYBLOCKS_INDEX_FORMAT_VERSION = 2
+
+# subdirectories (of easybuild/easyblocks) in which easyblocks are located
+EASYBLOCKS_SUBDIRS = [chr(x) for x in range(ord('a'), ord('z') + 1)] + ['0', 'generic']
+
+_easyblocks_index = {}
+
+
+def _det_easyblocks_dir():
+    """Determine path to easybuild/easyblocks directory this module is part of."""
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def _det_easyblock_files(easyblocks_dir):
+    """
+    Determine easyblock modules in specified easybuild/easyblocks directory,
+    as dict with path (relative to easyblocks directory) as key and SHA256 checksum of contents as value
+    (modification times are not preserved by every installation method, e.g. when installing from a wheel).
+    """
+    res = {}
+    for subdir in EASYBLOCKS_SUBDIRS:
+        try:
+            with os.scandir(os.path.join(easyblocks_dir, subdir)) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.py') and entry.name != '__init__.py' and entry.is_file():
+                        with open(entry.path, 'rb') as fh:
+                            res[subdir + '/' + entry.name] = hashlib.sha256(fh.read()).hexdigest()
+        except OSError:
+            pass
+
+    return dict(sorted(res.items()))
+
+
+def _det_name(node):
+    """Determine (dotted) name for specified AST node, e.g. for a base class."""
+    if isinstance(node, ast.Name):
+        return node.id
+    elif isinstance(node, ast.Attribute):
+        prefix = _det_name(node.value)
+        if prefix is not None:
+            return prefix + '.' + node.attr
+    return None
+
+
+def _is_extra_option_value(node):
+    """Check whether specified AST node looks like the value of a custom easyconfig parameter."""
+    return isinstance(node, (ast.List, ast.Tuple)) and len(node.elts) == 3
+
+
+def _det_extra_options_keys(func_node):
+    """
+    Determine names of custom easyconfig parameters defined in specified extra_options method,
+    which are either dict entries or items that are set via subscript, like 'name': [default, help, category].
+    """
+    keys = []
+    for node in ast.walk(func_node):
+        if isinstance(node, ast.Dict):
+            entries = list(zip(node.keys, node.values))
+        elif isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Subscript):
+            key = node.targets[0].slice
+            # Python < 3.9 wraps the subscript in an ast.Index node
+            if type(key).__name__ == 'Index':
+                key = key.value
+            entries = [(key, node.value)]
+        else:
+            continue
+
+        for key, value in entries:
+            if isinstance(key, ast.Constant) and isinstance(key.value, str) and _is_extra_option_value(value):
+                keys.append(key.value)
+            # Python < 3.8 uses ast.Str for string constants
+            elif type(key).__name__ == 'Str' and _is_extra_option_value(value):
+                keys.append(key.s)
+
+    return sorted(set(keys))
+
+
+def det_easyblock_classes(path):
+    """
+    Determine easyblock classes defined in specified easyblock module by parsing it,
+    as list of (class name, list of base classes, list of custom easyconfig parameters) tuples
+    (in order of appearance).
+    """
+    with open(path) as fh:
+        tree = ast.parse(fh.read(), filename=path)
+
+    res = []
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            bases = [name for name in (_det_name(base) for base in node.bases) if name]
+            extra_options = []
+            for item in node.body:
+                if isinstance(item, ast.FunctionDef) and item.name == 'extra_options':
+                    extra_options = _det_extra_options_keys(item)
+            res.append((node.name, bases, extra_options))
+
+    return res
+
+
+def build_easyblocks_index(easyblocks_dir=None):
+    """
+    Build index of easyblock classes in specified easybuild/easyblocks directory (without importing easyblocks).
+
+    Index is a dict with:
+    - 'files': SHA256 checksum for each easyblock module (path relative to easyblocks directory)
+    - 'classes': dict with class name as key (in order of appearance), and dict with
+                 'module', 'path', 'bases' and 'extra_options' as value
+    """
+    if easyblocks_dir is None:
+        easyblocks_dir = _det_easyblocks_dir()
+
+    files = _det_easyblock_files(easyblocks_dir)
+    classes = {}
+    for rel_path in files:
+        subdir, filename = rel_path.split('/')
+        mod_name = filename[:-3]
+        if subdir == 'generic':
+            module = 'easybuild.easyblocks.generic.' + mod_name
+        else:
+            # easyblock modules in a-z/0 subdirectories are importable directly from easybuild.easyblocks
+            module = 'easybuild.easyblocks.' + mod_name
+
+        for class_name, bases, extra_options in det_easyblock_classes(os.path.join(easyblocks_dir, rel_path)):
+            classes.setdefault(class_name, {
+                'module': module,
+                'path': rel_path,
+                'bases': bases,
+                'extra_options': extra_options,
+            })
+
+    return {
+        'version': EASYBLOCKS_INDEX_FORMAT_VERSION,
+        'files': files,
+        'classes': classes,
+    }
+
+
+def write_easyblocks_index(easyblocks_dir=None, index=None):
+    """
+    Write index of easyblock classes to specified easybuild/easyblocks directory (built if not provided).
+    Returns path to index file.
+    """
+    if easyblocks_dir is None:
+        easyblocks_dir = _det_easyblocks_dir()
+    if index is None:
+        index = build_easyblocks_index(easyblocks_dir)
+
+    index_path = os.path.join(easyblocks_dir, EASYBLOCKS_INDEX_FILENAME)
+
+    # write to temporary file first and then move it in place, so a partially written index is never read
+    tmp_index_path = '%s.%d' % (index_path, os.getpid())
+    with open(tmp_index_path, 'w') as fh:
+        json.dump(index, fh, indent=1)
+    os.replace(tmp_index_path, index_path)
+
+    return index_path
+
+
+def is_valid_easyblocks_index(index, easyblocks_dir=None):
+    """
+    Check whether specified index of easyblock classes is (still) valid for specified easybuild/easyblocks directory,
+    by comparing the available easyblock modules and the checksums of their contents.
+    """
+    if easyblocks_dir is None:
+        easyblocks_dir = _det_easyblocks_dir()
+
+    if not isinstance(index, dict) or index.get('version') != EASYBLOCKS_INDEX_FORMAT_VERSION:
+        return False
+
+    return index.get('files') == _det_easyblock_files(easyblocks_dir)
+
+
+def get_easyblocks_index(easyblocks_dir=None):
+    """
+    Get index of easyblock classes for specified easybuild/easyblocks directory:
+    index file (generated at installation time) is used if it is valid, otherwise the index is rebuilt in memory.
+    Result is cached, so the index is only validated once per process.
+    """
+    if easyblocks_dir is None:
+        easyblocks_dir = _det_easyblocks_dir()
+
+    index = _easyblocks_index.get(easyblocks_dir)
+    if index is None:
+        try:
+            with open(os.path.join(easyblocks_dir, EASYBLOCKS_INDEX_FILENAME)) as fh:
+                index = json.load(fh)
+        except (IOError, OSError, ValueError):
+            index = None
+
+        if not is_valid_easyblocks_index(index, easyblocks_dir):
+            index = build_easyblocks_index(easyblocks_dir)
+
+        _easyblocks_index[easyblocks_dir] = index
+
+    return index
+
+
+def get_easyblock_info(class_name, easyblocks_dir=None):
+    """
+    Return info on specified easyblock class from index of easyblock classes (or None if it is not known),
+    as dict with 'module', 'path' (relative to easybuild/easyblocks), 'bases' and 'extra_options'.
+    """
+    return get_easyblocks_index(easyblocks_dir)['classes'].get(class_name)
+
+
+def get_easyblock_classes_for_path(path, easyblocks_dir=None):
+    """Return names of easyblock classes defined in specified easyblock module, in order of appearance."""
+    if easyblocks_dir is None:
+        easyblocks_dir = _det_easyblocks_dir()
+
+    rel_path = os.path.relpath(os.path.abspath(path), easyblocks_dir).replace(os.path.sep, '/')
+    classes = get_easyblocks_index(easyblocks_dir)['classes']
+    return [name for (name, info) in classes.items() if info['path'] == rel_path]
+
+
+def get_easyblock_class_from_index(class_name, easyblocks_dir=None):
+    """
+    Return easyblock class with specified name, by only importing the module that provides it according to
+    the index of easyblock classes; returns None if the easyblock class is not known.
+    """
+    info = get_easyblock_info(class_name, easyblocks_dir=easyblocks_dir)
+    if info is None:
+        return None
+
+    return getattr(importlib.import_module(info['module']), class_name, None)
@@ -0,0 +1,372 @@
+##
+# Copyright 2009-2026 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://www.vscentrum.be),
+# Flemish Research Foundation (FWO) (http://www.fwo.be/en)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# https://github.com/easybuilders/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Scanning of installations for ELF files (binaries, shared libraries, object files).
+
+ELF headers are parsed in-process (no 'file', 'readelf' or 'ldd' commands are run),
+and files are scanned concurrently, which makes it cheap to find the ELF files in large installations
+and to determine their type, SONAME, required shared libraries (NEEDED) and RPATH/RUNPATH.
+"""
+import os
+import re
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from easybuild.base import fancylogger
+from easybuild.framework.easyblock import DEFAULT_BIN_LIB_SUBDIRS
+from easybuild.tools.config import build_option
+from easybuild.tools.systemtools import check_linked_shared_libs, get_shared_lib_ext
+
+ELF_MAGIC = b'\x7fELF'
+
+# types of ELF files
+ELF_EXECUTABLE = 'executable'
+ELF_OBJECT = 'object'
+ELF_SHARED_LIBRARY = 'shared_library'
+ELF_OTHER = 'other'
+
+# see https://refspecs.linuxfoundation.org/elf/gabi4+/ch4.eheader.html
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+ELFDATA2LSB = 1
+ELFDATA2MSB = 2
+ET_REL = 1
+ET_EXEC = 2
+ET_DYN = 3
+PT_LOAD = 1
+PT_DYNAMIC = 2
+PT_INTERP = 3
+DT_NULL = 0
+DT_NEEDED = 1
+DT_STRTAB = 5
+DT_STRSZ = 10
+DT_SONAME = 14
+DT_RPATH = 15
+DT_RUNPATH = 29
+
+# struct formats for ELF header (fields starting at e_type), program header and dynamic section entries
+ELF_STRUCT_FORMATS = {
+    ELFCLASS32: {
+        'ehdr': 'HHIIIIIHHHHHH',
+        'phdr': 'IIIIIIII',
+        'dyn': 'iI',
+    },
+    ELFCLASS64: {
+        'ehdr': 'HHIQQQIHHHHHH',
+        'phdr': 'IIQQQQQQ',
+        'dyn': 'qQ',
+    },
+}
+
+_log = fancylogger.getLogger('easyblocks.elfscan')
+
+
+def _read_at(fh, offset, size):
+    """Read specified number of bytes at specified offset in file (raises ValueError if file is too small)."""
+    fh.seek(offset)
+    data = fh.read(size)
+    if len(data) != size:
+        raise ValueError("Unexpected end of file")
+    return data
+
+
+def read_elf_info(path):
+    """
+    Parse ELF headers of file at specified path.
+
+    Returns None if file is not an ELF file, or a dict with:
+    - 'type': type of ELF file (executable, shared_library, object, other)
+    - 'dynamic': whether ELF file is dynamically linked
+    - 'interp': program interpreter (dynamic linker), if any
+    - 'soname': SONAME of shared library (or None)
+    - 'needed': list of required shared libraries (NEEDED entries)
+    - 'rpath'/'runpath': list of RPATH/RUNPATH entries
+    """
+    try:
+        with open(path, 'rb') as fh:
+            ident = fh.read(16)
+            if len(ident) < 16 or ident[:4] != ELF_MAGIC:
+                return None
+
+            elf_class, elf_data = ident[4], ident[5]
+            if elf_class not in ELF_STRUCT_FORMATS or elf_data not in (ELFDATA2LSB, ELFDATA2MSB):
+                return None
+            endian = '<' if elf_data == ELFDATA2LSB else '>'
+            formats = dict((key, endian + fmt) for (key, fmt) in ELF_STRUCT_FORMATS[elf_class].items())
+
+            ehdr = struct.unpack(formats['ehdr'], _read_at(fh, 16, struct.calcsize(formats['ehdr'])))
+            e_type, e_phoff, e_phentsize, e_phnum = ehdr[0], ehdr[4], ehdr[8], ehdr[9]
+
+            # collect program headers as (type, offset, vaddr, filesz) tuples
+            phdrs = []
+            phdr_size = struct.calcsize(formats['phdr'])
+            if e_phoff and e_phnum and e_phentsize >= phdr_size:
+                phdrs_data = _read_at(fh, e_phoff, e_phnum * e_phentsize)
+                for idx in range(e_phnum):
+                    phdr = struct.unpack_from(formats['phdr'], phdrs_data, idx * e_phentsize)
+                    if elf_class == ELFCLASS32:
+                        phdrs.append((phdr[0], phdr[1], phdr[2], phdr[4]))
+                    else:
+                        phdrs.append((phdr[0], phdr[2], phdr[3], phdr[5]))
+
+            interp = None
+            dyn_entries = []
+            for (p_type, p_offset, _, p_filesz) in phdrs:
+                if p_type == PT_INTERP:
+                    interp = _read_at(fh, p_offset, p_filesz).rstrip(b'\0').decode('utf-8', 'replace')
+                elif p_type == PT_DYNAMIC:
+                    dyn_data = _read_at(fh, p_offset, p_filesz)
+                    dyn_size = struct.calcsize(formats['dyn'])
+                    for idx in range(p_filesz // dyn_size):
+                        tag, val = struct.unpack_from(formats['dyn'], dyn_data, idx * dyn_size)
+                        if tag == DT_NULL:
+                            break
+                        dyn_entries.append((tag, val))
+
+            # string table is specified via its virtual address, which should be mapped to a file offset
+            strtab = b''
+            strtab_addr = dict(dyn_entries).get(DT_STRTAB)
+            strtab_size = dict(dyn_entries).get(DT_STRSZ, 0)
+            for (p_type, p_offset, p_vaddr, p_filesz) in phdrs:
+                if p_type == PT_LOAD and strtab_addr is not None and p_vaddr <= strtab_addr < p_vaddr + p_filesz:
+                    strtab = _read_at(fh, p_offset + strtab_addr - p_vaddr, strtab_size)
+                    break
+    except (IOError, OSError, ValueError, struct.error) as err:
+        _log.debug("Failed to parse ELF headers of %s: %s", path, err)
+        return None
+
+    def dyn_str(offset):
+        """Get string from string table at specified offset."""
+        end = strtab.find(b'\0', offset)
+        return strtab[offset:end if end >= 0 else None].decode('utf-8', 'replace')
+
+    info = {
+        'dynamic': bool(dyn_entries),
+        'interp': interp,
+        'soname': None,
+        'needed': [],
+        'rpath': [],
+        'runpath': [],
+    }
+    for tag, val in dyn_entries:
+        if val >= len(strtab):
+            continue
+        if tag == DT_NEEDED:
+            info['needed'].append(dyn_str(val))
+        elif tag == DT_SONAME:
+            info['soname'] = dyn_str(val)
+        elif tag == DT_RPATH:
+            info['rpath'].extend(x for x in dyn_str(val).split(':') if x)
+        elif tag == DT_RUNPATH:
+            info['runpath'].extend(x for x in dyn_str(val).split(':') if x)
+
+    if e_type == ET_EXEC or (e_type == ET_DYN and interp and not info['soname']):
+        # position-independent executables have type ET_DYN as well, but also have a program interpreter
+        info['type'] = ELF_EXECUTABLE
+    elif e_type == ET_DYN:
+        info['type'] = ELF_SHARED_LIBRARY
+    elif e_type == ET_REL:
+        info['type'] = ELF_OBJECT
+    else:
+        info['type'] = ELF_OTHER
+
+    return info
+
+
+def _find_files(top_dir):
+    """Find all regular files (not symlinks) in specified directory (recursively)."""
+    paths = []
+    todo = [top_dir]
+    while todo:
+        try:
+            with os.scandir(todo.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        todo.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        paths.append(entry.path)
+        except OSError as err:
+            _log.warning("Failed to scan directory for ELF files: %s", err)
+    return sorted(paths)
+
+
+def scan_elf_files(top_dirs, max_workers=None):
+    """
+    Scan specified directories (recursively) for ELF files, concurrently.
+    Symbolic links are not followed (so each ELF file is only scanned once).
+
+    :param top_dirs: (list of) path(s) to directories to scan
+    :param max_workers: maximum number of files to parse concurrently (default: determined by ThreadPoolExecutor)
+    :return: dict with path to each ELF file as key, and info on ELF file (see read_elf_info) as value
+    """
+    if isinstance(top_dirs, str):
+        top_dirs = [top_dirs]
+
+    paths = []
+    for top_dir in top_dirs:
+        paths.extend(_find_files(top_dir))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as thread_pool:
+        infos = thread_pool.map(read_elf_info, paths, chunksize=64)
+        elf_index = dict((path, info) for (path, info) in zip(paths, infos) if info is not None)
+
+    _log.info("Found %d ELF files among %d files in %s", len(elf_index), len(paths), ', '.join(top_dirs))
+    return elf_index
+
+
+def get_elf_index(easyblock, refresh=False):
+    """
+    Return index of ELF files in installation directory for specified easyblock instance (see scan_elf_files),
+    which is only determined once (unless refresh is enabled), so it can be used for multiple checks.
+    Paths in the index are based on the installation directory with symlinks resolved.
+    """
+    elf_index = getattr(easyblock, '_elf_index', None)
+    if refresh or elf_index is None or elf_index[0] != easyblock.installdir:
+        real_installdir = os.path.realpath(easyblock.installdir)
+        elf_index = (easyblock.installdir, scan_elf_files(real_installdir, max_workers=easyblock.cfg.parallel))
+        easyblock._elf_index = elf_index
+    return elf_index[1]
+
+
+def create_soname_symlinks(dirpath, elf_index=None):
+    """
+    Create symlinks named after the SONAME of the shared libraries in specified directory (like 'ldconfig -N' does),
+    for example libcuda.so.1 -> libcuda.so . Returns list of created symlinks.
+    """
+    if elf_index is None:
+        elf_index = scan_elf_files(dirpath)
+
+    symlinks = []
+    for path, info in sorted(elf_index.items()):
+        soname = info['soname']
+        if os.path.dirname(path) == dirpath and info['type'] == ELF_SHARED_LIBRARY and soname:
+            soname_path = os.path.join(dirpath, soname)
+            if soname != os.path.basename(path) and not os.path.lexists(soname_path):
+                os.symlink(os.path.basename(path), soname_path)
+                symlinks.append(soname_path)
+
+    return symlinks
+
+
+def _regex_for_lib(lib, shlib_ext):
+    """Compose regular expression for specified banned/required library (like EasyBlock does)."""
+    # absolute path to library ('/usr/lib64/libexample.so')
+    if os.path.isabs(lib):
+        regex = re.compile(re.escape(lib))
+    # full filename for library ('libexample.so')
+    elif lib.startswith('lib'):
+        regex = re.compile(r'(/|\s)' + re.escape(lib))
+    # pure library name, without 'lib' prefix or extension ('example')
+    else:
+        regex = re.compile(r'(/|\s)lib%s\.%s' % (lib, shlib_ext))
+
+    return regex
+
+
+def sanity_check_linked_shared_libs_elf_only(easyblock, fallback, subdirs=None):
+    """
+    Check whether specific shared libraries are (not) linked into installed binaries/libraries,
+    like EasyBlock.sanity_check_linked_shared_libs, but only for the dynamically linked ELF files
+    in the checked subdirectories of the installation directory (according to the index of ELF files,
+    see get_elf_index), so 'ldd' is not run for every other file.
+
+    If no ELF files are found in those subdirectories (for example because binaries and libraries are Mach-O files),
+    the check is done as usual, by calling the specified fallback function (with subdirs as named argument).
+
+    :return: error message if check failed, None otherwise
+    """
+    banned_libs = []
+    banned_libs.extend(build_option('banned_linked_shared_libs') or [])
+    banned_libs.extend(easyblock.toolchain.banned_linked_shared_libs())
+    banned_libs.extend(easyblock.banned_linked_shared_libs())
+    banned_libs.extend(easyblock.cfg['banned_linked_shared_libs'])
+
+    required_libs = []
+    required_libs.extend(build_option('required_linked_shared_libs') or [])
+    required_libs.extend(easyblock.toolchain.required_linked_shared_libs())
+    required_libs.extend(easyblock.required_linked_shared_libs())
+    required_libs.extend(easyblock.cfg['required_linked_shared_libs'])
+
+    if not banned_libs + required_libs:
+        easyblock.log.info("No banned/required libraries specified")
+        return None
+
+    if subdirs is None:
+        subdirs = easyblock.cfg['bin_lib_subdirs'] or easyblock.bin_lib_subdirs() or DEFAULT_BIN_LIB_SUBDIRS
+
+    # determine ELF files in checked subdirectories (resolving symlinks), like in the framework only files
+    # directly in specified subdirectories are checked;
+    # files outside of the installation directory (via symlinks) are not included in the index of ELF files
+    elf_index = get_elf_index(easyblock)
+    real_installdir = os.path.realpath(easyblock.installdir)
+    paths, elf_files = [], {}
+    for dirpath in nub_paths(os.path.join(easyblock.installdir, x) for x in subdirs):
+        for path in sorted(os.path.join(dirpath, x) for x in os.listdir(dirpath)):
+            paths.append(path)
+            real_path = os.path.realpath(path)
+            if real_path.startswith(real_installdir + os.path.sep):
+                info = elf_index.get(real_path)
+            else:
+                info = read_elf_info(real_path) if os.path.isfile(real_path) else None
+            if info is not None:
+                elf_files[path] = info
+
+    if not elf_files:
+        easyblock.log.info("No ELF files found in %s, checking all files for banned/required linked shared libraries",
+                           ', '.join(subdirs))
+        return fallback(subdirs=subdirs)
+
+    dynamic_elf_files = [path for path in paths if path in elf_files and elf_files[path]['dynamic']]
+    easyblock.log.info("Only checking %d dynamically linked ELF files (out of %d files) "
+                       "for banned/required linked shared libraries", len(dynamic_elf_files), len(paths))
+
+    shlib_ext = get_shared_lib_ext()
+    banned_lib_regexs = [_regex_for_lib(x, shlib_ext) for x in banned_libs]
+    required_lib_regexs = [_regex_for_lib(x, shlib_ext) for x in required_libs]
+
+    failed_paths = []
+    for path in dynamic_elf_files:
+        libs_check = check_linked_shared_libs(path, banned_patterns=banned_lib_regexs,
+                                              required_patterns=required_lib_regexs)
+        # None indicates the path is not a dynamically linked binary or shared library, so ignore it
+        if libs_check is not None and not libs_check:
+            failed_paths.append(path)
+
+    fail_msg = None
+    if failed_paths:
+        fail_msg = "Check for banned/required shared libraries failed for %s" % ', '.join(failed_paths)
+
+    return fail_msg
+
+
+def nub_paths(paths):
+    """Filter specified paths to existing directories that are unique (after resolving symlinks)."""
+    res = []
+    for path in paths:
+        if os.path.isdir(path):
+            path = os.path.realpath(path)
+            if path not in res:
+                res.append(path)
+    return res
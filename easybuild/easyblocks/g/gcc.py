@@ -35,24 +35,32 @@ EasyBuild support for building and installing GCC, implemented as an easyblock
 @author: Bart Oldeman (McGill University, Calcul Quebec, Compute Canada)
 """
 import glob
+import hashlib
 import os
 import re
 import shutil
 import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from copy import copy
 from easybuild.tools import LooseVersion
 
 import easybuild.tools.environment as env
+from easybuild.easyblocks.buildorder import det_build_order_levels
 from easybuild.easyblocks.clang import DEFAULT_TARGETS_MAP as LLVM_ARCH_MAP
 from easybuild.easyblocks.generic.configuremake import ConfigureMake
+from easybuild.easyblocks.profiling import profile_section
+from easybuild.easyblocks.smoketests import sanity_check_compiler_smoke_tests
 from easybuild.framework.easyconfig import CUSTOM
 from easybuild.tools.build_log import EasyBuildError
-from easybuild.tools.config import build_option, IGNORE
-from easybuild.tools.filetools import apply_regex_substitutions, adjust_permissions, change_dir, copy_file, search_file
-from easybuild.tools.filetools import mkdir, move_file, read_file, symlink, which, write_file
+from easybuild.tools.config import build_option, build_path, IGNORE
+from easybuild.tools.filetools import apply_regex_substitutions, adjust_permissions, change_dir, compute_checksum
+from easybuild.tools.filetools import copy_dir, copy_file, search_file
+from easybuild.tools.filetools import mkdir, move_file, read_file, remove_dir, symlink, which, write_file
 from easybuild.tools.modules import MODULE_LOAD_ENV_HEADERS, get_software_root
-from easybuild.tools.run import run_shell_cmd
+from easybuild.tools.run import RunShellCmdError, run_shell_cmd
 from easybuild.tools.systemtools import RISCV, check_os_dependency, get_cpu_architecture, get_cpu_family
+from easybuild.tools.systemtools import get_cpu_features, get_cpu_model
 from easybuild.tools.systemtools import get_gcc_version, get_shared_lib_ext, get_os_name, get_os_type
 from easybuild.tools.toolchain.compiler import OPTARCH_GENERIC
 from easybuild.tools.utilities import nub
@@ -134,6 +142,8 @@ class EB_GCC(ConfigureMake):
     @staticmethod
     def extra_options():
         extra_vars = {
+            'cache_stage2': [False, "Cache libraries built in stage 2 (GMP, ISL, PPL, CLooG), and reuse them "
+                                    "in later builds with the same sources", CUSTOM],
             'clooguseisl': [False, "Use ISL with CLooG or not", CUSTOM],
             'generic': [None, "Build GCC and support libraries such that it runs on all processors of the target "
                               "architecture (use False to enforce non-generic regardless of configuration)", CUSTOM],
@@ -172,6 +182,8 @@ class EB_GCC(ConfigureMake):
         self.llvm_dir = None  # LLVM is necessary when offloading to AMD
         self.lld_dir = None  # LLD is the only required component of LLVM
         self.newlib_dir = None  # Used by both NVPTX and AMD GCN backend
+        # libraries built concurrently in stage 2 are all installed in the same prefix
+        self.stage2_install_lock = threading.Lock()
 
         # need to make sure version is an actual version
         # required because of support in SystemCompiler generic easyblock to specify 'system' as version,
@@ -439,7 +451,7 @@ class EB_GCC(ConfigureMake):
                       f"architecture: {str(sorted_gcc_cc)}")
         return sorted_gcc_cc[0]
 
-    def run_configure_cmd(self, cmd):
+    def run_configure_cmd(self, cmd, work_dir=None):
         """
         Run a configure command, with some extra checking (e.g. for unrecognized options).
         """
@@ -451,7 +463,7 @@ class EB_GCC(ConfigureMake):
         if host_type:
             cmd += ' --host=' + host_type
 
-        res = run_shell_cmd("%s %s" % (self.cfg['preconfigopts'], cmd))
+        res = run_shell_cmd("%s %s" % (self.cfg['preconfigopts'], cmd), work_dir=work_dir)
 
         if res.exit_code != 0:
             raise EasyBuildError("Command '%s' exited with exit code != 0 (%s)", cmd, res.exit_code)
@@ -464,6 +476,195 @@ class EB_GCC(ConfigureMake):
         if unknown_options:
             raise EasyBuildError("Unrecognized options found during configure: %s", unknown_options)
 
+        return res
+
+    def stage2_lib_deps(self, lib):
+        """Determine which other libraries built in stage 2 the specified library depends on."""
+        deps = []
+        if lib != 'gmp':
+            deps.append('gmp')
+        if lib == 'cloog':
+            if self.cfg['clooguseisl']:
+                if self.cfg['withisl']:
+                    deps.append('isl')
+            elif self.cfg['withppl']:
+                deps.append('ppl')
+        return deps
+
+    def stage2_configure_cmd(self, lib, prefix, stage2_info):
+        """Determine configure command for specified library to build in stage 2, to install in specified prefix."""
+        if lib == "gmp":
+            cmd = "./configure --prefix=%s " % prefix
+            cmd += "--with-pic --disable-shared --enable-cxx "
+            # Force C99 during configure to avoid newer C standard
+            # being used. This avoids inconsistencies between the configure
+            # result and the build, where we force C99 via a patch.
+            cmd += "CFLAGS=-std=c99 "
+
+            # ensure generic build when 'generic' is set to True or when --optarch=GENERIC is used
+            # non-generic build can be enforced with generic=False if --optarch=GENERIC is used
+            optarch_generic = build_option('optarch') == OPTARCH_GENERIC
+            if self.cfg['generic'] or (optarch_generic and self.cfg['generic'] is not False):
+                cmd += "--enable-fat "
+
+        elif lib == "ppl":
+            self.pplver = LooseVersion(stage2_info['versions']['ppl'])
+
+            cmd = "./configure --prefix=%s --with-pic -disable-shared " % prefix
+            # only enable C/C++ interfaces (Java interface is sometimes troublesome)
+            cmd += "--enable-interfaces='c c++' "
+
+            # enable watchdog (or not)
+            if self.pplver <= LooseVersion("0.11"):
+                if self.cfg['pplwatchdog']:
+                    cmd += "--enable-watchdog "
+                else:
+                    cmd += "--disable-watchdog "
+            elif self.cfg['pplwatchdog']:
+                raise EasyBuildError("Enabling PPL watchdog only supported in PPL <= v0.11 .")
+
+            # make sure GMP we just built is found
+            cmd += "--with-gmp=%s " % prefix
+        elif lib == "isl":
+            cmd = "./configure --prefix=%s --with-pic --disable-shared " % prefix
+            cmd += "--with-gmp=system --with-gmp-prefix=%s " % prefix
+
+            # ensure generic build when 'generic' is set to True or when --optarch=GENERIC is used
+            # non-generic build can be enforced with generic=False if --optarch=GENERIC is used
+            optarch_generic = build_option('optarch') == OPTARCH_GENERIC
+            if self.cfg['generic'] or (optarch_generic and self.cfg['generic'] is not False):
+                cmd += "--without-gcc-arch "
+
+        elif lib == "cloog":
+            self.cloogname = stage2_info['names']['cloog']
+            self.cloogver = LooseVersion(stage2_info['versions']['cloog'])
+            v0_15 = LooseVersion("0.15")
+            v0_16 = LooseVersion("0.16")
+
+            cmd = "./configure --prefix=%s --with-pic --disable-shared " % prefix
+
+            # use ISL or PPL
+            if self.cfg['clooguseisl']:
+                if self.cfg['withisl']:
+                    self.log.debug("Using external ISL for CLooG")
+                    cmd += "--with-isl=system --with-isl-prefix=%s " % prefix
+                elif self.cloogver >= v0_16:
+                    self.log.debug("Using bundled ISL for CLooG")
+                    cmd += "--with-isl=bundled "
+                else:
+                    raise EasyBuildError("Using ISL is only supported in CLooG >= v0.16 (detected v%s).",
+                                         self.cloogver)
+            else:
+                if self.cloogname == "cloog-ppl" and self.cloogver >= v0_15 and self.cloogver < v0_16:
+                    cmd += "--with-ppl=%s " % prefix
+                else:
+                    errormsg = "PPL only supported with CLooG-PPL v0.15.x (detected v%s)" % self.cloogver
+                    errormsg += "\nNeither using PPL or ISL-based ClooG, I'm out of options..."
+                    raise EasyBuildError(errormsg)
+
+            # make sure GMP is found
+            if self.cloogver >= v0_15 and self.cloogver < v0_16:
+                cmd += "--with-gmp=%s " % prefix
+            elif self.cloogver >= v0_16:
+                cmd += "--with-gmp=system --with-gmp-prefix=%s " % prefix
+            else:
+                raise EasyBuildError("Don't know how to specify location of GMP to configure of CLooG v%s.",
+                                     self.cloogver)
+        else:
+            raise EasyBuildError("Don't know how to configure for %s", lib)
+
+        return cmd
+
+    def build_stage2_lib(self, lib, prefix, configure_cmd, paracmd):
+        """
+        Configure, build and install specified library in stage 2;
+        output of the commands is also written to a separate log file for this library.
+        """
+        libdir = os.path.join(prefix, lib)
+        log_path = os.path.join(self.cfg['start_dir'], 'stage2_logs', '%s.log' % lib)
+        mkdir(os.path.dirname(log_path), parents=True)
+        write_file(log_path, '')
+
+        with profile_section(self, 'stage', 'stage 2: %s' % lib):
+            for cmd in [configure_cmd, "make %s" % paracmd, "make install"]:
+                try:
+                    if cmd == configure_cmd:
+                        res = self.run_configure_cmd(cmd, work_dir=libdir)
+                    elif cmd == "make install":
+                        with self.stage2_install_lock:
+                            res = run_shell_cmd(cmd, work_dir=libdir)
+                    else:
+                        res = run_shell_cmd(cmd, work_dir=libdir)
+                except RunShellCmdError as err:
+                    write_file(log_path, "== %s\n%s\n" % (cmd, err.output), append=True)
+                    raise EasyBuildError("Building %s in stage 2 failed: '%s' exited with exit code %s (see also %s)",
+                                         lib, cmd, err.exit_code, log_path)
+                except EasyBuildError as err:
+                    write_file(log_path, "== %s\n%s\n" % (cmd, err.msg), append=True)
+                    raise EasyBuildError("Building %s in stage 2 failed (see also %s): %s", lib, log_path, err.msg)
+                write_file(log_path, "== %s\n%s\n" % (cmd, res.output), append=True)
+
+        self.log.info("Built %s in stage 2, output written to %s", lib, log_path)
+
+    def set_stage2_gmp_flags(self, prefix):
+        """Make sure that GMP built in stage 2 is found."""
+        libpath = os.path.join(prefix, 'lib')
+
+        # fall back to lib64 directory if lib was not found,
+        # give up if neither are there
+        if not os.path.exists(libpath):
+            libpath += '64'
+        if not os.path.exists(libpath):
+            raise EasyBuildError("lib(64) subdirectory not found in %s!" % prefix)
+
+        incpath = os.path.join(prefix, 'include')
+
+        cppflags = os.getenv('CPPFLAGS', '')
+        env.setvar('CPPFLAGS', "%s -L%s -I%s " % (cppflags, libpath, incpath))
+
+    def det_stage2_cache_dir(self, configure_cmds):
+        """
+        Determine cache directory for libraries built in stage 2 (or None if caching is disabled),
+        which is specific to the sources being used (for GCC and the libraries), the configure commands,
+        the compiler flags, and the CPU of the build host.
+        """
+        if not self.cfg['cache_stage2']:
+            return None
+
+        key = hashlib.sha256()
+        for src in sorted(self.src, key=lambda x: x['name']):
+            key.update(('%s %s\n' % (src['name'], compute_checksum(src['path'], checksum_type='sha256'))).encode())
+        for lib in sorted(configure_cmds):
+            key.update(('%s %s %s\n' % (lib, configure_cmds[lib], self.cfg['preconfigopts'])).encode())
+        for var in ['CFLAGS', 'CXXFLAGS', 'CPPFLAGS', 'LDFLAGS']:
+            key.update(('%s=%s\n' % (var, os.getenv(var, ''))).encode())
+        key.update(('optarch=%s\n' % build_option('optarch')).encode())
+        cpu_features = ' '.join(sorted(get_cpu_features()))
+        key.update(('%s %s %s\n' % (get_cpu_architecture(), get_cpu_model(), cpu_features)).encode())
+
+        return os.path.join(build_path(), 'gcc-stage2-cache', '%s-%s' % (self.version, key.hexdigest()[:16]))
+
+    def cache_stage2_build(self, prefix, cache_dir, libs):
+        """Cache installation of specified libraries built in stage 2."""
+        self.log.info("Caching stage 2 build of %s in %s", ', '.join(libs), cache_dir)
+
+        # copy to temporary location first, so a partially cached stage 2 build is never used
+        tmp_cache_dir = '%s.%d' % (cache_dir, os.getpid())
+        for entry in os.listdir(prefix):
+            # only cache installation, not the source directories or log files
+            if entry not in libs:
+                path = os.path.join(prefix, entry)
+                if os.path.isdir(path):
+                    copy_dir(path, os.path.join(tmp_cache_dir, entry), symlinks=True)
+                else:
+                    copy_file(path, os.path.join(tmp_cache_dir, entry))
+        try:
+            os.rename(tmp_cache_dir, cache_dir)
+        except OSError as err:
+            # another installation may have cached the same stage 2 build in the meantime
+            self.log.warning("Failed to cache stage 2 build in %s: %s", cache_dir, err)
+            remove_dir(tmp_cache_dir)
+
     def prepare_step(self, *args, **kwargs):
         """
         Prepare build environment, track currently active build stage
@@ -763,11 +964,12 @@ class EB_GCC(ConfigureMake):
             if self.cfg.parallel > 1:
                 paracmd = f"-j {self.cfg.parallel}"
 
-            cmd = "%s make %s %s" % (self.cfg['prebuildopts'], paracmd, self.cfg['buildopts'])
-            run_shell_cmd(cmd)
+            with profile_section(self, 'stage', 'stage 1'):
+                cmd = "%s make %s %s" % (self.cfg['prebuildopts'], paracmd, self.cfg['buildopts'])
+                run_shell_cmd(cmd)
 
-            cmd = "make install %s" % (self.cfg['installopts'])
-            run_shell_cmd(cmd)
+                cmd = "make install %s" % (self.cfg['installopts'])
+                run_shell_cmd(cmd)
 
             # register built GCC as compiler to use for stage 2/3
             path = "%s/bin:%s" % (self.stage1installdir, os.getenv('PATH'))
@@ -795,121 +997,39 @@ class EB_GCC(ConfigureMake):
             stage2_info = self.prep_extra_src_dirs("stage2", target_prefix=stage2prefix)
             configopts = stage2_info['configopts']
 
-            # build PPL and CLooG (GMP as dependency)
-
-            for lib in ["gmp"] + self.with_dirs:
-                self.log.debug("Building %s in stage 2" % lib)
-                if lib == "gmp" or self.cfg['with%s' % lib]:
-                    libdir = os.path.join(stage2prefix, lib)
-                    try:
-                        os.chdir(libdir)
-                    except OSError as err:
-                        raise EasyBuildError("Failed to change to %s: %s", libdir, err)
-                    if lib == "gmp":
-                        cmd = "./configure --prefix=%s " % stage2prefix
-                        cmd += "--with-pic --disable-shared --enable-cxx "
-                        # Force C99 during configure to avoid newer C standard
-                        # being used. This avoids inconsistencies between the configure
-                        # result and the build, where we force C99 via a patch.
-                        cmd += "CFLAGS=-std=c99 "
-
-                        # ensure generic build when 'generic' is set to True or when --optarch=GENERIC is used
-                        # non-generic build can be enforced with generic=False if --optarch=GENERIC is used
-                        optarch_generic = build_option('optarch') == OPTARCH_GENERIC
-                        if self.cfg['generic'] or (optarch_generic and self.cfg['generic'] is not False):
-                            cmd += "--enable-fat "
-
-                    elif lib == "ppl":
-                        self.pplver = LooseVersion(stage2_info['versions']['ppl'])
-
-                        cmd = "./configure --prefix=%s --with-pic -disable-shared " % stage2prefix
-                        # only enable C/C++ interfaces (Java interface is sometimes troublesome)
-                        cmd += "--enable-interfaces='c c++' "
-
-                        # enable watchdog (or not)
-                        if self.pplver <= LooseVersion("0.11"):
-                            if self.cfg['pplwatchdog']:
-                                cmd += "--enable-watchdog "
-                            else:
-                                cmd += "--disable-watchdog "
-                        elif self.cfg['pplwatchdog']:
-                            raise EasyBuildError("Enabling PPL watchdog only supported in PPL <= v0.11 .")
-
-                        # make sure GMP we just built is found
-                        cmd += "--with-gmp=%s " % stage2prefix
-                    elif lib == "isl":
-                        cmd = "./configure --prefix=%s --with-pic --disable-shared " % stage2prefix
-                        cmd += "--with-gmp=system --with-gmp-prefix=%s " % stage2prefix
-
-                        # ensure generic build when 'generic' is set to True or when --optarch=GENERIC is used
-                        # non-generic build can be enforced with generic=False if --optarch=GENERIC is used
-                        optarch_generic = build_option('optarch') == OPTARCH_GENERIC
-                        if self.cfg['generic'] or (optarch_generic and self.cfg['generic'] is not False):
-                            cmd += "--without-gcc-arch "
-
-                    elif lib == "cloog":
-                        self.cloogname = stage2_info['names']['cloog']
-                        self.cloogver = LooseVersion(stage2_info['versions']['cloog'])
-                        v0_15 = LooseVersion("0.15")
-                        v0_16 = LooseVersion("0.16")
-
-                        cmd = "./configure --prefix=%s --with-pic --disable-shared " % stage2prefix
-
-                        # use ISL or PPL
-                        if self.cfg['clooguseisl']:
-                            if self.cfg['withisl']:
-                                self.log.debug("Using external ISL for CLooG")
-                                cmd += "--with-isl=system --with-isl-prefix=%s " % stage2prefix
-                            elif self.cloogver >= v0_16:
-                                self.log.debug("Using bundled ISL for CLooG")
-                                cmd += "--with-isl=bundled "
-                            else:
-                                raise EasyBuildError("Using ISL is only supported in CLooG >= v0.16 (detected v%s).",
-                                                     self.cloogver)
-                        else:
-                            if self.cloogname == "cloog-ppl" and self.cloogver >= v0_15 and self.cloogver < v0_16:
-                                cmd += "--with-ppl=%s " % stage2prefix
-                            else:
-                                errormsg = "PPL only supported with CLooG-PPL v0.15.x (detected v%s)" % self.cloogver
-                                errormsg += "\nNeither using PPL or ISL-based ClooG, I'm out of options..."
-                                raise EasyBuildError(errormsg)
-
-                        # make sure GMP is found
-                        if self.cloogver >= v0_15 and self.cloogver < v0_16:
-                            cmd += "--with-gmp=%s " % stage2prefix
-                        elif self.cloogver >= v0_16:
-                            cmd += "--with-gmp=system --with-gmp-prefix=%s " % stage2prefix
-                        else:
-                            raise EasyBuildError("Don't know how to specify location of GMP to configure of CLooG v%s.",
-                                                 self.cloogver)
+            # build GMP first, since PPL, ISL and CLooG depend on it;
+            # libraries that only depend on libraries that were already built are built concurrently
+            stage2_libs = ['gmp'] + [lib for lib in self.with_dirs if self.cfg['with%s' % lib]]
+            stage2_deps = {lib: self.stage2_lib_deps(lib) for lib in stage2_libs}
+            stage2_cmds = {lib: self.stage2_configure_cmd(lib, stage2prefix, stage2_info) for lib in stage2_libs}
+
+            stage2_cache_dir = self.det_stage2_cache_dir(stage2_cmds)
+            if stage2_cache_dir and os.path.isdir(stage2_cache_dir):
+                self.log.info("Using cached stage 2 build of %s from %s", ', '.join(stage2_libs), stage2_cache_dir)
+                copy_dir(stage2_cache_dir, stage2prefix, dirs_exist_ok=True, symlinks=True)
+                # make sure correct GMP is found
+                self.set_stage2_gmp_flags(stage2prefix)
+            else:
+                for libs in det_build_order_levels(stage2_deps):
+                    self.log.info("Building %s in stage 2", ', '.join(libs))
+                    # divide available cores across libraries that are built concurrently
+                    stage2_paracmd = "-j %d" % max(1, self.cfg.parallel // len(libs))
+                    if len(libs) == 1:
+                        self.build_stage2_lib(libs[0], stage2prefix, stage2_cmds[libs[0]], stage2_paracmd)
                     else:
-                        raise EasyBuildError("Don't know how to configure for %s", lib)
-
-                    # configure
-                    self.run_configure_cmd(cmd)
-
-                    # build and 'install'
-                    cmd = "make %s" % paracmd
-                    run_shell_cmd(cmd)
-
-                    cmd = "make install"
-                    run_shell_cmd(cmd)
-
-                    if lib == "gmp":
+                        with ThreadPoolExecutor(max_workers=len(libs)) as thread_pool:
+                            futures = [thread_pool.submit(self.build_stage2_lib, lib, stage2prefix,
+                                                          stage2_cmds[lib], stage2_paracmd) for lib in libs]
+                            # wait for all libraries to be built, errors are raised here
+                            for future in futures:
+                                future.result()
+
+                    if 'gmp' in libs:
                         # make sure correct GMP is found
-                        libpath = os.path.join(stage2prefix, 'lib')
+                        self.set_stage2_gmp_flags(stage2prefix)
 
-                        # fall back to lib64 directory if lib was not found,
-                        # give up if neither are there
-                        if not os.path.exists(libpath):
-                            libpath += '64'
-                        if not os.path.exists(libpath):
-                            raise EasyBuildError("lib(64) subdirectory not found in %s!" % stage2prefix)
-
-                        incpath = os.path.join(stage2prefix, 'include')
-
-                        cppflags = os.getenv('CPPFLAGS', '')
-                        env.setvar('CPPFLAGS', "%s -L%s -I%s " % (cppflags, libpath, incpath))
+                if stage2_cache_dir:
+                    self.cache_stage2_build(stage2prefix, stage2_cache_dir, stage2_libs)
 
             #
             # STAGE 3: bootstrap build of final GCC (with PPL/CLooG support)
@@ -960,7 +1080,8 @@ class EB_GCC(ConfigureMake):
 
             # configure
             cmd = "../configure %s %s" % (self.configopts, configopts)
-            self.run_configure_cmd(cmd)
+            with profile_section(self, 'stage', 'stage 3: configure'):
+                self.run_configure_cmd(cmd)
 
         # build with bootstrapping for self-containment
         if self.cfg['profiled']:
@@ -969,7 +1090,8 @@ class EB_GCC(ConfigureMake):
             self.cfg.update('buildopts', 'bootstrap')
 
         # call standard build_step
-        super().build_step()
+        with profile_section(self, 'stage', 'bootstrap build'):
+            super().build_step()
 
     def install_step(self, *args, **kwargs):
         """Custom install step: avoid installing LLVM when building with AMD GCN offloading support"""
@@ -1084,6 +1206,11 @@ class EB_GCC(ConfigureMake):
         else:
             self.log.info("No include-fixed subdirectory found at %s", glob_pattern)
 
+    def run_step(self, step, step_methods):
+        """Run step, and profile it."""
+        with profile_section(self, 'step', step):
+            return super().run_step(step, step_methods)
+
     def run_all_steps(self, *args, **kwargs):
         """
         If 'withnvptx' or 'withamdgcn' is set, use iterated build:
@@ -1207,20 +1334,26 @@ class EB_GCC(ConfigureMake):
             'dirs': dirs,
         }
 
-        custom_commands = []
+        smoke_tests = []
         for lang, compiler in (('c', 'gcc'), ('c++', 'g++')):
             if lang in languages:
                 # Simple test compile
                 cmd = 'echo "int main(){} " | %s -x %s -o/dev/null -'
                 compiler_path = os.path.join(self.installdir, 'bin', compiler)
-                custom_commands.append(cmd % (compiler_path, lang))
+                smoke_tests.append({'name': '%s-%s' % (compiler, lang), 'cmd': cmd % (compiler_path, lang)})
                 if self.cfg['withlto']:
-                    custom_commands.append(cmd % (compiler_path, lang + ' -flto -fuse-linker-plugin'))
-        if custom_commands:
+                    smoke_tests.append({
+                        'name': '%s-%s-lto' % (compiler, lang),
+                        'cmd': cmd % (compiler_path, lang + ' -flto -fuse-linker-plugin'),
+                    })
+        if smoke_tests:
             # Load binutils to do the compile tests
             extra_modules = [d['short_mod_name'] for d in self.cfg.dependencies() if d['name'] == 'binutils']
         else:
             extra_modules = None
 
+        # run compile tests concurrently
+        custom_commands = sanity_check_compiler_smoke_tests(self, smoke_tests, extra_modules=extra_modules)
+
         super().sanity_check_step(custom_paths=custom_paths, custom_commands=custom_commands,
                                   extra_modules=extra_modules)
@@ -34,6 +34,7 @@ EasyBuild support for building and installing GROMACS, implemented as an easyblo
 @author: Davide Vanzo (Vanderbilt University)
 @author: Alex Domingo (Vrije Universiteit Brussel)
 """
+import fnmatch
 import glob
 import os
 import re
@@ -41,8 +42,10 @@ import shutil
 
 import easybuild.tools.environment as env
 import easybuild.tools.toolchain as toolchain
+from easybuild.easyblocks.elfscan import ELF_SHARED_LIBRARY, get_elf_index, sanity_check_linked_shared_libs_elf_only
 from easybuild.easyblocks.generic.cmakemake import CMakeMake
 from easybuild.easyblocks.generic.configuremake import ConfigureMake
+from easybuild.easyblocks.profiling import profile_section
 from easybuild.framework.easyconfig import CUSTOM
 from easybuild.tools import LooseVersion
 from easybuild.tools.build_log import EasyBuildError, print_warning
@@ -505,7 +508,9 @@ class EB_GROMACS(CMakeMake):
         if self.is_double_precision_cuda_build:
             self.log.info("skipping build step")
         else:
-            super().build_step()
+            with profile_section(self, 'variant', 'build (variant %d)' % (self.iter_idx + 1),
+                                 configopts=self.cfg['configopts']):
+                super().build_step()
 
     def test_step(self):
         """Run the basic tests (but not necessarily the full regression tests) using make check"""
@@ -547,7 +552,8 @@ class EB_GROMACS(CMakeMake):
                 # run 'make check' or whatever the easyconfig specifies
                 # in parallel since it involves more compilation
                 self.cfg.update('runtest', f"-j {self.cfg.parallel}")
-                super().test_step()
+                with profile_section(self, 'variant', 'test (variant %d)' % (self.iter_idx + 1)):
+                    super().test_step()
 
                 if build_option('rpath'):
                     # clean up temporary copy of 'lib' in installation directory,
@@ -571,7 +577,8 @@ class EB_GROMACS(CMakeMake):
         else:
             # run 'make install' in parallel since it involves more compilation
             self.cfg.update('installopts', f"-j {self.cfg.parallel}")
-            super().install_step()
+            with profile_section(self, 'variant', 'install (variant %d)' % (self.iter_idx + 1)):
+                super().install_step()
 
     def extensions_step(self, fetch=False):
         """ Custom extensions step, only handle extensions after the last iteration round"""
@@ -619,9 +626,20 @@ class EB_GROMACS(CMakeMake):
         else:
             libname = f'libgromacs*.{self.libext}'
 
-        lib_subdirs = []
         real_installdir = os.path.realpath(self.installdir)
-        for lib_path in glob.glob(os.path.join(real_installdir, '**', libname), recursive=True):
+        lib_paths = []
+        if self.libext != 'a':
+            # use index of ELF files in installation (which is also used for sanity check of linked shared libs),
+            # rather than walking the installation directory again;
+            # index only includes actual files, so also consider versioned library files (libgromacs.so.8)
+            lib_paths = [path for (path, info) in get_elf_index(self).items()
+                         if info['type'] == ELF_SHARED_LIBRARY and
+                         any(fnmatch.fnmatch(os.path.basename(path), x) for x in (libname, libname + '.*'))]
+        if not lib_paths:
+            lib_paths = glob.glob(os.path.join(real_installdir, '**', libname), recursive=True)
+
+        lib_subdirs = []
+        for lib_path in sorted(lib_paths):
             lib_relpath = os.path.realpath(lib_path)  # avoid symlinks
             lib_relpath = lib_relpath[len(real_installdir) + 1:]  # relative path from installdir
             subdir = lib_relpath.split(os.sep)[0:-1]
@@ -644,6 +662,11 @@ class EB_GROMACS(CMakeMake):
 
         return super().make_module_step(*args, **kwargs)
 
+    def sanity_check_linked_shared_libs(self, subdirs=None):
+        """Check for banned/required linked shared libraries, only for (dynamically linked) ELF files."""
+        return sanity_check_linked_shared_libs_elf_only(self, super().sanity_check_linked_shared_libs,
+                                                        subdirs=subdirs)
+
     def sanity_check_step(self):
         """Custom sanity check for GROMACS."""
 
@@ -733,6 +756,11 @@ class EB_GROMACS(CMakeMake):
         if mod_data:
             self.clean_up_fake_module(mod_data)
 
+    def run_step(self, step, step_methods):
+        """Run step, and profile it."""
+        with profile_section(self, 'step', step):
+            return super().run_step(step, step_methods)
+
     def run_all_steps(self, *args, **kwargs):
         """
         Put configure options in place for different variants, (no)mpi, single/double precision.
@@ -34,10 +34,19 @@ EasyBuild support for installing a bundle of modules, implemented as a generic e
 @author: Jan Andre Reuter (Juelich Supercomputing Centre)
 """
 import copy
+import multiprocessing
+import multiprocessing.connection
 import os
+import pickle
+import tempfile
+import traceback
 from datetime import datetime
 
 import easybuild.tools.environment as env
+from easybuild.base import fancylogger
+from easybuild.easyblocks.buildorder import det_build_order_levels
+from easybuild.easyblocks.easyblocks_index import get_easyblock_class_from_index
+from easybuild.easyblocks.profiling import profile_section, write_profile_trace
 from easybuild.framework.easyblock import EasyBlock
 from easybuild.framework.easyconfig import CUSTOM
 from easybuild.framework.easyconfig.default import get_easyconfig_parameter_default
@@ -45,6 +54,8 @@ from easybuild.framework.easyconfig.default import is_easyconfig_parameter_defau
 from easybuild.framework.easyconfig.easyconfig import get_easyblock_class
 from easybuild.tools.build_log import EasyBuildError, print_msg
 from easybuild.tools.config import build_option
+from easybuild.tools.filetools import read_file, remove_dir
+from easybuild.tools.entrypoints import EntrypointEasyblock
 from easybuild.tools.hooks import TEST_STEP
 from easybuild.tools.modules import get_software_root, get_software_version
 from easybuild.tools.utilities import nub, time2str
@@ -60,6 +71,66 @@ COMPONENT_INSTALL_STEPS = [
 ]
 
 
+def get_component_easyblock_class(easyblock, **kwargs):
+    """
+    Get class for specified easyblock (name of easyblock class) to use for a component:
+    an easyblock included in easybuild-easyblocks is imported directly from the module that provides it
+    according to the index of easyblock classes, rather than letting the framework determine its module path;
+    easyblocks provided via an entry point or that are not in the index are handled by the framework
+    """
+    if easyblock and '.' not in easyblock and not EntrypointEasyblock.get_loaded_entrypoints(name=easyblock):
+        easyblock_class = get_easyblock_class_from_index(easyblock)
+        if easyblock_class is not None:
+            return easyblock_class
+
+    return get_easyblock_class(easyblock, **kwargs)
+
+
+def det_env_changes(env_before, env_after):
+    """
+    Determine changes between specified environments (dicts),
+    as dict with new value for each changed environment variable (None for environment variables that were unset)
+    """
+    keys = set(env_before) | set(env_after)
+    return {key: env_after.get(key) for key in keys if env_before.get(key) != env_after.get(key)}
+
+
+def apply_env_changes(env_before, changes):
+    """
+    Apply changes to environment (see det_env_changes) that were made starting from the specified environment,
+    to the current environment (which may have been changed in the meantime):
+    entries that were added to path-like environment variables are prepended to the current value,
+    other environment variables are set (or unset) to their new value.
+    """
+    for key, value in sorted(changes.items()):
+        if value is None:
+            env.unset_env_vars([key], verbose=False)
+            continue
+
+        old_value, curr_value = env_before.get(key), os.getenv(key)
+        if old_value and curr_value:
+            old_paths, new_paths = old_value.split(os.pathsep), value.split(os.pathsep)
+            # only merge if no entries were removed, otherwise the value is not used as a list of paths
+            if all(path in new_paths for path in old_paths):
+                added_paths = [path for path in new_paths if path not in old_paths]
+                value = os.pathsep.join(nub(added_paths + curr_value.split(os.pathsep)))
+
+        env.setvar(key, value, verbose=False)
+
+
+def _get_picklable_state(obj):
+    """Return attributes of specified object that have a basic type and can be pickled."""
+    state = {}
+    for key, value in vars(obj).items():
+        if isinstance(value, (bool, int, float, str, list, tuple, dict, type(None))):
+            try:
+                pickle.dumps(value)
+            except Exception:
+                continue
+            state[key] = value
+    return state
+
+
 class Bundle(EasyBlock):
     """
     Bundle of modules: only generate module files, nothing to build/install
@@ -78,6 +149,9 @@ class Bundle(EasyBlock):
             'sanity_check_components': [[], "List of components for which to run sanity checks", CUSTOM],
             'sanity_check_all_components': [False, "Enable sanity checks for all components", CUSTOM],
             'default_easyblock': [None, "Default easyblock to use for components", CUSTOM],
+            'component_deps': [None, "Dict with list of names of components that each component depends on; "
+                                     "if specified, components that do not depend on each other "
+                                     "are installed concurrently, each in a separate process", CUSTOM],
         })
         return EasyBlock.extra_options(extra_vars)
 
@@ -142,11 +216,12 @@ class Bundle(EasyBlock):
                 # - if not, a software-specific easyblock will be considered by get_easyblock_class
                 # - if no easyblock was found, default_easyblock is considered
                 comp_easyblock = comp_specs.get('easyblock')
-                easyblock_class = get_easyblock_class(comp_easyblock, name=comp_name, error_on_missing_easyblock=False)
+                easyblock_class = get_component_easyblock_class(comp_easyblock, name=comp_name,
+                                                                error_on_missing_easyblock=False)
                 if easyblock_class is None:
                     if self.cfg['default_easyblock']:
                         easyblock = self.cfg['default_easyblock']
-                        easyblock_class = get_easyblock_class(easyblock)
+                        easyblock_class = get_component_easyblock_class(easyblock)
 
                     if easyblock_class is None:
                         raise EasyBuildError("No easyblock found for component %s v%s", comp_name, comp_version)
@@ -243,6 +318,7 @@ class Bundle(EasyBlock):
 
                 # instantiate the component to transfer further information
                 comp_instance = comp_cfg.easyblock(comp_cfg, logfile=self.logfile)
+                comp_instance.profile_parent = self
 
                 # correct build/install dirs
                 comp_instance.builddir = self.builddir
@@ -322,7 +398,8 @@ class Bundle(EasyBlock):
                     print_msg(msg, log=self.log, silent=self.silent)
                 start_time = datetime.now()
                 try:
-                    comp.run_step(step_name, [lambda x: getattr(x, '%s_step' % step_name)])
+                    with profile_section(self, 'component', f'{comp.name} {step_name}', version=comp.version):
+                        comp.run_step(step_name, [lambda x: getattr(x, '%s_step' % step_name)])
                 finally:
                     if not self.dry_run:
                         step_duration = datetime.now() - start_time
@@ -331,92 +408,241 @@ class Bundle(EasyBlock):
                         elif self.logdebug or build_option('trace'):
                             print_msg("   ... (took < 1 sec)", log=self.log, silent=self.silent)
 
-    def install_step(self):
-        """Install components, if specified."""
-        comp_cnt = len(self.cfg['components'])
-        for idx, (cfg, comp) in enumerate(self.comp_instances):
-            print_msg("installing bundle component %s v%s (%d/%d)..." %
-                      (comp.name, comp.version, idx + 1, comp_cnt))
-            self.log.info("Installing component %s v%s using easyblock %s", comp.name, comp.version, cfg.easyblock)
-
-            # make sure we can build in parallel
-            comp.set_parallel()
-
-            # figure out correct start directory
-            comp.guess_start_dir()
-
-            # need to run fetch_patches to ensure per-component patches are applied
-            comp.fetch_patches()
-
-            comp.src = []
-
-            # find matching entries in self.src for this component
-            with comp.cfg.allow_unresolved_templates():
-                comp_sources = comp.cfg['sources']
-            for source in comp_sources:
-                if isinstance(source, str):
-                    comp_src_fn = source
-                elif isinstance(source, dict):
-                    if 'filename' in source:
-                        comp_src_fn = source['filename']
-                    else:
-                        raise EasyBuildError("Encountered source file specified as dict without 'filename': %s", source)
-                else:
-                    raise EasyBuildError("Specification of unknown type for source file: %s", source)
+    def _prepare_component(self, comp):
+        """Prepare for installing a single component"""
+        # make sure we can build in parallel
+        comp.set_parallel()
 
-                found = False
-                for src in self.src:
-                    if src['name'] == comp_src_fn:
-                        self.log.info("Found spec for source %s for component %s: %s", comp_src_fn, comp.name, src)
-                        comp.src.append(src)
-                        found = True
-                        break
-                if not found:
-                    raise EasyBuildError("Failed to find spec for source %s for component %s", comp_src_fn, comp.name)
+        # figure out correct start directory
+        comp.guess_start_dir()
 
-                # location of first unpacked source is used to determine where to apply patch(es)
-                comp.src[-1]['finalpath'] = comp.cfg['start_dir']
+        # need to run fetch_patches to ensure per-component patches are applied
+        comp.fetch_patches()
 
+        comp.src = []
+
+        # find matching entries in self.src for this component
+        with comp.cfg.allow_unresolved_templates():
+            comp_sources = comp.cfg['sources']
+        for source in comp_sources:
+            if isinstance(source, str):
+                comp_src_fn = source
+            elif isinstance(source, dict):
+                if 'filename' in source:
+                    comp_src_fn = source['filename']
+                else:
+                    raise EasyBuildError("Encountered source file specified as dict without 'filename': %s", source)
+            else:
+                raise EasyBuildError("Specification of unknown type for source file: %s", source)
+
+            found = False
+            for src in self.src:
+                if src['name'] == comp_src_fn:
+                    self.log.info("Found spec for source %s for component %s: %s", comp_src_fn, comp.name, src)
+                    comp.src.append(src)
+                    found = True
+                    break
+            if not found:
+                raise EasyBuildError("Failed to find spec for source %s for component %s", comp_src_fn, comp.name)
+
+            # location of first unpacked source is used to determine where to apply patch(es)
+            comp.src[-1]['finalpath'] = comp.cfg['start_dir']
+
+    def _update_env_for_component(self, comp):
+        """
+        Update current environment with component environment to ensure stuff provided
+        by this component can be picked up by installation of subsequent components
+        """
+        if comp.make_module_req_guess.__qualname__ != 'EasyBlock.make_module_req_guess':
+            depr_msg = f"Easyblock used to install component {comp.name} still uses make_module_req_guess"
+            self.log.deprecated(depr_msg, '6.0')
+            # update environment to ensure stuff provided by former components can be picked up by latter components
+            # once the installation is finalised, this is handled by the generated module
+            reqs = comp.make_module_req_guess()
+            for envvar in reqs:
+                curr_val = os.getenv(envvar, '')
+                curr_paths = curr_val.split(os.pathsep)
+                for subdir in reqs[envvar]:
+                    path = os.path.join(self.installdir, subdir)
+                    if path not in curr_paths:
+                        if curr_val:
+                            new_val = '%s:%s' % (path, curr_val)
+                        else:
+                            new_val = path
+                        env.setvar(envvar, new_val)
+        else:
+            # Explicit call as EasyBlocks might set additional environment variables in
+            # the make_module step, which may be required for later component builds.
+            # Set fake arg to True, as module components should not try to create their own module.
+            comp.make_module_step(fake=True)
+
+            # Update current environment with component environment to ensure stuff provided
+            # by this component can be picked up by installation of subsequent components
+            # - this is a stripped down version of EasyBlock.make_module_req for fake modules
+            # - once bundle installation is complete, this is handled by the generated module as usual
+            for mod_envar, mod_paths in comp.module_load_environment.items():
+                # expand glob patterns in module load environment to existing absolute paths
+                mod_expand = mod_paths.expand_paths(self.installdir)
+                mod_expand = [os.path.join(self.installdir, path) for path in mod_expand]
+                # prepend to current environment variable if new stuff added to installation
+                curr_env = os.getenv(mod_envar, '')
+                curr_paths = [path for path in curr_env.split(os.pathsep) if path]
+                new_paths = nub(mod_expand + curr_paths)
+                new_env = os.pathsep.join(new_paths)
+                if new_env and new_env != curr_env:
+                    env.setvar(mod_envar, new_env)
+
+    def _install_component_in_subprocess(self, comp, parallel_divisor, logfile, conn):
+        """
+        Install a single component in a (forked) subprocess, so it has its own environment and working directory.
+        Log messages are written to the specified log file (rather than the log file of the main process),
+        and the profile trace is not written (that's left to the main process).
+        Changes to the environment, the state of the component easyblock and the profile events for the component
+        are sent back to the main process via the specified connection.
+        """
+        root_logger = fancylogger.getLogger(fname=False, clsname=False)
+        for handler in root_logger.handlers[:]:
+            root_logger.removeHandler(handler)
+        fancylogger.logToFile(logfile, max_bytes=0)
+        self.profile_write_trace = False
+
+        result = {'error': None}
+        try:
+            env_before = dict(os.environ)
+            profile_events_cnt = len(getattr(self, 'profile_events', []))
+
+            self._prepare_component(comp)
+            # share available cores across components that are installed concurrently
+            comp.cfg.parallel = max(1, comp.cfg.parallel // parallel_divisor)
             self._install_component(comp)
+            self._update_env_for_component(comp)
+
+            result.update({
+                'env_changes': det_env_changes(env_before, dict(os.environ)),
+                'profile_events': getattr(self, 'profile_events', [])[profile_events_cnt:],
+                'state': _get_picklable_state(comp),
+            })
+        except Exception as err:
+            self.log.warning("Installation of component %s v%s failed:\n%s", comp.name, comp.version,
+                             traceback.format_exc())
+            result['error'] = str(err)
+
+        conn.send(result)
+        conn.close()
+
+    def _install_components_concurrently(self, comps):
+        """
+        Install specified components (which do not depend on each other) concurrently, in separate processes:
+        at most as many processes as there are cores available are running at the same time.
+        Results (state, environment changes, log and profile events) are processed in order of the components.
+        """
+        ctx = multiprocessing.get_context('fork')
+        env_before = dict(os.environ)
+
+        max_procs = max(1, min(len(comps), self.cfg.parallel))
+        self.log.info("Installing %d components concurrently, using at most %d processes", len(comps), max_procs)
+        logs_dir = tempfile.mkdtemp(prefix='eb-bundle-components-')
+
+        todo = list(enumerate(comps))
+        running = {}
+        results = {}
+        while todo or running:
+            while todo and len(running) < max_procs:
+                idx, comp = todo.pop(0)
+                logfile = os.path.join(logs_dir, '%d-%s.log' % (idx, comp.name))
+                parent_conn, child_conn = ctx.Pipe(duplex=False)
+                proc = ctx.Process(target=self._install_component_in_subprocess,
+                                   args=(comp, max_procs, logfile, child_conn))
+                proc.start()
+                child_conn.close()
+                running[parent_conn] = (idx, logfile, proc)
+
+            for conn in multiprocessing.connection.wait(list(running)):
+                idx, logfile, proc = running.pop(conn)
+                try:
+                    result = conn.recv()
+                except EOFError:
+                    result = {'error': "process for installing component exited unexpectedly"}
+                conn.close()
+                proc.join()
+                results[idx] = (result, logfile)
+
+        errors = []
+        for idx, comp in enumerate(comps):
+            result, logfile = results[idx]
+
+            # merge log of subprocess into main log
+            if os.path.exists(logfile):
+                self.log.info("Log for installation of component %s v%s (in separate process):\n%s",
+                              comp.name, comp.version, read_file(logfile))
+
+            if result['error']:
+                errors.append("%s v%s: %s" % (comp.name, comp.version, result['error']))
+                continue
+
+            comp.__dict__.update(result['state'])
+            apply_env_changes(env_before, result['env_changes'])
+            if result['profile_events']:
+                if not hasattr(self, 'profile_events'):
+                    self.profile_events = []
+                self.profile_events.extend(result['profile_events'])
+
+        remove_dir(logs_dir)
+
+        if getattr(self, 'profile_events', None):
+            write_profile_trace(self)
+
+        if errors:
+            raise EasyBuildError("Installation of %d bundle component(s) failed:\n%s", len(errors), '\n'.join(errors))
+
+    def det_component_install_order(self):
+        """
+        Determine order in which components should be installed, as list of lists of indices of components:
+        components in the same list can be installed concurrently (if the 'component_deps' easyconfig parameter
+        specifies dependencies between components), otherwise each list holds a single component.
+        """
+        comp_names = [comp.name for _, comp in self.comp_instances]
+        component_deps = self.cfg['component_deps']
+        if component_deps is None or self.dry_run:
+            return [[idx] for idx in range(len(comp_names))]
+
+        if len(set(comp_names)) != len(comp_names):
+            raise EasyBuildError("Component names must be unique when 'component_deps' is used: %s",
+                                 ', '.join(comp_names))
+        specified_names = list(component_deps) + [dep for deps in component_deps.values() for dep in deps]
+        unknown = [name for name in nub(specified_names) if name not in comp_names]
+        if unknown:
+            raise EasyBuildError("Unknown component(s) specified in 'component_deps': %s", ', '.join(unknown))
+
+        deps = {name: component_deps.get(name, []) for name in comp_names}
+        levels = [sorted(comp_names.index(name) for name in level) for level in det_build_order_levels(deps)]
+        self.log.info("Installation order for bundle components: %s",
+                      ' -> '.join(', '.join(comp_names[idx] for idx in level) for level in levels))
+        return levels
 
-            if comp.make_module_req_guess.__qualname__ != 'EasyBlock.make_module_req_guess':
-                depr_msg = f"Easyblock used to install component {comp.name} still uses make_module_req_guess"
-                self.log.deprecated(depr_msg, '6.0')
-                # update environment to ensure stuff provided by former components can be picked up by latter components
-                # once the installation is finalised, this is handled by the generated module
-                reqs = comp.make_module_req_guess()
-                for envvar in reqs:
-                    curr_val = os.getenv(envvar, '')
-                    curr_paths = curr_val.split(os.pathsep)
-                    for subdir in reqs[envvar]:
-                        path = os.path.join(self.installdir, subdir)
-                        if path not in curr_paths:
-                            if curr_val:
-                                new_val = '%s:%s' % (path, curr_val)
-                            else:
-                                new_val = path
-                            env.setvar(envvar, new_val)
+    def install_step(self):
+        """Install components, if specified."""
+        comp_cnt = len(self.cfg['components'])
+        for level in self.det_component_install_order():
+            for idx in level:
+                cfg, comp = self.comp_instances[idx]
+                print_msg("installing bundle component %s v%s (%d/%d)..." %
+                          (comp.name, comp.version, idx + 1, comp_cnt))
+                self.log.info("Installing component %s v%s using easyblock %s", comp.name, comp.version,
+                              cfg.easyblock)
+
+            if len(level) > 1:
+                self._install_components_concurrently([self.comp_instances[idx][1] for idx in level])
             else:
-                # Explicit call as EasyBlocks might set additional environment variables in
-                # the make_module step, which may be required for later component builds.
-                # Set fake arg to True, as module components should not try to create their own module.
-                comp.make_module_step(fake=True)
-
-                # Update current environment with component environment to ensure stuff provided
-                # by this component can be picked up by installation of subsequent components
-                # - this is a stripped down version of EasyBlock.make_module_req for fake modules
-                # - once bundle installation is complete, this is handled by the generated module as usual
-                for mod_envar, mod_paths in comp.module_load_environment.items():
-                    # expand glob patterns in module load environment to existing absolute paths
-                    mod_expand = mod_paths.expand_paths(self.installdir)
-                    mod_expand = [os.path.join(self.installdir, path) for path in mod_expand]
-                    # prepend to current environment variable if new stuff added to installation
-                    curr_env = os.getenv(mod_envar, '')
-                    curr_paths = [path for path in curr_env.split(os.pathsep) if path]
-                    new_paths = nub(mod_expand + curr_paths)
-                    new_env = os.pathsep.join(new_paths)
-                    if new_env and new_env != curr_env:
-                        env.setvar(mod_envar, new_env)
+                comp = self.comp_instances[level[0]][1]
+                self._prepare_component(comp)
+                self._install_component(comp)
+                self._update_env_for_component(comp)
+
+    def run_step(self, step, step_methods):
+        """Run step, and profile it."""
+        with profile_section(self, 'step', step):
+            return super().run_step(step, step_methods)
 
     def make_module_step(self, *args, **kwargs):
         """
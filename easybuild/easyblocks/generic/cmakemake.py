@@ -34,15 +34,19 @@ EasyBuild support for software that is configured with CMake, implemented as an
 @author: Maxime Boissonneault (Compute Canada - Universite Laval)
 """
 import glob
+import json
 import re
 import os
+import xml.etree.ElementTree as ET
 from easybuild.tools import LooseVersion
 
 from easybuild.easyblocks.generic.configuremake import ConfigureMake
+from easybuild.easyblocks.hostfacts import run_host_probe_cmd
 from easybuild.framework.easyconfig import BUILD, CUSTOM
 from easybuild.tools.build_log import EasyBuildError, print_warning
-from easybuild.tools.config import build_option
-from easybuild.tools.filetools import change_dir, create_unused_dir, mkdir, read_file, which
+from easybuild.tools.config import build_option, build_path
+from easybuild.tools.filetools import change_dir, copy_file, create_unused_dir, mkdir, read_file, remove_file, which
+from easybuild.tools.filetools import write_file
 from easybuild.tools.environment import setvar
 from easybuild.tools.modules import get_software_root, get_software_version
 from easybuild.tools.run import run_shell_cmd
@@ -53,6 +57,12 @@ import easybuild.tools.toolchain as toolchain
 
 DEFAULT_CONFIGURE_CMD = 'cmake'
 
+CTEST_COST_DATA_SUBDIR = 'ctest-cost-data'
+CTEST_FAILED_TESTS_FILE = 'LastTestsFailed.log'
+CTEST_COST_DATA_FILES = ['CTestCostData.txt', CTEST_FAILED_TESTS_FILE]
+CTEST_JUNIT_FILE = 'ctest-junit.xml'
+CTEST_RESOURCE_SPEC_FILE = 'ctest-resource-spec.json'
+
 
 def det_cmake_version():
     """
@@ -64,8 +74,7 @@ def det_cmake_version():
         regex = re.compile(r"^[cC][mM]ake version (?P<version>[0-9]\.[0-9a-zA-Z.-]+)$", re.M)
 
         cmd = "cmake --version"
-        cmd_res = run_shell_cmd(cmd, hidden=True, fail_on_error=False)
-        out = cmd_res.output
+        out = run_host_probe_cmd(cmd, fail_on_error=False).output
         res = regex.search(out)
         if res:
             cmake_version = res.group('version')
@@ -75,6 +84,111 @@ def det_cmake_version():
     return cmake_version
 
 
+def parse_cpu_list(txt):
+    """Parse list of CPU ids in the format used by Linux (e.g. '0-3,8,10-11')"""
+    cpus = []
+    for part in txt.strip().split(','):
+        if '-' in part:
+            start, end = part.split('-')
+            cpus.extend(range(int(start), int(end) + 1))
+        elif part:
+            cpus.append(int(part))
+    return cpus
+
+
+def det_numa_domains():
+    """
+    Determine available cores per NUMA domain, taking into account CPU affinity of current process.
+
+    :return: dict with NUMA node id as key and (sorted) list of available cores as value
+    """
+    avail_cpus = os.sched_getaffinity(0) if hasattr(os, 'sched_getaffinity') else set(range(os.cpu_count()))
+
+    numa_domains = {}
+    for path in glob.glob('/sys/devices/system/node/node[0-9]*/cpulist'):
+        node_id = int(re.search(r'node([0-9]+)', path).group(1))
+        cpus = [cpu for cpu in parse_cpu_list(read_file(path)) if cpu in avail_cpus]
+        if cpus:
+            numa_domains[node_id] = sorted(cpus)
+
+    # fall back to single NUMA domain if no NUMA information is available
+    if not numa_domains:
+        numa_domains[0] = sorted(avail_cpus)
+
+    return dict(sorted(numa_domains.items()))
+
+
+def create_ctest_resource_spec(cores, numa_domains=None, mpi_slots=None):
+    """
+    Create CTest resource specification (see 'Resource Allocation' section in ctest documentation)
+    which declares resources of type:
+    - 'cores': one entry per NUMA domain, with available cores in that NUMA domain as slots,
+      so tests that declare e.g. 'cores:4' in their RESOURCE_GROUPS property run within a single NUMA domain;
+    - 'numa': one entry per NUMA domain with a single slot, for tests that require a full NUMA domain;
+    - 'mpi': a single entry with the specified number of MPI slots (default: total number of cores);
+
+    :param cores: total number of cores to use
+    :param numa_domains: dict with available cores per NUMA domain (see det_numa_domains)
+    :param mpi_slots: number of MPI slots
+    :return: resource specification (as dict), ready to be serialized to JSON
+    """
+    if numa_domains is None:
+        numa_domains = det_numa_domains()
+
+    # distribute cores over NUMA domains, filling up NUMA domains one at a time
+    cores_per_domain = {}
+    cores_left = cores
+    for node_id, cpus in sorted(numa_domains.items()):
+        if cores_left <= 0:
+            break
+        cores_per_domain[node_id] = min(len(cpus), cores_left)
+        cores_left -= cores_per_domain[node_id]
+
+    # more cores requested than available: account for those in the first NUMA domain
+    if cores_left > 0:
+        first_domain = min(cores_per_domain)
+        cores_per_domain[first_domain] += cores_left
+
+    if mpi_slots is None:
+        mpi_slots = cores
+
+    return {
+        'version': {'major': 1, 'minor': 0},
+        'local': [{
+            'cores': [{'id': str(node_id), 'slots': cnt} for node_id, cnt in cores_per_domain.items()],
+            'numa': [{'id': str(node_id), 'slots': 1} for node_id in cores_per_domain],
+            'mpi': [{'id': '0', 'slots': mpi_slots}],
+        }],
+    }
+
+
+def parse_ctest_junit(path):
+    """
+    Parse JUnit XML report produced by CTest (via --output-junit, requires CMake >= 3.21).
+
+    :param path: path to JUnit XML file
+    :return: dict with test name as key and tuple with test outcome ('passed', 'failed', 'skipped')
+             and test duration (in seconds) as value
+    """
+    try:
+        root = ET.parse(path).getroot()
+    except (ET.ParseError, OSError) as err:
+        raise EasyBuildError("Failed to parse CTest JUnit report %s: %s", path, err)
+
+    results = {}
+    for testcase in root.iter('testcase'):
+        status = testcase.get('status')
+        if testcase.find('failure') is not None or testcase.find('error') is not None or status == 'fail':
+            outcome = 'failed'
+        elif testcase.find('skipped') is not None or status in ('disabled', 'notrun'):
+            outcome = 'skipped'
+        else:
+            outcome = 'passed'
+        results[testcase.get('name')] = (outcome, float(testcase.get('time') or 0))
+
+    return results
+
+
 def setup_cmake_env(tc):
     """Setup env variables that cmake needs in an EasyBuild context."""
 
@@ -152,6 +266,16 @@ class CMakeMake(ConfigureMake):
                                  "Defaults to 'Release', 'RelWithDebInfo' or 'Debug' depending on "
                                  "toolchainopts[debug,noopt]", CUSTOM],
             'configure_cmd': [DEFAULT_CONFIGURE_CMD, "Configure command to use", CUSTOM],
+            'ctest_mpi_slots': [None, "Number of MPI slots declared in CTest resource specification file "
+                                      "(default: number of cores to use)", BUILD],
+            'ctest_persist_cost_data': [False, "Save CTest cost data and list of failed tests after running tests "
+                                               "and restore them for the next build of the same software name and "
+                                               "version series, so previously failed and long-running tests are "
+                                               "started first", BUILD],
+            'ctest_resource_spec': [False, "Run CTest with a resource specification file that declares available "
+                                           "cores (per NUMA domain), NUMA domains and MPI slots, to schedule tests "
+                                           "based on their RESOURCE_GROUPS property (only when runtest is True)",
+                                    BUILD],
             'generator': [None, "Build file generator to use. None to use CMakes default", CUSTOM],
             'install_target_subdir': [None, "Subdirectory to use as installation target", CUSTOM],
             'install_libdir': ['lib', "Subdirectory to use for library installation files", CUSTOM],
@@ -176,6 +300,7 @@ class CMakeMake(ConfigureMake):
         self._lib_ext = None
         self._cmake_version = None
         self.separate_build_dir = None
+        self.ctest_results = {}
 
     @property
     def lib_ext(self):
@@ -502,4 +627,118 @@ class CMakeMake(ConfigureMake):
             self.log.debug("`runtest = True` found, using '%s' as test_cmd", test_cmd)
             self.cfg['test_cmd'] = test_cmd
 
-        super().test_step()
+        test_cmd = self.cfg.get('test_cmd')
+        use_ctest = bool(test_cmd) and os.path.basename(test_cmd.split()[0]) == 'ctest'
+        if use_ctest:
+            self.restore_ctest_cost_data()
+            ctest_cmd = test_cmd
+            if self.cfg['ctest_resource_spec']:
+                # tests are scheduled by CTest based on the resources they require
+                ctest_cmd += ' -j %s' % self.cfg.parallel
+            # only use additional options for this test run, not for subsequent iterations
+            self.cfg['test_cmd'] = ' '.join([ctest_cmd] + self.ctest_opts())
+
+        try:
+            return super().test_step()
+        finally:
+            if use_ctest:
+                self.cfg['test_cmd'] = test_cmd
+                self.report_ctest_results()
+                self.save_ctest_cost_data()
+
+    def ctest_cost_data_dir(self):
+        """
+        Return path to directory where CTest cost data is stored in between builds,
+        specific to software name and version series (major.minor)
+        """
+        version_series = '.'.join(self.version.split('.')[:2])
+        return os.path.join(build_path(), CTEST_COST_DATA_SUBDIR, self.name, version_series)
+
+    def restore_ctest_cost_data(self, ctest_dir=None):
+        """
+        Restore CTest cost data and list of failed tests saved by an earlier build of the same software,
+        so CTest starts tests that failed last time and long-running tests first.
+
+        :param ctest_dir: directory in which ctest is run (default: current working directory)
+        """
+        if self.cfg['ctest_persist_cost_data']:
+            saved_dir = self.ctest_cost_data_dir()
+            target_dir = os.path.join(ctest_dir or os.getcwd(), 'Testing', 'Temporary')
+            for fn in CTEST_COST_DATA_FILES:
+                saved_path = os.path.join(saved_dir, fn)
+                target_path = os.path.join(target_dir, fn)
+                if os.path.exists(saved_path) and not os.path.exists(target_path):
+                    copy_file(saved_path, target_path)
+                    self.log.info("Restored CTest cost data from %s to %s", saved_path, target_path)
+
+    def save_ctest_cost_data(self, ctest_dir=None):
+        """
+        Save CTest cost data and list of failed tests, to be restored for next build of the same software.
+
+        :param ctest_dir: directory in which ctest is run (default: current working directory)
+        """
+        if self.cfg['ctest_persist_cost_data'] and not self.dry_run:
+            saved_dir = self.ctest_cost_data_dir()
+            source_dir = os.path.join(ctest_dir or os.getcwd(), 'Testing', 'Temporary')
+            for fn in CTEST_COST_DATA_FILES:
+                source_path = os.path.join(source_dir, fn)
+                saved_path = os.path.join(saved_dir, fn)
+                if os.path.exists(source_path):
+                    try:
+                        copy_file(source_path, saved_path)
+                        self.log.info("Saved CTest cost data from %s to %s", source_path, saved_path)
+                    except EasyBuildError as err:
+                        self.log.warning("Failed to save CTest cost data: %s", err)
+                elif fn == CTEST_FAILED_TESTS_FILE and os.path.exists(saved_path):
+                    # no failing tests, so stale list of failed tests should be removed
+                    remove_file(saved_path)
+
+    def ctest_opts(self):
+        """
+        Determine additional options for ctest:
+        - a resource specification file, if the ctest_resource_spec easyconfig parameter is enabled;
+        - location of JUnit XML report with per-test results (if CMake >= 3.21 is used);
+        """
+        opts = []
+        build_dir = self.separate_build_dir or self.builddir
+
+        if self.cfg['ctest_resource_spec']:
+            resource_spec = create_ctest_resource_spec(self.cfg.parallel, mpi_slots=self.cfg['ctest_mpi_slots'])
+            resource_spec_path = os.path.join(build_dir, CTEST_RESOURCE_SPEC_FILE)
+            write_file(resource_spec_path, json.dumps(resource_spec, indent=2))
+            self.log.info("CTest resource specification written to %s: %s", resource_spec_path, resource_spec)
+            opts.append('--resource-spec-file ' + resource_spec_path)
+
+        if LooseVersion(self.cmake_version) >= '3.21':
+            junit_path = os.path.join(build_dir, CTEST_JUNIT_FILE)
+            # make sure we don't pick up a report from an earlier test run
+            remove_file(junit_path)
+            opts.append('--output-junit ' + junit_path)
+
+        return opts
+
+    def report_ctest_results(self):
+        """
+        Report per-test results and durations from JUnit XML report produced by CTest (if any).
+        Results are also stored in self.ctest_results.
+        """
+        build_dir = self.separate_build_dir or self.builddir
+        junit_path = os.path.join(build_dir, CTEST_JUNIT_FILE) if build_dir else None
+        if junit_path and os.path.exists(junit_path):
+            try:
+                self.ctest_results = parse_ctest_junit(junit_path)
+            except EasyBuildError as err:
+                self.log.warning("Not reporting CTest results: %s", err)
+                return
+
+            by_outcome = {}
+            for name, (outcome, _) in self.ctest_results.items():
+                by_outcome.setdefault(outcome, []).append(name)
+            summary = ', '.join('%d %s' % (len(names), outcome) for outcome, names in sorted(by_outcome.items()))
+            self.log.info("CTest results: %s", summary)
+            if by_outcome.get('failed'):
+                self.log.warning("Failed CTest tests: %s", ', '.join(sorted(by_outcome['failed'])))
+
+            slowest = sorted(self.ctest_results.items(), key=lambda x: x[1][1], reverse=True)[:10]
+            slowest = ', '.join('%s (%.2fs)' % (name, duration) for (name, (_, duration)) in slowest)
+            self.log.info("Slowest CTest tests: %s", slowest)
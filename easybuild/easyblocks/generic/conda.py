@@ -28,12 +28,71 @@ EasyBuild support for installing software using 'conda', implemented as an easyb
 @author: Jillian Rowe (New York University Abu Dhabi)
 @author: Kenneth Hoste (HPC-UGent)
 """
+import hashlib
+import json
+import os
+
+import easybuild.tools.environment as env
 from easybuild.easyblocks.generic.binary import Binary
 from easybuild.framework.easyconfig import CUSTOM
 from easybuild.tools import LooseVersion
 from easybuild.tools.run import run_shell_cmd
+from easybuild.tools.filetools import copy_file, mkdir, read_file, remove_file, write_file
 from easybuild.tools.modules import MODULE_LOAD_ENV_HEADERS, get_software_root
 from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.config import build_option
+from easybuild.tools.systemtools import get_cpu_architecture, get_os_type
+
+# environment variable that can be used to specify a persistent (site-wide) conda package cache,
+# which is also used to keep track of lockfiles for installed environments
+CONDA_PKGS_DIR_ENV_VAR = 'EB_CONDA_PKGS_DIR'
+CONDA_LOCKFILES_SUBDIR = 'easybuild-lockfiles'
+# name of explicit lockfile for installed environment, in 'easybuild' subdirectory of installation directory
+CONDA_LOCKFILE_NAME = 'conda-explicit.txt'
+
+
+def read_explicit_lockfile(txt):
+    """
+    Parse contents of explicit conda lockfile (as produced by 'conda list --explicit'),
+    returns list of package URLs (which may include an MD5 checksum, like '<url>#<md5>').
+    """
+    urls = [line.strip() for line in txt.splitlines()]
+    urls = [url for url in urls if url and not url.startswith(('#', '@'))]
+    if not urls:
+        raise EasyBuildError("No packages found in explicit conda lockfile")
+    return urls
+
+
+def localize_explicit_lockfile(urls, pkgs_dir):
+    """
+    Determine package URLs that point to the package files in the specified conda package cache,
+    so it can be used as a local channel (only if all packages are available there).
+
+    :param urls: list of package URLs (see read_explicit_lockfile)
+    :param pkgs_dir: path to conda package cache
+    :return: list of file:// URLs (or None if not all packages are available in the package cache)
+    """
+    local_urls = []
+    for url in urls:
+        url, sep, md5 = url.partition('#')
+        path = os.path.join(pkgs_dir, url.split('/')[-1])
+        if not os.path.isfile(path):
+            return None
+        local_urls.append('file://' + path + sep + md5)
+    return local_urls
+
+
+def det_pip_packages(txt):
+    """
+    Determine packages in conda environment that were installed with pip (which are not included in explicit lockfile),
+    from output of 'conda list --json'; returns list of '<name>==<version>' strings.
+    """
+    try:
+        pkgs = json.loads(txt)
+    except ValueError as err:
+        raise EasyBuildError("Failed to parse list of packages in conda environment: %s", err)
+
+    return [f"{pkg['name']}=={pkg['version']}" for pkg in pkgs if 'pypi' in (pkg.get('channel'), pkg.get('platform'))]
 
 
 class Conda(Binary):
@@ -48,6 +107,10 @@ class Conda(Binary):
             'environment_file': [None, "Conda environment.yml file to use with 'conda env create'", CUSTOM],
             'remote_environment': [None, "Remote conda environment to use with 'conda env create'", CUSTOM],
             'requirements': [None, "Requirements specification to pass to 'conda install'", CUSTOM],
+            'conda_lockfile': [None, "Explicit conda lockfile (as produced by 'conda list --explicit') "
+                                     "to create environment from, without running the solver", CUSTOM],
+            'use_cached_lockfile': [True, "Create environment from lockfile cached in persistent conda package "
+                                          "cache for identical environment (if available)", CUSTOM],
         })
         return extra_vars
 
@@ -99,7 +162,30 @@ class Conda(Binary):
         cmd = f"{conda_cmd} config --add create_default_packages setuptools"
         run_shell_cmd(cmd)
 
-        if self.cfg['environment_file'] or self.cfg['remote_environment']:
+        # use persistent package cache, if specified;
+        # it's also used to keep track of lockfiles, so identical environments can be installed without solving
+        pkgs_dir = os.getenv(CONDA_PKGS_DIR_ENV_VAR)
+        cached_lockfile = None
+        if pkgs_dir:
+            mkdir(pkgs_dir, parents=True)
+            env.setvar('CONDA_PKGS_DIRS', pkgs_dir)
+            cached_lockfile = os.path.join(pkgs_dir, CONDA_LOCKFILES_SUBDIR, self.det_lockfile_name())
+
+        lockfile = self.cfg['conda_lockfile']
+        if not lockfile and cached_lockfile and os.path.exists(cached_lockfile):
+            if not self.cfg['use_cached_lockfile']:
+                self.log.info("Not using cached lockfile %s for conda environment, disabled via use_cached_lockfile",
+                              cached_lockfile)
+            elif build_option('rebuild') or build_option('force'):
+                self.log.info("Not using cached lockfile %s for conda environment when rebuilding", cached_lockfile)
+            else:
+                self.log.info("Using cached lockfile %s for conda environment", cached_lockfile)
+                lockfile = cached_lockfile
+
+        if lockfile:
+            self.install_from_lockfile(conda_cmd, force, lockfile, pkgs_dir)
+
+        elif self.cfg['environment_file'] or self.cfg['remote_environment']:
 
             if self.cfg['environment_file']:
                 env_spec = '-f ' + self.cfg['environment_file']
@@ -127,10 +213,83 @@ class Conda(Binary):
             cmd += f"{force} -y -p {self.installdir} {install_args}"
             run_shell_cmd(cmd)
 
-        # clean up
-        cmd = f"{conda_cmd} clean -ya"
+        # write explicit lockfile for installed environment, which can be used to recreate it
+        lockfile = self.write_lockfile(conda_cmd)
+        if cached_lockfile and self.cfg['use_cached_lockfile']:
+            # packages installed with pip are not included in explicit lockfile,
+            # so environment can not be recreated from it
+            pip_pkgs = self.det_pip_packages(conda_cmd)
+            if pip_pkgs:
+                self.log.warning("Not caching lockfile for conda environment, since it includes packages "
+                                 "installed with pip: %s", ', '.join(pip_pkgs))
+                if os.path.exists(cached_lockfile):
+                    remove_file(cached_lockfile)
+            else:
+                copy_file(lockfile, cached_lockfile)
+
+        # clean up, but retain package cache if it's persistent
+        if pkgs_dir:
+            self.log.info("Not cleaning up persistent conda package cache %s", pkgs_dir)
+        else:
+            cmd = f"{conda_cmd} clean -ya"
+            run_shell_cmd(cmd)
+
+    def det_lockfile_name(self):
+        """
+        Determine name for cached lockfile of conda environment,
+        which is specific to the specification of the environment and the platform.
+        """
+        spec = [self.cfg['preinstallopts'], self.cfg['remote_environment'], self.cfg['requirements'],
+                self.cfg['channels'], get_os_type(), get_cpu_architecture()]
+        if self.cfg['environment_file']:
+            spec.append(read_file(self.cfg['environment_file']))
+        spec_hash = hashlib.sha256(repr(spec).encode('utf-8')).hexdigest()[:16]
+        return f"{self.name}-{self.version}-{spec_hash}.txt"
+
+    def install_from_lockfile(self, conda_cmd, force, lockfile, pkgs_dir=None):
+        """
+        Create conda environment from explicit lockfile, which doesn't involve running the solver.
+        If all packages are available in the persistent package cache, it's used as a local channel
+        (so no network access is required).
+        """
+        txt = read_file(lockfile)
+        urls = read_explicit_lockfile(txt)
+
+        offline = ''
+        local_urls = localize_explicit_lockfile(urls, pkgs_dir) if pkgs_dir else None
+        if local_urls:
+            self.log.info("All %d packages in %s are available in %s, installing offline",
+                          len(urls), lockfile, pkgs_dir)
+            lockfile = os.path.join(self.builddir, CONDA_LOCKFILE_NAME)
+            write_file(lockfile, '@EXPLICIT\n' + '\n'.join(local_urls) + '\n')
+            offline = '--offline'
+
+        cmd = f"{self.cfg['preinstallopts']} {conda_cmd} create "
+        cmd += f"{force} -y {offline} -p {self.installdir} --file {lockfile}"
         run_shell_cmd(cmd)
 
+    def write_lockfile(self, conda_cmd):
+        """Write explicit lockfile for installed conda environment, returns path to lockfile."""
+        if conda_cmd == 'micromamba':
+            cmd = f"{conda_cmd} env export --explicit --md5 -p {self.installdir}"
+        else:
+            cmd = f"{conda_cmd} list --explicit --md5 -p {self.installdir}"
+        # warnings printed to stderr should not end up in lockfile
+        res = run_shell_cmd(cmd, hidden=True, split_stderr=True)
+
+        # verify that output is a valid lockfile
+        read_explicit_lockfile(res.output)
+
+        lockfile = os.path.join(self.installdir, 'easybuild', CONDA_LOCKFILE_NAME)
+        write_file(lockfile, res.output)
+        self.log.info("Explicit lockfile for conda environment written to %s", lockfile)
+        return lockfile
+
+    def det_pip_packages(self, conda_cmd):
+        """Determine packages in installed conda environment that were installed with pip."""
+        res = run_shell_cmd(f"{conda_cmd} list --json -p {self.installdir}", hidden=True, split_stderr=True)
+        return det_pip_packages(res.output)
+
     def make_module_extra(self):
         """Add the install directory to the PATH."""
         txt = super().make_module_extra()
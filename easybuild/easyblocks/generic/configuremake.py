@@ -39,6 +39,7 @@ i.e. configure/make/make install, implemented as an easyblock.
 import os
 import re
 import stat
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from easybuild.base import fancylogger
@@ -168,6 +169,51 @@ def obtain_config_guess(download_source_path=None, search_source_paths=None):
     return config_guess_path
 
 
+def run_make_in_subdirs(subdirs, make_args='', parallel=1, work_dir=None, make_cmd=DEFAULT_BUILD_CMD):
+    """
+    Run make in each of the specified (independent) subdirectories, concurrently:
+    the specified number of parallel build jobs is divided across the subdirectories that are processed at once.
+    Output of make is captured and logged separately for each subdirectory;
+    an error is raised (including the output for each failing subdirectory) once make completed everywhere.
+
+    :param subdirs: list of subdirectories to run make in (via 'make -C <subdir>')
+    :param make_args: additional arguments for make, like a target
+    :param parallel: total number of parallel build jobs that can be used
+    :param work_dir: directory in which subdirectories are located (default: current working directory)
+    :param make_cmd: make command to use
+    :return: dict with output of make for each subdirectory
+    """
+    log = fancylogger.getLogger('run_make_in_subdirs')
+
+    if not subdirs:
+        return {}
+
+    parallel = max(1, parallel or 1)
+    max_workers = min(len(subdirs), parallel)
+    jobs = parallel // max_workers
+    parallel_flag = '-j %d' % jobs if jobs > 1 else ''
+    log.info("Running make in %d subdirectories, %d at a time with %d parallel build jobs each: %s",
+             len(subdirs), max_workers, jobs, ', '.join(subdirs))
+
+    def run_make(subdir):
+        cmd = ' '.join(x for x in [make_cmd, '-C', subdir, parallel_flag, make_args] if x)
+        return run_shell_cmd(cmd, work_dir=work_dir, fail_on_error=False)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as thread_pool:
+        results = dict(zip(subdirs, thread_pool.map(run_make, subdirs)))
+
+    failed = []
+    for subdir, res in results.items():
+        log.info("Output of make in %s (exit code %s):\n%s", subdir, res.exit_code, res.output)
+        if res.exit_code:
+            failed.append("%s (exit code %s):\n%s" % (subdir, res.exit_code, res.output))
+
+    if failed:
+        raise EasyBuildError("Running make failed in %d subdirectories: %s", len(failed), '\n'.join(failed))
+
+    return {subdir: res.output for (subdir, res) in results.items()}
+
+
 class ConfigureMake(EasyBlock):
     """
     Support for building and installing applications with configure/make/make install
@@ -44,11 +44,12 @@ from glob import glob
 
 import easybuild.tools.toolchain as toolchain
 from easybuild.easyblocks.generic.packedbinary import PackedBinary
+from easybuild.easyblocks.permissions import adjust_permissions_tree
 from easybuild.framework.easyconfig import CUSTOM
 from easybuild.tools import LooseVersion
 from easybuild.tools.build_log import EasyBuildError, print_warning
 from easybuild.tools.config import build_option
-from easybuild.tools.filetools import adjust_permissions, remove, symlink
+from easybuild.tools.filetools import remove, symlink
 from easybuild.tools.filetools import write_file, apply_regex_substitutions, resolve_path
 from easybuild.tools.modules import MODULE_LOAD_ENV_HEADERS, get_software_root, get_software_version
 from easybuild.tools.run import run_shell_cmd
@@ -539,7 +540,7 @@ class NvidiaBase(PackedBinary):
             symlink(nvcomp_link_path, current_comp_dir, use_abspath_source=False)
 
         # The cuda nvvp tar file has broken permissions
-        adjust_permissions(self.installdir, stat.S_IWUSR, add=True, onlydirs=True)
+        adjust_permissions_tree(self.installdir, add_dir_bits=stat.S_IWUSR, max_workers=self.cfg.parallel)
 
     def sanity_check_step(self):
         """Custom sanity check for NVHPC"""
@@ -28,13 +28,18 @@ EasyBuild support for installing a bundle of Python packages, implemented as a g
 @author: Kenneth Hoste (Ghent University)
 @author: Samuel Moors (Vrije Universiteit Brussel)
 """
+import hashlib
 import os
 
 from easybuild.easyblocks.generic.bundle import Bundle
 from easybuild.easyblocks.generic.pythonpackage import EXTS_FILTER_DUMMY_PACKAGES, EXTS_FILTER_PYTHON_PACKAGES
 from easybuild.easyblocks.generic.pythonpackage import PythonPackage, get_pylibdirs, find_python_cmd_from_ec
 from easybuild.easyblocks.generic.pythonpackage import run_pip_check, run_pip_list, set_py_env_vars
-from easybuild.tools.build_log import EasyBuildError
+from easybuild.easyblocks.pypreflight import PREFLIGHT_MISSING, PREFLIGHT_REUSE
+from easybuild.easyblocks.pypreflight import PYTHON_WHEELHOUSE_ENV_VAR, det_python_target_info
+from easybuild.easyblocks.pypreflight import format_python_exts_plan, make_python_exts_plan
+from easybuild.framework.easyconfig import CUSTOM
+from easybuild.tools.build_log import EasyBuildError, print_warning
 from easybuild.tools.config import build_option, PYTHONPATH, EBPYTHONPREFIXES
 from easybuild.tools.modules import get_software_root
 from easybuild.tools.filetools import search_file
@@ -54,6 +59,14 @@ class PythonBundle(Bundle):
         # combine custom easyconfig parameters of Bundle & PythonPackage
         extra_vars = Bundle.extra_options(extra_vars)
         extra_vars['default_easyblock'][0] = 'PythonPackage'
+        extra_vars.update({
+            'preflight_check': [True, "Check sources, prebuilt wheels and declared requirements "
+                                      "of all extensions before installing them", CUSTOM],
+            'wheelhouse': [None, "Directory with prebuilt wheels to install extensions with "
+                                 "(default: $%s/<toolchain name>-<toolchain version>-<hash of dependencies>, "
+                                 "if $%s is defined)"
+                                 % (PYTHON_WHEELHOUSE_ENV_VAR, PYTHON_WHEELHOUSE_ENV_VAR), CUSTOM],
+        })
         return PythonPackage.extra_options(extra_vars)
 
     def __init__(self, *args, **kwargs):
@@ -83,6 +96,8 @@ class PythonBundle(Bundle):
 
         self.python_cmd = None
         self.pylibdir = None
+        # extensions that were installed with a prebuilt wheel: list of (name, version, wheel, SHA256 checksum)
+        self.prebuilt_wheels = []
         self.all_pylibdirs = None
 
         # figure out whether this bundle of Python packages is being installed for multiple Python versions
@@ -110,9 +125,77 @@ class PythonBundle(Bundle):
         super().prepare_step(*args, **kwargs)
         self.prepare_python()
 
+    def det_wheelhouse(self):
+        """Determine directory with prebuilt wheels for extensions (if any)."""
+        wheelhouse = self.cfg['wheelhouse']
+        if wheelhouse is None and os.getenv(PYTHON_WHEELHOUSE_ENV_VAR):
+            # wheels are specific to toolchain and (versions of) dependencies like BLAS libraries,
+            # on top of the Python interpreter (which is covered by wheel tags)
+            deps = sorted('%s %s%s' % (dep['name'], dep['version'], dep['versionsuffix'])
+                          for dep in self.cfg.dependencies() if dep['name'] != 'Python')
+            deps_hash = hashlib.sha256('\n'.join(deps).encode('utf-8')).hexdigest()[:12]
+            wheelhouse = os.path.join(os.getenv(PYTHON_WHEELHOUSE_ENV_VAR),
+                                      '%s-%s-%s' % (self.toolchain.name, self.toolchain.version, deps_hash))
+        return wheelhouse
+
+    def preflight_check_extensions(self):
+        """
+        Check all extensions before installing them: availability of sources,
+        prebuilt wheels in wheelhouse (which are then used to install extensions with),
+        and requirements declared in metadata of extensions.
+        """
+        exts = []
+        for ext in self.exts:
+            # extensions specified only by name are not installed
+            if 'version' not in ext:
+                continue
+            # restore original source if a prebuilt wheel was picked before (e.g. for another Python version)
+            if 'orig_src' in ext:
+                ext['src'] = ext.pop('orig_src')
+            opts = ext.get('options', {})
+            src = ext.get('src')
+            # prebuilt wheel can only be used for extensions that are installed as is with 'pip install'
+            reusable = ext.get('easyblock') in (None, 'PythonPackage') and not ext.get('patches')
+            reusable = reusable and opts.get('use_pip', True) and not opts.get('unpack_sources')
+            reusable = reusable and not any(opts.get(key) for key in ('install_src', 'use_pip_editable',
+                                                                      'use_pip_requirement'))
+            exts.append((ext, {
+                'name': ext['name'],
+                'version': ext['version'],
+                'src': src,
+                'nosource': opts.get('nosource', False),
+                'reusable': reusable,
+            }))
+
+        target_info = det_python_target_info(self.python_cmd)
+        plan = make_python_exts_plan([x[1] for x in exts], target_info, wheelhouse=self.det_wheelhouse(),
+                                     max_workers=self.cfg.parallel)
+        self.log.info(format_python_exts_plan(plan))
+
+        missing = [x['name'] for x in plan['exts'] if x['action'] == PREFLIGHT_MISSING]
+        if missing:
+            raise EasyBuildError("Source not available for extensions: %s", ', '.join(missing))
+
+        for (ext, _), res in zip(exts, plan['exts']):
+            if res['action'] == PREFLIGHT_REUSE:
+                self.log.info("Installing extension %s with prebuilt wheel %s (SHA256 checksum: %s)",
+                              ext['name'], res['wheel'], res['wheel_checksum'])
+                self.prebuilt_wheels.append((ext['name'], ext['version'], os.path.basename(res['wheel']),
+                                             res['wheel_checksum']))
+                ext['orig_src'] = ext['src']
+                ext['src'] = res['wheel']
+
+        if plan['conflicts']:
+            unsatisfied = ["%s requires %s (%s)" % x for x in plan['conflicts']]
+            print_warning("Requirements of extensions that are not satisfied:\n%s", '\n'.join(unsatisfied))
+
+        return plan
+
     def extensions_step(self, *args, **kwargs):
         """Install extensions (usually PythonPackages)"""
         set_py_env_vars(self.log)
+        if self.cfg['preflight_check'] and self.exts and not self.dry_run:
+            self.preflight_check_extensions()
         super().extensions_step(*args, **kwargs)
 
     def test_step(self):
@@ -170,6 +253,11 @@ class PythonBundle(Bundle):
                 if pylibdir not in self.module_generator.added_paths_per_key[PYTHONPATH]:
                     txt += self.module_generator.prepend_paths(PYTHONPATH, pylibdir)
 
+        # record which prebuilt wheels were used, since those are not covered by the checksums in the easyconfig
+        for name, version, wheel, checksum in self.prebuilt_wheels:
+            txt += self.module_generator.comment("%s %s installed with prebuilt wheel %s (SHA256 checksum: %s)"
+                                                 % (name, version, wheel, checksum))
+
         return txt
 
     def load_module(self, *args, **kwargs):
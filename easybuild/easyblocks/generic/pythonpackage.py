@@ -43,6 +43,7 @@ from sysconfig import get_config_vars
 
 import easybuild.tools.environment as env
 from easybuild.base import fancylogger
+from easybuild.easyblocks.profiling import profile_section
 from easybuild.easyblocks.python import EXTS_FILTER_DUMMY_PACKAGES, EXTS_FILTER_PYTHON_PACKAGES, set_py_env_vars
 from easybuild.easyblocks.python import det_installed_python_packages, det_pip_version, run_pip_check, run_pip_list
 from easybuild.easyblocks.python import UNLIMITED
@@ -1109,12 +1110,7 @@ class PythonPackage(ExtensionEasyBlock):
                     self.cfg['testopts'],
                 ])
 
-                if return_output_ec:
-                    res = run_shell_cmd(cmd, fail_on_error=False)
-                    # need to retrieve ec by not failing on error
-                    (out, ec) = (res.output, res.exit_code)
-                else:
-                    run_shell_cmd(cmd)
+                (out, ec) = self.run_test_cmd(cmd, return_output_ec=return_output_ec)
 
             if self.pypkg_test_installdir:
                 remove_dir(self.pypkg_test_installdir)
@@ -1124,6 +1120,21 @@ class PythonPackage(ExtensionEasyBlock):
 
         return None
 
+    def run_test_cmd(self, cmd, return_output_ec=False):
+        """
+        Run (fully composed) test command.
+
+        :param return_output_ec: don't fail on a non-zero exit code, but return output and exit code of test command
+        :return: tuple with output and exit code of test command (only if return_output_ec is enabled)
+        """
+        if return_output_ec:
+            res = run_shell_cmd(cmd, fail_on_error=False)
+            # need to retrieve ec by not failing on error
+            return (res.output, res.exit_code)
+        else:
+            run_shell_cmd(cmd)
+            return (None, None)
+
     def install_step(self):
         """Install Python package to a custom path using setup.py"""
 
@@ -1189,12 +1200,18 @@ class PythonPackage(ExtensionEasyBlock):
                 env.setvar(name, value, verbose=False)
 
     def install_extension(self, *args, **kwargs):
-        """Perform the actual Python package build/installation procedure"""
+        """Perform the actual Python package build/installation procedure, and profile it"""
 
         if self.cfg.get('dummy_package', False):
             self.install_dummy_package()
             return
 
+        with profile_section(self.master, 'extension', self.name, version=self.version):
+            self._install_extension(*args, **kwargs)
+
+    def _install_extension(self, *args, **kwargs):
+        """Build and install Python package as extension"""
+
         # we unpack unless explicitly told otherwise
         kwargs.setdefault('unpack_src', self._should_unpack_source())
         super().install_extension(*args, **kwargs)
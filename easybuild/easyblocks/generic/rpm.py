@@ -33,10 +33,20 @@ EasyBuild support for installing RPMs, implemented as an easyblock.
 @author: Toon Willems (Ghent University)
 """
 
+import bz2
+import filecmp
 import glob
+import gzip
+import json
+import lzma
 import os
 import re
+import stat
+import struct
+import subprocess
 import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from easybuild.tools import LooseVersion
 from os.path import expanduser
 
@@ -45,12 +55,331 @@ from easybuild.base import fancylogger
 from easybuild.easyblocks.generic.binary import Binary
 from easybuild.framework.easyconfig import CUSTOM
 from easybuild.tools.build_log import EasyBuildError
-from easybuild.tools.filetools import change_dir, mkdir, symlink, which
+from easybuild.tools.filetools import change_dir, mkdir, remove_dir, symlink, which, write_file
 from easybuild.tools.run import run_shell_cmd
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 
 _log = fancylogger.getLogger('easyblocks.generic.rpm')
 
+RPM_LEAD_SIZE = 96
+RPM_LEAD_MAGIC = b'\xed\xab\xee\xdb'
+RPM_HEADER_MAGIC = b'\x8e\xad\xe8\x01'
+
+RPMTAG_NAME = 1000
+RPMTAG_PAYLOADFORMAT = 1124
+RPMTAG_PAYLOADCOMPRESSOR = 1125
+
+RPM_STRING_TYPES = (6, 8, 9)  # STRING, STRING_ARRAY, I18NSTRING
+
+CPIO_NEWC_MAGICS = (b'070701', b'070702')
+CPIO_NEWC_HEADER_SIZE = 110
+CPIO_TRAILER = 'TRAILER!!!'
+
+RPM_FILES_LIST = 'rpm-files.json'
+
+
+def _read_exact(fh, size):
+    """Read exactly the specified number of bytes from file object."""
+    data = fh.read(size)
+    while len(data) < size:
+        chunk = fh.read(size - len(data))
+        if not chunk:
+            raise EasyBuildError("Unexpected end of data (read %d of %d bytes)", len(data), size)
+        data += chunk
+    return data
+
+
+def _read_rpm_header(fh, pad=False):
+    """
+    Read header structure of RPM file (signature or main header) from specified file object,
+    returns dict with string values of tags (values of other types are ignored).
+
+    :param pad: whether header is padded to 8-byte boundary (only for signature header)
+    """
+    intro = _read_exact(fh, 16)
+    if intro[:4] != RPM_HEADER_MAGIC:
+        raise EasyBuildError("Invalid RPM header magic: %s", intro[:4])
+    nindex, hsize = struct.unpack('>II', intro[8:])
+
+    index = _read_exact(fh, nindex * 16)
+    data = _read_exact(fh, hsize)
+    if pad and hsize % 8:
+        _read_exact(fh, 8 - hsize % 8)
+
+    res = {}
+    for idx in range(nindex):
+        tag, typ, offset, count = struct.unpack('>IIII', index[idx * 16:(idx + 1) * 16])
+        if typ in RPM_STRING_TYPES:
+            values = data[offset:].split(b'\0', count)[:count]
+            values = [x.decode('utf-8', 'replace') for x in values]
+            res[tag] = values[0] if typ == 6 else values
+
+    return res
+
+
+def read_rpm_header(fh):
+    """
+    Read lead, signature header and main header of RPM file from specified file object
+    (which is left positioned at the start of the payload), returns main header (see _read_rpm_header).
+    """
+    lead = _read_exact(fh, RPM_LEAD_SIZE)
+    if lead[:4] != RPM_LEAD_MAGIC:
+        raise EasyBuildError("Not an RPM file (invalid magic: %s)", lead[:4])
+
+    _read_rpm_header(fh, pad=True)
+    return _read_rpm_header(fh)
+
+
+def _open_rpm_payload(fh, compressor):
+    """
+    Return file object to read uncompressed payload of RPM file from, and process used for decompression (if any).
+    """
+    if compressor == 'gzip':
+        return gzip.GzipFile(fileobj=fh), None
+    elif compressor == 'bzip2':
+        return bz2.BZ2File(fh), None
+    elif compressor in ('lzma', 'xz'):
+        return lzma.LZMAFile(fh), None
+    elif compressor == 'zstd':
+        if zstandard is not None:
+            return zstandard.ZstdDecompressor().stream_reader(fh), None
+        elif which('zstd', log_ok=False):
+            # file object may have read ahead, so make sure that the underlying file descriptor
+            # is positioned at the start of the payload before handing it over to 'zstd'
+            os.lseek(fh.fileno(), fh.tell(), os.SEEK_SET)
+            proc = subprocess.Popen(['zstd', '-dcq'], stdin=fh, stdout=subprocess.PIPE)
+            return proc.stdout, proc
+        else:
+            raise EasyBuildError("Python package 'zstandard' or command 'zstd' is required to extract zstd payload")
+    elif compressor in (None, 'identity'):
+        return fh, None
+    else:
+        raise EasyBuildError("Unknown RPM payload compressor: %s", compressor)
+
+
+def _remove_path(path):
+    """Remove specified file or symlink, if it exists (it may be removed concurrently while extracting other RPMs)."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _check_parent_dir(path, real_targetdir, name, checked_dirs=None):
+    """
+    Check whether parent directory of specified path is located in specified target directory
+    after resolving symlinks (from entries extracted earlier), to avoid that files are written outside of it.
+
+    :param checked_dirs: set of directories that were already checked (and is updated)
+    """
+    parent = os.path.dirname(path)
+    if checked_dirs is not None and parent in checked_dirs:
+        return
+
+    # nearest existing (parent) directory determines where missing directories are created
+    existing_parent = parent
+    while not os.path.lexists(existing_parent):
+        existing_parent = os.path.dirname(existing_parent)
+
+    real_parent = os.path.realpath(existing_parent)
+    if real_parent != real_targetdir and not real_parent.startswith(real_targetdir + os.path.sep):
+        raise EasyBuildError("Path in RPM payload is outside of installation prefix (via symlink to %s): %s",
+                             real_parent, name)
+
+    if checked_dirs is not None and existing_parent == parent:
+        checked_dirs.add(parent)
+
+
+def _copy_data(src, dest_path, size, mode):
+    """Copy specified number of bytes from file object to file at specified path (which is replaced if it exists)."""
+    _remove_path(dest_path)
+    with open(dest_path, 'wb') as fh:
+        while size > 0:
+            chunk = _read_exact(src, min(size, 1024 * 1024))
+            fh.write(chunk)
+            size -= len(chunk)
+    os.chmod(dest_path, mode)
+
+
+def extract_cpio_newc(src, targetdir):
+    """
+    Extract (uncompressed) cpio archive in 'newc' format (as used for RPM payloads) from specified file object
+    into specified target directory (paths in archive are relocated to target directory).
+    Returns list of paths of extracted files, directories and symlinks (relative to target directory).
+    """
+    res = []
+    hardlinks = {}
+    checked_dirs = set()
+    targetdir = os.path.abspath(targetdir)
+    os.makedirs(targetdir, exist_ok=True)
+    real_targetdir = os.path.realpath(targetdir)
+
+    while True:
+        header = _read_exact(src, CPIO_NEWC_HEADER_SIZE)
+        if header[:6] not in CPIO_NEWC_MAGICS:
+            raise EasyBuildError("Unsupported cpio format (magic: %s)", header[:6])
+        fields = [int(header[6 + 8 * i:14 + 8 * i], 16) for i in range(13)]
+        ino, mode, nlink, mtime, filesize, namesize = [fields[i] for i in (0, 1, 4, 5, 6, 11)]
+
+        name = _read_exact(src, namesize)[:-1].decode('utf-8', 'surrogateescape')
+        # file name and file data are padded to 4-byte boundaries
+        _read_exact(src, (4 - (CPIO_NEWC_HEADER_SIZE + namesize) % 4) % 4)
+        padding = (4 - filesize % 4) % 4
+
+        if name == CPIO_TRAILER:
+            break
+
+        # paths in RPM payloads are usually relative to the root directory (./usr/bin/...)
+        rel_path = os.path.normpath(name[2:] if name.startswith('./') else name.lstrip('/'))
+        if rel_path == '.':
+            _read_exact(src, filesize + padding)
+            continue
+        elif rel_path.startswith('..') or os.path.isabs(rel_path):
+            raise EasyBuildError("Path in RPM payload is outside of installation prefix: %s", name)
+
+        path = os.path.join(targetdir, rel_path)
+        _check_parent_dir(path, real_targetdir, name, checked_dirs=checked_dirs)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if stat.S_ISDIR(mode):
+            os.makedirs(path, exist_ok=True)
+            # make sure that directory remains writable, so files can be extracted in it
+            os.chmod(path, (mode & 0o777) | stat.S_IRWXU)
+        elif stat.S_ISLNK(mode):
+            link_target = _read_exact(src, filesize).decode('utf-8', 'surrogateescape')
+            checked_dirs.discard(path)
+            _remove_path(path)
+            try:
+                os.symlink(link_target, path)
+            except FileExistsError:
+                _remove_path(path)
+                os.symlink(link_target, path)
+        elif stat.S_ISREG(mode):
+            # for hard links, only the last entry has the file data
+            if nlink > 1 and filesize == 0:
+                hardlinks.setdefault(ino, []).append(path)
+                res.append(rel_path)
+                continue
+            _copy_data(src, path, filesize, mode & 0o777)
+            os.utime(path, (mtime, mtime))
+            for link_path in hardlinks.pop(ino, []):
+                _remove_path(link_path)
+                os.link(path, link_path)
+        else:
+            _log.info("Not extracting special file %s from RPM payload", name)
+            _read_exact(src, filesize)
+            rel_path = None
+
+        _read_exact(src, padding)
+        if rel_path:
+            res.append(rel_path)
+
+    # hard links without file data are empty files
+    for link_paths in hardlinks.values():
+        for link_path in link_paths:
+            write_file(link_path, '')
+
+    return res
+
+
+def extract_rpm(rpm_path, targetdir):
+    """
+    Extract payload of specified RPM file into specified target directory, without using 'rpm' or an RPM database:
+    payload is decompressed in-process and relocated to the target directory; scriptlets are not run.
+    Returns list of paths of extracted files (relative to target directory).
+    """
+    decompress_errors = (EasyBuildError, EOFError, OSError, lzma.LZMAError, zlib.error)
+    if zstandard is not None:
+        decompress_errors += (zstandard.ZstdError,)
+
+    try:
+        with open(rpm_path, 'rb') as fh:
+            header = read_rpm_header(fh)
+            payload_format = header.get(RPMTAG_PAYLOADFORMAT, 'cpio')
+            if payload_format != 'cpio':
+                raise EasyBuildError("Unsupported payload format: %s", payload_format)
+
+            compressor = header.get(RPMTAG_PAYLOADCOMPRESSOR, 'gzip')
+            _log.debug("Extracting %s payload of %s (%s) into %s", compressor, rpm_path, header.get(RPMTAG_NAME),
+                       targetdir)
+            payload, proc = _open_rpm_payload(fh, compressor)
+            try:
+                res = extract_cpio_newc(payload, targetdir)
+            finally:
+                if proc is not None:
+                    proc.stdout.close()
+                    proc.wait()
+    except decompress_errors as err:
+        raise EasyBuildError("Failed to extract %s: %s", os.path.basename(rpm_path), err) from err
+
+    return res
+
+
+def _same_contents(path1, path2):
+    """Check whether specified (extracted) files or symlinks have the same contents."""
+    if os.path.islink(path1) or os.path.islink(path2):
+        return os.path.islink(path1) and os.path.islink(path2) and os.readlink(path1) == os.readlink(path2)
+    return os.path.isfile(path1) and os.path.isfile(path2) and filecmp.cmp(path1, path2, shallow=False)
+
+
+def _merge_extracted_rpm(stage_dir, targetdir, file_list, rpm_name, origins):
+    """
+    Move files extracted from RPM in specified staging directory into target directory.
+    Files that were already installed from another RPM are left in place if they have the same contents.
+
+    :param origins: dict with name of RPM that provided each installed file (updated)
+    """
+    real_targetdir = os.path.realpath(targetdir)
+    for rel_path in file_list:
+        staged_path = os.path.join(stage_dir, rel_path)
+        path = os.path.join(targetdir, rel_path)
+        _check_parent_dir(path, real_targetdir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if os.path.isdir(staged_path) and not os.path.islink(staged_path):
+            if os.path.lexists(path) and (os.path.islink(path) or not os.path.isdir(path)):
+                raise EasyBuildError("Directory %s from %s conflicts with file from %s", rel_path, rpm_name,
+                                     origins.get(rel_path, targetdir))
+            os.makedirs(path, exist_ok=True)
+            os.chmod(path, stat.S_IMODE(os.stat(staged_path).st_mode))
+        elif os.path.lexists(path):
+            if not _same_contents(staged_path, path):
+                raise EasyBuildError("File %s from %s differs from file installed from %s", rel_path, rpm_name,
+                                     origins.get(rel_path, targetdir))
+        else:
+            os.rename(staged_path, path)
+
+        origins.setdefault(rel_path, rpm_name)
+
+
+def extract_rpms(rpm_paths, targetdir, max_workers=None):
+    """
+    Extract payload of specified RPM files into specified target directory (see extract_rpm):
+    RPMs are extracted concurrently into separate staging directories (in the target directory),
+    and then moved into place in the specified order of the RPMs (so the result is deterministic).
+    Files that are included in multiple RPMs must have the same contents.
+    Returns dict with list of extracted files for each RPM file (by file name).
+    """
+    mkdir(targetdir, parents=True)
+    stage_dir = tempfile.mkdtemp(prefix='.extract-rpms-', dir=targetdir)
+    stage_dirs = [os.path.join(stage_dir, str(idx)) for idx in range(len(rpm_paths))]
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as thread_pool:
+            file_lists = list(thread_pool.map(extract_rpm, rpm_paths, stage_dirs))
+
+        origins = {}
+        for rpm_path, rpm_stage_dir, file_list in zip(rpm_paths, stage_dirs, file_lists):
+            _merge_extracted_rpm(rpm_stage_dir, targetdir, file_list, os.path.basename(rpm_path), origins)
+    finally:
+        remove_dir(stage_dir)
+
+    return dict(zip([os.path.basename(x) for x in rpm_paths], file_lists))
+
 
 def rebuild_rpm(rpm_path, targetdir):
     """Rebuild the RPM on the specified location, to make it relocatable."""
@@ -119,6 +448,9 @@ class Rpm(Binary):
             'preinstall': [False, "Enable pre install", CUSTOM],
             'postinstall': [False, "Enable post install", CUSTOM],
             'makesymlinks': [[], "Create symlinks for listed paths", CUSTOM],  # supports glob
+            'extract_rpms': [False, "Extract RPMs directly into installation directory (in parallel), "
+                                    "rather than rebuilding them and installing them with 'rpm' "
+                                    "(no RPM database is used, and pre/post install scripts are not run)", CUSTOM],
         })
         return extra_vars
 
@@ -141,6 +473,13 @@ class Rpm(Binary):
     def configure_step(self):
         """Custom configuration procedure for RPMs: rebuild RPMs for relocation if required."""
 
+        if self.cfg['extract_rpms']:
+            if self.cfg['preinstall'] or self.cfg['postinstall']:
+                raise EasyBuildError("Pre/post install scripts are not run when RPMs are extracted directly, "
+                                     "so 'extract_rpms' can not be combined with 'preinstall' or 'postinstall'")
+            self.log.info("RPMs are extracted directly, so no need to check 'rpm' command or rebuild RPMs")
+            return
+
         # make sure that rpm is available
         if not which('rpm'):
             raise EasyBuildError("Command 'rpm' is required but not available.")
@@ -182,9 +521,44 @@ class Rpm(Binary):
             })
         self.log.debug("oldsrc: %s, src: %s" % (self.oldsrc, self.src))
 
+    def extract_rpms_into_installdir(self):
+        """
+        Extract RPMs directly into installation directory, in parallel.
+        List of files extracted from each RPM is recorded in the installation directory.
+        """
+        rpm_paths = [rpm['path'] for rpm in self.src]
+        file_lists = extract_rpms(rpm_paths, self.installdir, max_workers=self.cfg.parallel)
+
+        # files that are included in multiple RPMs (like license files shared between multilib packages)
+        # are installed from the first RPM (extract_rpms checks that they are identical)
+        rpms_per_file = {}
+        for rpm_name, file_list in file_lists.items():
+            self.log.info("Extracted %d files from %s", len(file_list), rpm_name)
+            for path in file_list:
+                if not os.path.isdir(os.path.join(self.installdir, path)):
+                    rpms_per_file.setdefault(path, []).append(rpm_name)
+        for path, rpm_names in sorted(rpms_per_file.items()):
+            if len(rpm_names) > 1:
+                self.log.info("File %s is included in multiple RPMs (with identical contents): %s",
+                              path, ', '.join(rpm_names))
+
+        write_file(os.path.join(self.installdir, 'easybuild', RPM_FILES_LIST),
+                   json.dumps({name: sorted(file_list) for (name, file_list) in file_lists.items()},
+                              indent=1, sort_keys=True))
+
     def install_step(self):
         """Custom installation procedure for RPMs into a custom prefix."""
 
+        if self.cfg['extract_rpms']:
+            self.extract_rpms_into_installdir()
+        else:
+            self.install_rpms()
+
+        self.make_symlinks()
+
+    def install_rpms(self):
+        """Install RPMs into installation directory with 'rpm', using a dedicated RPM database."""
+
         change_dir(self.installdir)
         mkdir('rpm')
 
@@ -226,6 +600,8 @@ class Rpm(Binary):
             }
             run_shell_cmd(cmd)
 
+    def make_symlinks(self):
+        """Create symlinks in installation directory for paths listed in 'makesymlinks'."""
         for path in self.cfg['makesymlinks']:
             # allow globs, always use first hit.
             # also verify links existince
@@ -28,7 +28,10 @@ EasyBuild support for Ruby Gems, implemented as an easyblock
 @author: Robert Schmidt (Ottawa Hospital Research Institute)
 @author: Kenneth Hoste (Ghent University)
 """
+import gzip
 import os
+import re
+import tarfile
 
 import easybuild.tools.environment as env
 from easybuild.framework.easyconfig import CUSTOM
@@ -39,6 +42,36 @@ from easybuild.tools.modules import get_software_root
 from easybuild.tools.run import run_shell_cmd
 
 
+def parse_gem_runtime_deps(metadata):
+    """
+    Determine names of runtime dependencies from (YAML) gemspec metadata, as included in .gem files.
+
+    Development dependencies are ignored, since these are not required to install the gem.
+    """
+    deps = []
+
+    in_deps_section = False
+    dep_name = None
+    for line in metadata.splitlines():
+        if not line.strip():
+            continue
+        if not line.startswith((' ', '-')):
+            # top-level key marks start of new section
+            in_deps_section = line.startswith('dependencies:')
+            dep_name = None
+        elif in_deps_section:
+            if line.startswith('- '):
+                # start of new dependency entry
+                dep_name = None
+            res = re.match(r'^(?:- |  )name:\s*[\'"]?([^\'"\s]+)', line)
+            if res:
+                dep_name = res.group(1)
+            elif re.match(r'^  type:\s*:runtime', line) and dep_name:
+                deps.append(dep_name)
+
+    return deps
+
+
 class RubyGem(ExtensionEasyBlock):
     """Builds and installs Ruby Gems."""
 
@@ -55,9 +88,39 @@ class RubyGem(ExtensionEasyBlock):
         """RubyGem easyblock constructor."""
         super().__init__(*args, **kwargs)
         self.ext_src = None
+        self._required_deps = None
+
+    @property
+    def required_deps(self):
+        """Return list of required dependencies for this extension, based on metadata included in .gem file."""
+        if self._required_deps is None:
+            if self.src and self.src.endswith('.gem'):
+                try:
+                    with tarfile.open(self.src) as gem:
+                        metadata = gzip.decompress(gem.extractfile('metadata.gz').read()).decode('utf-8')
+                except (KeyError, OSError, tarfile.TarError) as err:
+                    # unknown dependencies result in installing this gem after all preceding ones
+                    self.log.warning("Failed to determine required dependencies for %s: %s", self.name, err)
+                    return None
+
+                self._required_deps = [d for d in parse_gem_runtime_deps(metadata) if d != self.name]
+                self.log.info("Required dependencies for %s: %s", self.name, self._required_deps)
+            elif self.src:
+                # dependencies of unpacked gems (or .gemspec files) are unknown
+                return None
+            else:
+                # no source => no required dependencies assumed
+                self._required_deps = []
 
-    def install_extension(self):
-        """Perform the actual Ruby gem build/install"""
+        return self._required_deps
+
+    def prepare_gem_ext_install(self, concurrent=1):
+        """
+        Prepare installation of Ruby gem as extension.
+
+        :param concurrent: number of extensions that may be installed concurrently
+        :return: Shell command to run
+        """
         if not self.src:
             raise EasyBuildError("No source found for Ruby Gem %s, required for installation.", self.name)
 
@@ -65,7 +128,24 @@ class RubyGem(ExtensionEasyBlock):
 
         self.ext_src = self.src
         self.log.debug("Installing Ruby gem %s version %s." % (self.name, self.version))
-        self.install_step()
+
+        return self.prepare_gem_install(concurrent=concurrent)
+
+    def install_extension(self):
+        """Perform the actual Ruby gem build/install"""
+        cmd = self.prepare_gem_ext_install()
+        run_shell_cmd(cmd)
+
+    def install_extension_async(self, thread_pool):
+        """
+        Start installation of Ruby gem as an extension asynchronously.
+        """
+        # available cores are divided across extensions that are installed concurrently
+        concurrent = min(self.cfg.parallel, len(getattr(self.master, 'ext_instances', None) or [None]))
+        cmd = self.prepare_gem_ext_install(concurrent=concurrent)
+        task_id = f'ext_{self.name}_{self.version}'
+        return thread_pool.submit(run_shell_cmd, cmd, asynchronous=True, env=os.environ.copy(),
+                                  fail_on_error=False, task_id=task_id, work_dir=os.getcwd())
 
     def extract_step(self):
         """Skip extraction of .gem files, which are installed as downloaded"""
@@ -116,8 +196,13 @@ class RubyGem(ExtensionEasyBlock):
         """No separate (standard) test procedure for Ruby Gems."""
         pass
 
-    def install_step(self):
-        """Install Ruby Gems using gem package manager"""
+    def prepare_gem_install(self, concurrent=1):
+        """
+        Prepare environment for installing Ruby gem, and compose 'gem install' command.
+
+        :param concurrent: number of gems that may be installed concurrently
+        :return: Shell command to run
+        """
         ruby_root = get_software_root('Ruby')
         if not ruby_root:
             raise EasyBuildError("Ruby module not loaded?")
@@ -126,12 +211,24 @@ class RubyGem(ExtensionEasyBlock):
         if not self.is_extension or self.master.name != 'Ruby':
             env.setvar('GEM_HOME', self.installdir)
 
+        # make sure native extensions are compiled in parallel;
+        # $MAKEFLAGS is only set for this command, so it doesn't leak into other (concurrent) installations
+        gem_install = 'gem install'
+        jobs = max(1, self.cfg.parallel // max(1, concurrent))
+        if jobs > 1 and 'MAKEFLAGS' not in os.environ:
+            gem_install = 'MAKEFLAGS=-j%d %s' % (jobs, gem_install)
+
         cmd = ' '.join([
             self.cfg['preinstallopts'],
-            'gem install',
+            gem_install,
             '--bindir ' + os.path.join(self.installdir, 'bin'),
             '--local ' + self.ext_src,
         ])
+        return cmd
+
+    def install_step(self):
+        """Install Ruby Gems using gem package manager"""
+        cmd = self.prepare_gem_install()
         run_shell_cmd(cmd)
 
     def make_module_extra(self):
@@ -36,11 +36,11 @@ import re
 
 from easybuild.base import fancylogger
 from easybuild.easyblocks.generic.bundle import Bundle
+from easybuild.easyblocks.hostfacts import run_host_probe_cmd
 from easybuild.framework.easyconfig import CUSTOM
 from easybuild.tools import LooseVersion
 from easybuild.tools.build_log import EasyBuildError, print_warning
 from easybuild.tools.filetools import read_file, resolve_path, which
-from easybuild.tools.run import run_shell_cmd
 
 _log = fancylogger.getLogger('easyblocks.generic.systemcompiler')
 
@@ -60,8 +60,7 @@ def extract_compiler_version(compiler_name):
     # Intel(R) C Intel(R) 64 Compiler XE for applications running on Intel(R) 64, Version 15.0.1.133 Build 20141023
     version_regex = re.compile(r'\s([0-9]+(?:\.[0-9]+){1,3})\s', re.M)
     if compiler_name == 'gcc':
-        res = run_shell_cmd("gcc --version")
-        out = res.output
+        out = run_host_probe_cmd("gcc --version").output
         res = version_regex.search(out)
         if res is None:
             raise EasyBuildError("Could not extract GCC version from %s", out)
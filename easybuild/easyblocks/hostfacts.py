@@ -0,0 +1,209 @@
+##
+# Copyright 2009-2026 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://www.vscentrum.be),
+# Flemish Research Foundation (FWO) (http://www.fwo.be/en)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# https://github.com/easybuilders/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Cache for facts on the host system that are probed by easyblocks,
+like the version of system compilers or the system include directories.
+
+Each fact is only probed once per EasyBuild session.
+Facts can also be persisted across sessions by setting $EB_HOST_FACTS_CACHE to the path of a (JSON) file;
+persisted facts expire after $EB_HOST_FACTS_CACHE_TTL seconds (1 day by default),
+and are only used on the host they were probed on.
+"""
+import hashlib
+import json
+import os
+import platform
+import shlex
+import time
+from collections import namedtuple
+
+from easybuild.base import fancylogger
+from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.config import IGNORE, build_option
+from easybuild.tools.filetools import which
+from easybuild.tools.run import run_shell_cmd
+
+HOST_FACTS_CACHE_ENV_VAR = 'EB_HOST_FACTS_CACHE'
+HOST_FACTS_CACHE_TTL_ENV_VAR = 'EB_HOST_FACTS_CACHE_TTL'
+DEFAULT_HOST_FACTS_CACHE_TTL = 24 * 3600
+
+HostProbeResult = namedtuple('HostProbeResult', ('exit_code', 'output'))
+
+_log = fancylogger.getLogger('easyblocks.hostfacts')
+
+_host_facts_cache = {}
+_persisted_host_facts = {}
+
+
+def det_host_fingerprint():
+    """Determine fingerprint for this host, which is used to make sure that persisted facts are not used elsewhere."""
+    os_release = ''
+    try:
+        with open('/etc/os-release') as fh:
+            os_release = fh.read()
+    except (IOError, OSError):
+        pass
+
+    uname = platform.uname()
+    fingerprint = '\n'.join([uname.node, uname.system, uname.release, uname.machine, os_release])
+    return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()
+
+
+def _det_host_facts_cache_ttl():
+    """Determine time-to-live (in seconds) for persisted host facts."""
+    ttl = os.getenv(HOST_FACTS_CACHE_TTL_ENV_VAR)
+    try:
+        return DEFAULT_HOST_FACTS_CACHE_TTL if ttl is None else float(ttl)
+    except ValueError:
+        raise EasyBuildError("Invalid value for $%s (should be number of seconds): %s",
+                             HOST_FACTS_CACHE_TTL_ENV_VAR, ttl)
+
+
+def _load_persisted_host_facts(path):
+    """Load host facts persisted in specified file, only retaining facts for this host that did not expire yet."""
+    if path not in _persisted_host_facts:
+        facts = {}
+        try:
+            with open(path) as fh:
+                data = json.load(fh)
+            if data.get('host') == det_host_fingerprint():
+                min_time = time.time() - _det_host_facts_cache_ttl()
+                facts = {key: fact for (key, fact) in data.get('facts', {}).items() if fact['time'] >= min_time}
+        except (IOError, OSError, ValueError, KeyError, AttributeError, TypeError) as err:
+            _log.debug("Not using persisted host facts from %s: %s", path, err)
+        _persisted_host_facts[path] = facts
+
+    return _persisted_host_facts[path]
+
+
+def _persist_host_fact(path, key, value):
+    """Persist host fact in specified file."""
+    facts = _load_persisted_host_facts(path)
+    facts[key] = {'time': time.time(), 'value': value}
+
+    try:
+        dirpath = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(dirpath):
+            os.makedirs(dirpath)
+        # write to temporary file first and then move it in place, so a partially written file is never read
+        tmp_path = '%s.%d' % (path, os.getpid())
+        with open(tmp_path, 'w') as fh:
+            json.dump({'host': det_host_fingerprint(), 'facts': facts}, fh, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+    except (IOError, OSError, TypeError) as err:
+        _log.warning("Failed to persist host fact '%s' in %s: %s", key, path, err)
+
+
+def get_host_fact(key, probe, persist=True):
+    """
+    Get fact on host system with specified key: specified probe function (without arguments) is only called
+    when the fact is not known yet in this session (or in the persistent host facts cache, if enabled).
+
+    :param key: key for fact, should include anything the result of the probe depends on
+    :param probe: function to call to determine fact
+    :param persist: whether or not fact can be stored in persistent host facts cache (value must be JSON serializable)
+    """
+    if key in _host_facts_cache:
+        return _host_facts_cache[key]
+
+    cache_path = os.getenv(HOST_FACTS_CACHE_ENV_VAR) if persist else None
+
+    if cache_path and key in _load_persisted_host_facts(cache_path):
+        value = _load_persisted_host_facts(cache_path)[key]['value']
+        _log.debug("Using persisted host fact '%s' from %s: %s", key, cache_path, value)
+    else:
+        value = probe()
+        _log.debug("Probed host fact '%s': %s", key, value)
+        if cache_path:
+            _persist_host_fact(cache_path, key, value)
+
+    _host_facts_cache[key] = value
+    return value
+
+
+def clear_host_facts_cache():
+    """Clear (in-memory) cache of host facts."""
+    _host_facts_cache.clear()
+    _persisted_host_facts.clear()
+
+
+def _det_cmd_fingerprint(cmd):
+    """
+    Determine fingerprint for command that is run to probe host system:
+    location, modification time and size of the command being run (leading environment variables are skipped)
+    """
+    try:
+        cmd_name = [x for x in shlex.split(cmd) if '=' not in x][0]
+    except (IndexError, ValueError):
+        return None
+
+    cmd_path = which(cmd_name, log_ok=False, on_error=IGNORE)
+    if cmd_path is None:
+        return None
+
+    cmd_path = os.path.realpath(cmd_path)
+    try:
+        cmd_stat = os.stat(cmd_path)
+    except OSError:
+        return None
+
+    return '%s:%s:%s' % (cmd_path, cmd_stat.st_mtime_ns, cmd_stat.st_size)
+
+
+def run_host_probe_cmd(cmd, env_vars=None, fail_on_error=True, in_dry_run=False, persist=True):
+    """
+    Run (cheap, side-effect free) command to probe host system, or return cached result for it.
+    Result is specific to (version of) the command that is being run, and the values of specified environment variables.
+
+    :param cmd: command to run
+    :param env_vars: list of names of environment variables that affect result of command
+    :param fail_on_error: raise an error if command exits with non-zero exit code
+    :param in_dry_run: also run command in dry run mode (result is not cached otherwise)
+    :param persist: whether or not result can be stored in persistent host facts cache
+                    (should be disabled if result depends on files other than the command itself)
+    :return: HostProbeResult named tuple with exit code and output of command
+    """
+    # don't cache result if command is not available, or if it's not actually run (in dry run mode)
+    cmd_fingerprint = None
+    if in_dry_run or not build_option('extended_dry_run'):
+        cmd_fingerprint = _det_cmd_fingerprint(cmd)
+
+    if cmd_fingerprint is None:
+        res = run_shell_cmd(cmd, fail_on_error=fail_on_error, hidden=True, in_dry_run=in_dry_run)
+        return HostProbeResult(res.exit_code, res.output)
+
+    key_parts = ['cmd', cmd, cmd_fingerprint]
+    key_parts.extend('%s=%s' % (var, os.getenv(var, '')) for var in sorted(env_vars or []))
+
+    def probe():
+        res = run_shell_cmd(cmd, fail_on_error=False, hidden=True, in_dry_run=in_dry_run)
+        return [res.exit_code, res.output]
+
+    exit_code, output = get_host_fact('|'.join(key_parts), probe, persist=persist)
+
+    if fail_on_error and exit_code:
+        raise EasyBuildError("Probing host system with '%s' failed (exit code %s): %s", cmd, exit_code, output)
+
+    return HostProbeResult(exit_code, output)
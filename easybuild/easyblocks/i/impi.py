@@ -41,6 +41,7 @@ from easybuild.tools import LooseVersion
 
 import easybuild.tools.toolchain as toolchain
 from easybuild.easyblocks.generic.intelbase import IntelBase
+from easybuild.easyblocks.mpibench import sanity_check_mpi_microbenchmark
 from easybuild.framework.easyconfig import CUSTOM
 from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.config import build_option
@@ -69,6 +70,11 @@ class EB_impi(IntelBase):
             'set_mpi_wrappers_all': [False, 'Set (default) compiler for all MPI wrapper commands', CUSTOM],
             'rebuild_f08_bindings': [False, 'Rebuild and replace the Fortran 2008 bindings.'
                                             'Not built by default due to backwards compatibility.', CUSTOM],
+            'mpi_microbenchmark': [None, "Thresholds for on-node MPI microbenchmark that is run in sanity check "
+                                         "when MPI tests are enabled, as dict with 'max_latency' (in us), "
+                                         "'min_bandwidth' (in MB/s) and/or 'max_allreduce_latency' (in us); "
+                                         "empty dict implies only logging results, None implies not running it",
+                                   CUSTOM],
         }
         return IntelBase.extra_options(extra_vars)
 
@@ -273,6 +279,11 @@ class EB_impi(IntelBase):
                 mpi_cmd_tmpl % params,  # run test program
             ])
 
+            if self.cfg['mpi_microbenchmark'] is not None:
+                compiler = 'mpicc -cc=%s' % os.getenv('CC')
+                sanity_check_mpi_microbenchmark(self, mpi_cmd_tmpl, params, self.cfg['mpi_microbenchmark'],
+                                                nr_ranks=min(8, self.cfg.parallel), compiler=compiler)
+
         super().sanity_check_step(custom_paths=custom_paths, custom_commands=custom_commands)
 
     def make_module_step(self, *args, **kwargs):
@@ -34,6 +34,7 @@ import stat
 
 from easybuild.tools import LooseVersion
 from easybuild.easyblocks.generic.packedbinary import PackedBinary
+from easybuild.easyblocks.permissions import adjust_permissions_tree
 from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.config import build_option
 from easybuild.tools.filetools import adjust_permissions, change_dir, clean_dir, copy_dir, copy_file, which
@@ -77,7 +78,8 @@ class EB_Java(PackedBinary):
             run_shell_cmd(os.path.join(self.builddir, self.src[0]['name']), stdin='')
         else:
             PackedBinary.extract_step(self)
-            adjust_permissions(self.builddir, stat.S_IWUSR, add=True, recursive=True)
+            adjust_permissions_tree(self.builddir, add_file_bits=stat.S_IWUSR, add_dir_bits=stat.S_IWUSR,
+                                    max_workers=self.cfg.parallel)
 
     def install_step(self):
         """Custom install step: just copy unpacked installation files."""
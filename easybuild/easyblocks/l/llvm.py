@@ -55,6 +55,10 @@ from easybuild.tools.systemtools import get_cpu_architecture, get_cpu_family, ge
 from easybuild.tools.systemtools import get_ptrace_scope
 
 from easybuild.easyblocks.generic.cmakemake import CMakeMake, get_cmake_python_config_dict
+from easybuild.easyblocks.elfscan import sanity_check_linked_shared_libs_elf_only
+from easybuild.easyblocks.hostfacts import get_host_fact
+from easybuild.easyblocks.profiling import profile_section
+from easybuild.easyblocks.smoketests import sanity_check_compiler_smoke_tests
 
 BUILD_TARGET_AMDGPU = 'AMDGPU'
 BUILD_TARGET_NVPTX = 'NVPTX'
@@ -1359,18 +1363,21 @@ class EB_LLVM(CMakeMake):
             print_msg("Building stage 1/1")
 
         change_dir(self.llvm_obj_dir_stage1)
-        super().build_step(*args, **kwargs)
+        with profile_section(self, 'stage', 'stage 1'):
+            super().build_step(*args, **kwargs)
 
         if self.cfg['bootstrap']:
             self.log.info("Building stage 2")
             print_msg("Building stage 2/3")
-            self.configure_step2()
-            self.build_with_prev_stage(self.llvm_obj_dir_stage1, self.llvm_obj_dir_stage2)
+            with profile_section(self, 'stage', 'stage 2'):
+                self.configure_step2()
+                self.build_with_prev_stage(self.llvm_obj_dir_stage1, self.llvm_obj_dir_stage2)
 
             self.log.info("Building stage 3")
             print_msg("Building stage 3/3")
-            self.configure_step3()
-            self.build_with_prev_stage(self.llvm_obj_dir_stage2, self.llvm_obj_dir_stage3)
+            with profile_section(self, 'stage', 'stage 3'):
+                self.configure_step3()
+                self.build_with_prev_stage(self.llvm_obj_dir_stage2, self.llvm_obj_dir_stage3)
 
     def _para_test_step(self, parallel=1):
         """Run test suite with the specified number of parallel jobs for make."""
@@ -1489,7 +1496,7 @@ class EB_LLVM(CMakeMake):
                 self.log.warning("ROCr-Runtime not in dependencies, ignoring failing tests for AMDGPU target.")
             # Ignore compiler-rt and lldb test failures if ptrace_scope is disabled, or higher than 1.
             # In this case, debuggers and sanitizers may fail to attach to other processes.
-            if get_ptrace_scope() > 1:
+            if get_host_fact('ptrace_scope', get_ptrace_scope) > 1:
                 self.ignore_patterns += ['lldb-shell', 'lldb-unit', 'libFuzzer', 'AddressSanitizer',
                                          'HWAddressSanitizer', 'LeakSanitizer', 'SanitizerCommon', 'UBSan']
                 self.log.warning("ptrace_scope > 1 was found, ignoring failing compiler-rt sanitizer and lldb tests.")
@@ -1637,6 +1644,11 @@ class EB_LLVM(CMakeMake):
             for suffix in ('.c', '.o', '.x'):
                 remove_file(f'{test_fn}{suffix}')
 
+    def sanity_check_linked_shared_libs(self, subdirs=None):
+        """Check for banned/required linked shared libraries, only for (dynamically linked) ELF files."""
+        return sanity_check_linked_shared_libs_elf_only(self, super().sanity_check_linked_shared_libs,
+                                                        subdirs=subdirs)
+
     def sanity_check_step(self, custom_paths=None, custom_commands=None, *args, **kwargs):
         """Perform sanity checks on the installed LLVM."""
         lib_dir_runtime = None
@@ -1863,15 +1875,30 @@ class EB_LLVM(CMakeMake):
         # Check if a simple test program can be built when we link all LLVM libraries.
         # This can reveal dependencies we missed to add. We can use GCC for this,
         # as this doesn't require any LLVM specific flags.
-        tmpdir = tempfile.mkdtemp()
-        write_file(os.path.join(tmpdir, 'minimal.cpp'), LLVM_MINIMAL_CPP_EXAMPLE)
-        minimal_cpp_compiler_cmd = "cd %s && g++ minimal.cpp -o minimal_cpp " % tmpdir
         # Here, we add the system libraries LLVM expects to find
-        minimal_cpp_compiler_cmd += "$(llvm-config --link-static --system-libs all)"
-        custom_commands.append(minimal_cpp_compiler_cmd)
+        minimal_cpp_compiler_cmd = "g++ minimal.cpp -o minimal_cpp $(llvm-config --link-static --system-libs all)"
+        # this is by far the most expensive check, so it goes first to run in parallel with the other ones
+        smoke_tests = [{
+            'name': 'link-static-minimal-cpp',
+            'cmd': minimal_cpp_compiler_cmd,
+            'files': {'minimal.cpp': LLVM_MINIMAL_CPP_EXAMPLE},
+        }]
+        smoke_tests.extend({'name': cmd, 'cmd': cmd} for cmd in custom_commands)
+
+        custom_commands = sanity_check_compiler_smoke_tests(self, smoke_tests, extra_modules=extra_modules)
+        if custom_commands:
+            # smoke tests are not run directly, so test program must be available for sanity check command
+            tmpdir = tempfile.mkdtemp()
+            write_file(os.path.join(tmpdir, 'minimal.cpp'), LLVM_MINIMAL_CPP_EXAMPLE)
+            custom_commands[0] = "cd %s && %s" % (tmpdir, minimal_cpp_compiler_cmd)
 
         return super().sanity_check_step(custom_paths=custom_paths, custom_commands=custom_commands, *args, **kwargs)
 
+    def run_step(self, step, step_methods):
+        """Run step, and profile it."""
+        with profile_section(self, 'step', step):
+            return super().run_step(step, step_methods)
+
     def make_module_step(self, *args, **kwargs):
         """
         Clang can find its own headers and libraries but the shared libraries need to be in $LD_LIBRARY_PATH
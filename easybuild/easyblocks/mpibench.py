@@ -0,0 +1,213 @@
+##
+# Copyright 2009-2026 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://www.vscentrum.be),
+# Flemish Research Foundation (FWO) (http://www.fwo.be/en)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# https://github.com/easybuilders/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+On-node MPI microbenchmark (ping-pong latency/bandwidth and allreduce latency),
+which can be run as part of the sanity check for MPI libraries to detect that the intra-node transport
+silently falls back to a slow path (for example because of a misconfigured BTL/PML selection).
+"""
+import os
+import re
+import tempfile
+
+from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.filetools import remove_dir, write_file
+from easybuild.tools.run import EasyBuildExit, run_shell_cmd
+from easybuild.tools.utilities import trace_msg
+
+MPI_MICROBENCHMARK_SRC = r"""
+#include <mpi.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#define WARMUP_ITERS 100
+#define LATENCY_ITERS 10000
+#define BANDWIDTH_ITERS 100
+#define BANDWIDTH_MSG_SIZE (1 << 20)
+#define ALLREDUCE_ITERS 10000
+
+/* ping-pong between ranks 0 and 1, returns time for specified number of round trips (on rank 0) */
+static double pingpong(int rank, char *buf, int msg_size, int iters)
+{
+    double start = 0.0;
+    int i;
+
+    MPI_Barrier(MPI_COMM_WORLD);
+    for (i = -WARMUP_ITERS; i < iters; i++) {
+        if (i == 0) {
+            start = MPI_Wtime();
+        }
+        if (rank == 0) {
+            MPI_Send(buf, msg_size, MPI_CHAR, 1, 0, MPI_COMM_WORLD);
+            MPI_Recv(buf, msg_size, MPI_CHAR, 1, 0, MPI_COMM_WORLD, MPI_STATUS_IGNORE);
+        } else if (rank == 1) {
+            MPI_Recv(buf, msg_size, MPI_CHAR, 0, 0, MPI_COMM_WORLD, MPI_STATUS_IGNORE);
+            MPI_Send(buf, msg_size, MPI_CHAR, 0, 0, MPI_COMM_WORLD);
+        }
+    }
+    return MPI_Wtime() - start;
+}
+
+int main(int argc, char **argv)
+{
+    int rank, size, i;
+    double latency, bandwidth, start, allreduce, max_allreduce, in = 1.0, out;
+    char *buf;
+
+    MPI_Init(&argc, &argv);
+    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    MPI_Comm_size(MPI_COMM_WORLD, &size);
+    if (size < 2) {
+        fprintf(stderr, "MPI microbenchmark requires at least 2 ranks\n");
+        MPI_Abort(MPI_COMM_WORLD, 1);
+    }
+
+    buf = malloc(BANDWIDTH_MSG_SIZE);
+    memset(buf, 0, BANDWIDTH_MSG_SIZE);
+
+    /* one-way latency for small messages, in microseconds */
+    latency = pingpong(rank, buf, 8, LATENCY_ITERS) / (2.0 * LATENCY_ITERS) * 1e6;
+    /* bandwidth for large messages, in MB/s */
+    bandwidth = pingpong(rank, buf, BANDWIDTH_MSG_SIZE, BANDWIDTH_ITERS);
+    bandwidth = 2.0 * BANDWIDTH_ITERS * BANDWIDTH_MSG_SIZE / bandwidth / 1e6;
+
+    /* latency of allreduce of a single double across all ranks, in microseconds (slowest rank) */
+    MPI_Barrier(MPI_COMM_WORLD);
+    start = 0.0;
+    for (i = -WARMUP_ITERS; i < ALLREDUCE_ITERS; i++) {
+        if (i == 0) {
+            start = MPI_Wtime();
+        }
+        MPI_Allreduce(&in, &out, 1, MPI_DOUBLE, MPI_SUM, MPI_COMM_WORLD);
+    }
+    allreduce = (MPI_Wtime() - start) / ALLREDUCE_ITERS * 1e6;
+    MPI_Reduce(&allreduce, &max_allreduce, 1, MPI_DOUBLE, MPI_MAX, 0, MPI_COMM_WORLD);
+
+    if (rank == 0) {
+        printf("ranks: %d\n", size);
+        printf("pingpong_latency_us: %.3f\n", latency);
+        printf("pingpong_bandwidth_MBps: %.1f\n", bandwidth);
+        printf("allreduce_latency_us: %.3f\n", max_allreduce);
+    }
+
+    free(buf);
+    MPI_Finalize();
+    return 0;
+}
+"""
+
+# thresholds that can be specified for results of MPI microbenchmark,
+# with name of corresponding result, and whether it's an upper limit (True) or lower limit (False)
+MPI_MICROBENCHMARK_THRESHOLDS = {
+    'max_latency': ('pingpong_latency_us', True),
+    'min_bandwidth': ('pingpong_bandwidth_MBps', False),
+    'max_allreduce_latency': ('allreduce_latency_us', True),
+}
+
+
+def parse_mpi_microbenchmark_output(output):
+    """Parse output of MPI microbenchmark, returns dict with results."""
+    results = {}
+    for key, value in re.findall(r'^(ranks|\w+_(?:us|MBps)): ([0-9.]+)\s*$', output, re.M):
+        results[key] = int(value) if key == 'ranks' else float(value)
+
+    expected = ['ranks'] + [x[0] for x in MPI_MICROBENCHMARK_THRESHOLDS.values()]
+    missing = [key for key in expected if key not in results]
+    if missing:
+        raise EasyBuildError("Failed to determine %s from output of MPI microbenchmark: %s",
+                             ', '.join(missing), output)
+    return results
+
+
+def check_mpi_microbenchmark_results(results, thresholds):
+    """
+    Check results of MPI microbenchmark against specified thresholds.
+
+    :param results: dict with results (see parse_mpi_microbenchmark_output)
+    :param thresholds: dict with thresholds (see MPI_MICROBENCHMARK_THRESHOLDS for supported keys)
+    :return: list of messages for results that do not meet the thresholds
+    """
+    unknown = sorted(key for key in thresholds if key not in MPI_MICROBENCHMARK_THRESHOLDS)
+    if unknown:
+        raise EasyBuildError("Unknown threshold(s) for MPI microbenchmark: %s (known thresholds: %s)",
+                             ', '.join(unknown), ', '.join(sorted(MPI_MICROBENCHMARK_THRESHOLDS)))
+
+    fail_msgs = []
+    for key, threshold in sorted(thresholds.items()):
+        result_key, upper_limit = MPI_MICROBENCHMARK_THRESHOLDS[key]
+        value = results[result_key]
+        if (upper_limit and value > threshold) or (not upper_limit and value < threshold):
+            fail_msgs.append("MPI microbenchmark result %s=%s does not meet threshold %s=%s" %
+                             (result_key, value, key, threshold))
+    return fail_msgs
+
+
+def sanity_check_mpi_microbenchmark(easyblock, mpi_cmd_tmpl, params, thresholds, nr_ranks=2, compiler='mpicc',
+                                    extra_env=''):
+    """
+    Build and run on-node MPI microbenchmark as part of sanity check for specified easyblock,
+    and check the results against the specified thresholds (failures are reported as sanity check failures).
+
+    :param mpi_cmd_tmpl: template for MPI command (see get_mpi_cmd_template), params: parameters for template
+    :param thresholds: dict with thresholds for results (an empty dict only logs the results)
+    :param nr_ranks: number of MPI ranks to use (at least 2, ping-pong is done between first 2 ranks)
+    :param compiler: MPI compiler wrapper to use to build the microbenchmark
+    :param extra_env: environment variables to set when running the microbenchmark (string that prefixes command)
+    """
+    params = dict(params, nr_ranks=max(2, nr_ranks), cmd='./mpi_microbenchmark')
+    cmd = "%s -O2 mpi_microbenchmark.c -o mpi_microbenchmark && %s %s" % (compiler, extra_env, mpi_cmd_tmpl % params)
+
+    if easyblock.dry_run:
+        easyblock.dry_run_msg("MPI microbenchmark: %s (thresholds: %s)", cmd, thresholds)
+        return
+
+    if not easyblock.sanity_check_module_loaded:
+        easyblock.sanity_check_load_module()
+
+    work_dir = tempfile.mkdtemp(prefix='eb-mpi-microbenchmark-')
+    try:
+        write_file(os.path.join(work_dir, 'mpi_microbenchmark.c'), MPI_MICROBENCHMARK_SRC)
+        res = run_shell_cmd(cmd, work_dir=work_dir, fail_on_error=False)
+    finally:
+        remove_dir(work_dir)
+
+    fail_msgs = []
+    if res.exit_code != EasyBuildExit.SUCCESS:
+        fail_msgs.append("MPI microbenchmark failed with exit code %s: %s" % (res.exit_code, res.output))
+    else:
+        try:
+            results = parse_mpi_microbenchmark_output(res.output)
+            easyblock.log.info("Results of MPI microbenchmark: %s", results)
+            trace_msg("MPI microbenchmark (%d ranks): latency %.2f us, bandwidth %.1f MB/s, allreduce %.2f us" % (
+                results['ranks'], results['pingpong_latency_us'], results['pingpong_bandwidth_MBps'],
+                results['allreduce_latency_us']))
+            fail_msgs.extend(check_mpi_microbenchmark_results(results, thresholds))
+        except EasyBuildError as err:
+            fail_msgs.append(err.msg)
+
+    for fail_msg in fail_msgs:
+        easyblock.sanity_check_fail_msgs.append(fail_msg)
+        easyblock.exit_code = EasyBuildExit.FAIL_SANITY_CHECK
+        easyblock.log.warning("Sanity check: %s", fail_msg)
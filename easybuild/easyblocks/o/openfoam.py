@@ -36,6 +36,7 @@ EasyBuild support for building and installing OpenFOAM, implemented as an easybl
 """
 
 import glob
+import hashlib
 import os
 import re
 import shutil
@@ -46,16 +47,23 @@ from easybuild.tools import LooseVersion
 
 import easybuild.tools.environment as env
 import easybuild.tools.toolchain as toolchain
+from easybuild.easyblocks.elfscan import sanity_check_linked_shared_libs_elf_only
 from easybuild.easyblocks.generic.cmakemake import setup_cmake_env
+from easybuild.easyblocks.permissions import adjust_permissions_tree
 from easybuild.framework.easyblock import EasyBlock
 from easybuild.framework.easyconfig import CUSTOM
 from easybuild.toolchains.compiler.fujitsu import TC_CONSTANT_FUJITSU
 from easybuild.tools.build_log import EasyBuildError
-from easybuild.tools.filetools import adjust_permissions, apply_regex_substitutions, mkdir, write_file
+from easybuild.tools.config import build_path
+from easybuild.tools.filetools import apply_regex_substitutions, compute_checksum, copy_dir, mkdir, remove_dir
+from easybuild.tools.filetools import write_file
 from easybuild.tools.modules import get_software_root, get_software_version
-from easybuild.tools.run import run_shell_cmd
+from easybuild.tools.run import RunShellCmdError, run_shell_cmd
 from easybuild.tools.systemtools import get_shared_lib_ext, get_cpu_architecture, AARCH64, POWER
 
+# subdirectories of OpenFOAM directory that hold the wmake object tree (and the resulting binaries/libraries)
+WMAKE_OBJECT_TREE_SUBDIRS = ['build', 'platforms']
+
 
 class EB_OpenFOAM(EasyBlock):
     """Support for building and installing OpenFOAM."""
@@ -67,6 +75,9 @@ class EB_OpenFOAM(EasyBlock):
         extra_vars.update({
             'sanity_check_motorbike': [True, "Should the motorbike sanity check run?", CUSTOM],
             'sanity_check_oversubscribe': [True, "Should the motorbike sanity check use oversubscription?", CUSTOM],
+            'incremental_build': [False, "Preserve wmake object tree of failed installation attempt (until "
+                                         "installation succeeds), and continue from it in next build attempt "
+                                         "if sources and build settings did not change", CUSTOM],
         })
         return extra_vars
 
@@ -80,6 +91,10 @@ class EB_OpenFOAM(EasyBlock):
         self.openfoamdir = None
         self.thrdpartydir = None
 
+        # cache directory for wmake object tree (only for incremental builds), see det_build_cache_dir
+        self.build_cache_dir = None
+        self.object_tree_built = False
+
         # version may start with 'v' for some variants of OpenFOAM
         # we need to strip this off to avoid problems when comparing LooseVersion instances in Python 3
         clean_version = self.version.strip('v+')
@@ -335,6 +350,53 @@ class EB_OpenFOAM(EasyBlock):
                     ''')
                     write_file(have_cgal_script, eb_cgal_config, append=True)
 
+    def det_build_cache_dir(self, precmd):
+        """
+        Determine cache directory for wmake object tree (or None if incremental builds are disabled),
+        which is specific to the sources being used and the build settings derived from etc/bashrc.
+        Patches are deliberately not taken into account: wmake only rebuilds what is affected by patched files,
+        so adding a patch to fix a failing build does not require building from scratch.
+        """
+        if not self.cfg['incremental_build']:
+            return None
+
+        key = hashlib.sha256()
+        for src in sorted(self.src, key=lambda x: x['name']):
+            key.update(('%s %s\n' % (src['name'], compute_checksum(src['path'], checksum_type='sha256'))).encode())
+
+        res = run_shell_cmd("%s && env" % precmd, hidden=True)
+        for line in sorted(res.output.splitlines()):
+            if line.startswith(('WM_', 'FOAM_')):
+                key.update((line + '\n').encode())
+        key.update(self.cfg['prebuildopts'].encode())
+
+        return os.path.join(build_path(), 'openfoam-build-cache', '%s-%s' % (self.openfoamdir, key.hexdigest()[:16]))
+
+    def cache_object_tree(self, cache_dir):
+        """Cache wmake object tree in specified directory, replacing any previously cached object tree."""
+        self.log.info("Caching wmake object tree in %s", cache_dir)
+
+        openfoam_dir = os.path.join(self.installdir, self.openfoamdir)
+        # copy to temporary location first, so a partially cached object tree is never used
+        tmp_cache_dir = '%s.%d' % (cache_dir, os.getpid())
+        try:
+            for subdir in WMAKE_OBJECT_TREE_SUBDIRS:
+                if os.path.isdir(os.path.join(openfoam_dir, subdir)):
+                    copy_dir(os.path.join(openfoam_dir, subdir), os.path.join(tmp_cache_dir, subdir), symlinks=True)
+
+            # remove object trees cached for other sources or build settings, they can be very large
+            cache_prefix = os.path.join(os.path.dirname(cache_dir), self.openfoamdir + '-')
+            for old_cache_dir in glob.glob(cache_prefix + '*'):
+                if re.match(r'^[0-9a-f]{16}$', old_cache_dir[len(cache_prefix):]):
+                    remove_dir(old_cache_dir)
+
+            os.rename(tmp_cache_dir, cache_dir)
+        except (EasyBuildError, OSError) as err:
+            # failing to cache the object tree should not break the installation
+            self.log.warning("Failed to cache wmake object tree in %s: %s", cache_dir, err)
+            if os.path.exists(tmp_cache_dir):
+                remove_dir(tmp_cache_dir)
+
     def build_step(self):
         """Build OpenFOAM using make after sourcing script to set environment."""
 
@@ -351,6 +413,14 @@ class EB_OpenFOAM(EasyBlock):
         else:
             cleancmd = "wcleanAll"
 
+        # for incremental builds, restore object tree from previous failed installation attempt
+        # (if sources and build settings are the same), so the build continues where it left off
+        cache_dir = self.build_cache_dir = self.det_build_cache_dir(precmd)
+        if cache_dir and os.path.isdir(cache_dir):
+            self.log.info("Restoring wmake object tree from %s, not cleaning it", cache_dir)
+            copy_dir(cache_dir, os.path.join(self.installdir, self.openfoamdir), dirs_exist_ok=True, symlinks=True)
+            cleancmd = 'true'
+
         # make directly in install directory
         cmd_tmpl = "%(precmd)s && %(cleancmd)s && %(prebuildopts)s bash %(makecmd)s" % {
             'precmd': precmd,
@@ -358,36 +428,59 @@ class EB_OpenFOAM(EasyBlock):
             'prebuildopts': self.cfg['prebuildopts'],
             'makecmd': os.path.join(self.builddir, self.openfoamdir, '%s'),
         }
-        if self.is_extend and self.looseversion >= LooseVersion('3.0'):
-            qa = [
-                (r"Proceed without compiling ParaView \[Y/n\]", 'Y'),
-                (r"Proceed without compiling cudaSolvers\? \[Y/n\]", 'Y'),
-            ]
-            no_qa = [
-                ".* -o .*",
-                "checking .*",
-                "warning.*",
-                "configure: creating.*",
-                "%s .*" % os.environ['CC'],
-                "wmake .*",
-                "Making dependency list for source file.*",
-                r"\s*\^\s*",  # warning indicator
-                "Cleaning .*",
-            ]
-            run_shell_cmd(cmd_tmpl % 'Allwmake.firstInstall', qa_patterns=qa, qa_wait_patterns=no_qa, qa_timeout=500)
-        else:
-            cmd = 'Allwmake'
-            if self.looseversion > LooseVersion('1606'):
-                # use Allwmake -log option if possible since this can be useful during builds, but also afterwards
-                cmd += ' -log'
-                # source tarball for OpenFOAM v2412 does not include plugins,
-                # see discussion in https://github.com/easybuilders/easybuild-easyconfigs/pull/24663
-                if self.looseversion >= LooseVersion('2406') and self.version != 'v2412':
-                    # Also build the plugins
-                    cmd += ' && %s bash %s -log' % (self.cfg['prebuildopts'],
-                                                    os.path.join(self.builddir, self.openfoamdir, 'Allwmake-plugins'))
-
-            run_shell_cmd(cmd_tmpl % cmd)
+        try:
+            if self.is_extend and self.looseversion >= LooseVersion('3.0'):
+                qa = [
+                    (r"Proceed without compiling ParaView \[Y/n\]", 'Y'),
+                    (r"Proceed without compiling cudaSolvers\? \[Y/n\]", 'Y'),
+                ]
+                no_qa = [
+                    ".* -o .*",
+                    "checking .*",
+                    "warning.*",
+                    "configure: creating.*",
+                    "%s .*" % os.environ['CC'],
+                    "wmake .*",
+                    "Making dependency list for source file.*",
+                    r"\s*\^\s*",  # warning indicator
+                    "Cleaning .*",
+                ]
+                run_shell_cmd(cmd_tmpl % 'Allwmake.firstInstall', qa_patterns=qa, qa_wait_patterns=no_qa,
+                              qa_timeout=500)
+            else:
+                cmd = 'Allwmake'
+                if self.looseversion > LooseVersion('1606'):
+                    # use Allwmake -log option if possible since this can be useful during builds, but also afterwards
+                    cmd += ' -log'
+                    # source tarball for OpenFOAM v2412 does not include plugins,
+                    # see discussion in https://github.com/easybuilders/easybuild-easyconfigs/pull/24663
+                    if self.looseversion >= LooseVersion('2406') and self.version != 'v2412':
+                        # Also build the plugins
+                        plugins_cmd = os.path.join(self.builddir, self.openfoamdir, 'Allwmake-plugins')
+                        cmd += ' && %s bash %s -log' % (self.cfg['prebuildopts'], plugins_cmd)
+
+                run_shell_cmd(cmd_tmpl % cmd)
+        except (EasyBuildError, RunShellCmdError):
+            # cache object tree if build failed, so next build attempt can pick up where this one left off
+            if cache_dir:
+                self.cache_object_tree(cache_dir)
+            raise
+
+        # cached object tree is kept until installation succeeded (see post_processing_step),
+        # and object tree is cached again if a later step fails (see run_all_steps)
+        self.object_tree_built = True
+
+    def run_all_steps(self, *args, **kwargs):
+        """
+        Run all steps; for incremental builds, the wmake object tree is cached if a step after the build step fails
+        (like the test or install step), so the next installation attempt does not have to build from scratch.
+        """
+        try:
+            return super().run_all_steps(*args, **kwargs)
+        except EasyBuildError:
+            if self.build_cache_dir and self.object_tree_built:
+                self.cache_object_tree(self.build_cache_dir)
+            raise
 
     def det_psubdir(self):
         """Determine the platform-specific installation directory for OpenFOAM."""
@@ -424,16 +517,17 @@ class EB_OpenFOAM(EasyBlock):
         """Building was performed in install dir, so just fix permissions."""
 
         # fix permissions of OpenFOAM dir
+        # (read permissions for files and directories, execute permissions for directories, in a single pass)
         fullpath = os.path.join(self.installdir, self.openfoamdir)
-        adjust_permissions(fullpath, stat.S_IROTH, add=True, recursive=True, ignore_errors=True)
-        adjust_permissions(fullpath, stat.S_IXOTH, add=True, recursive=True, onlydirs=True, ignore_errors=True)
+        adjust_permissions_tree(fullpath, add_file_bits=stat.S_IROTH, add_dir_bits=stat.S_IROTH | stat.S_IXOTH,
+                                ignore_errors=True, max_workers=self.cfg.parallel)
 
         # fix permissions of ThirdParty dir and subdirs (also for 2.x)
         # if the thirdparty tarball is installed
         fullpath = os.path.join(self.installdir, self.thrdpartydir)
         if os.path.exists(fullpath):
-            adjust_permissions(fullpath, stat.S_IROTH, add=True, recursive=True, ignore_errors=True)
-            adjust_permissions(fullpath, stat.S_IXOTH, add=True, recursive=True, onlydirs=True, ignore_errors=True)
+            adjust_permissions_tree(fullpath, add_file_bits=stat.S_IROTH, add_dir_bits=stat.S_IROTH | stat.S_IXOTH,
+                                    ignore_errors=True, max_workers=self.cfg.parallel)
 
         # create symlinks in the lib directory to all libraries in the mpi subdirectory
         # to make sure they take precedence over the libraries in the dummy subdirectory
@@ -458,6 +552,19 @@ class EB_OpenFOAM(EasyBlock):
                 dst = os.path.join(libdir, libname)
                 os.symlink(os.path.join(mpilibssubdir, libname), dst)
 
+    def post_processing_step(self):
+        """Remove cached wmake object tree (for incremental builds), since it is no longer needed."""
+        super().post_processing_step()
+
+        if self.build_cache_dir and os.path.exists(self.build_cache_dir):
+            self.log.info("Removing cached wmake object tree %s", self.build_cache_dir)
+            remove_dir(self.build_cache_dir)
+
+    def sanity_check_linked_shared_libs(self, subdirs=None):
+        """Check for banned/required linked shared libraries, only for (dynamically linked) ELF files."""
+        return sanity_check_linked_shared_libs_elf_only(self, super().sanity_check_linked_shared_libs,
+                                                        subdirs=subdirs)
+
     def sanity_check_step(self):
         """Custom sanity check for OpenFOAM"""
         shlib_ext = get_shared_lib_ext()
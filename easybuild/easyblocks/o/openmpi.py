@@ -35,6 +35,9 @@ from easybuild.tools import LooseVersion
 import easybuild.tools.environment as env
 import easybuild.tools.toolchain as toolchain
 from easybuild.easyblocks.generic.configuremake import ConfigureMake
+from easybuild.easyblocks.mpibench import sanity_check_mpi_microbenchmark
+from easybuild.easyblocks.smoketests import sanity_check_compiler_smoke_tests
+from easybuild.framework.easyconfig import CUSTOM
 from easybuild.framework.easyconfig.constants import EASYCONFIG_CONSTANTS
 from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.config import build_option
@@ -46,6 +49,19 @@ from easybuild.tools.toolchain.mpi import get_mpi_cmd_template
 class EB_OpenMPI(ConfigureMake):
     """OpenMPI easyblock."""
 
+    @staticmethod
+    def extra_options(extra_vars=None):
+        """Extra easyconfig parameters specific to OpenMPI."""
+        extra_vars = ConfigureMake.extra_options(extra_vars)
+        extra_vars.update({
+            'mpi_microbenchmark': [None, "Thresholds for on-node MPI microbenchmark that is run in sanity check "
+                                         "when MPI tests are enabled, as dict with 'max_latency' (in us), "
+                                         "'min_bandwidth' (in MB/s) and/or 'max_allreduce_latency' (in us); "
+                                         "empty dict implies only logging results, None implies not running it",
+                                   CUSTOM],
+        })
+        return extra_vars
+
     def configure_step(self):
         """Custom configuration step for OpenMPI."""
 
@@ -255,11 +271,17 @@ class EB_OpenMPI(ConfigureMake):
                 "ompi_info | grep -E 'MCA accelerator: rocm'",
             ])
 
-        # Add minimal test program to sanity checks
+        # Add minimal test programs to sanity checks, which are built (and run) concurrently
         # Run with correct MPI launcher
         mpi_cmd_tmpl, params = get_mpi_cmd_template(toolchain.OPENMPI, {}, mpi_version=self.version)
         # Limit number of ranks to 8 to avoid it failing due to hyperthreading
         ranks = min(8, self.cfg.parallel)
+        # Allow oversubscription for tests (in case of hyperthreading)
+        if LooseVersion(self.version) >= '5.0':
+            extra_env = "PRTE_MCA_rmaps_default_mapping_policy=:oversubscribe"
+        else:
+            extra_env = "OMPI_MCA_rmaps_base_oversubscribe=1"
+        smoke_tests = []
         for srcdir, src, compiler in (
             ('examples', 'hello_c.c', 'mpicc'),
             ('examples', 'hello_mpifh.f', 'mpifort'),
@@ -277,20 +299,26 @@ class EB_OpenMPI(ConfigureMake):
                 self.log.info("Adding minimal MPI test program to sanity checks: %s", test_exe)
 
                 # Build test binary
-                custom_commands.append("%s %s -o %s" % (compiler, src_path, test_exe))
+                test_cmds = ["%s %s -o %s" % (compiler, src_path, test_exe)]
 
                 # Run the test if chosen
                 if build_option('mpi_tests'):
                     params.update({'nr_ranks': ranks, 'cmd': test_exe})
-                    # Allow oversubscription for this test (in case of hyperthreading)
-                    if LooseVersion(self.version) >= '5.0':
-                        extra_env = "PRTE_MCA_rmaps_default_mapping_policy=:oversubscribe"
-                    else:
-                        extra_env = "OMPI_MCA_rmaps_base_oversubscribe=1"
-                    custom_commands.append(extra_env + " " + mpi_cmd_tmpl % params)
+                    test_cmds.append(extra_env + " " + mpi_cmd_tmpl % params)
                     # Run with 1 process which may trigger other bugs
                     # See https://github.com/easybuilders/easybuild-easyconfigs/issues/12978
                     params['nr_ranks'] = 1
-                    custom_commands.append(mpi_cmd_tmpl % params)
+                    test_cmds.append(mpi_cmd_tmpl % params)
+
+                smoke_tests.append({'name': src, 'cmd': ' && '.join(test_cmds)})
+
+        # each test may use up to the specified number of ranks, so limit how many are run concurrently
+        max_workers = max(1, self.cfg.parallel // ranks) if build_option('mpi_tests') else None
+        custom_commands.extend(sanity_check_compiler_smoke_tests(self, smoke_tests, max_workers=max_workers,
+                                                                 descr='MPI smoke test'))
+
+        if build_option('mpi_tests') and self.cfg['mpi_microbenchmark'] is not None:
+            sanity_check_mpi_microbenchmark(self, mpi_cmd_tmpl, params, self.cfg['mpi_microbenchmark'],
+                                            nr_ranks=ranks, extra_env=extra_env)
 
         super().sanity_check_step(custom_paths=custom_paths, custom_commands=custom_commands)
@@ -34,12 +34,15 @@ from urllib.parse import urlparse
 from easybuild.tools import LooseVersion
 
 from easybuild.easyblocks.generic.bundle import Bundle
+from easybuild.easyblocks.hostfacts import run_host_probe_cmd
 from easybuild.framework.easyconfig import CUSTOM
 from easybuild.tools.build_log import EasyBuildError, print_warning
 from easybuild.tools.filetools import change_dir, expand_glob_paths, mkdir, read_file, symlink, which, write_file
-from easybuild.tools.run import run_shell_cmd
 from easybuild.tools.systemtools import DARWIN, LINUX, get_os_type, get_shared_lib_ext, find_library_path
 
+# environment variables that affect the results of pkg-config
+PKG_CONFIG_ENV_VARS = ['PKG_CONFIG_LIBDIR', 'PKG_CONFIG_PATH', 'PKG_CONFIG_SYSROOT_DIR']
+
 
 class EB_OpenSSL_wrapper(Bundle):
     """
@@ -261,7 +264,7 @@ class EB_OpenSSL_wrapper(Bundle):
 
         # Check system include paths for OpenSSL headers
         cmd = "LC_ALL=C gcc -E -Wp,-v -xc /dev/null"
-        res = run_shell_cmd(cmd, hidden=True, in_dry_run=True)
+        res = run_host_probe_cmd(cmd, env_vars=['CPATH', 'C_INCLUDE_PATH'], in_dry_run=True)
 
         sys_include_dirs = []
         for match in re.finditer(r'^\s(/[^\0\n]*)+', res.output, re.MULTILINE):
@@ -422,7 +425,7 @@ class EB_OpenSSL_wrapper(Bundle):
             return None, None
 
         cmd = "%s version" % bin_path
-        res = run_shell_cmd(cmd, fail_on_error=False, hidden=True, in_dry_run=True)
+        res = run_host_probe_cmd(cmd, fail_on_error=False, in_dry_run=True)
 
         try:
             bin_version = res.output.split(' ')[1]
@@ -482,7 +485,8 @@ Version: %(version)s
                 # check suffixed names with v1.1
                 pc_name_suffix = pc_name + '11'
                 pc_exists_cmd = "pkg-config --exists %s" % pc_name_suffix
-                res = run_shell_cmd(pc_exists_cmd, fail_on_error=False, hidden=True)
+                res = run_host_probe_cmd(pc_exists_cmd, env_vars=PKG_CONFIG_ENV_VARS, fail_on_error=False,
+                                         persist=False)
                 if res.exit_code == 0:
                     self.log.info("%s exists", pc_name_suffix)
                     pc_name = pc_name_suffix
@@ -492,7 +496,8 @@ Version: %(version)s
             for require_type in ['Requires', 'Requires.private']:
                 require_print = require_type.lower().replace('.', '-')
                 pc_print_cmd = "pkg-config --print-%s %s" % (require_print, pc_name)
-                res = run_shell_cmd(pc_print_cmd, fail_on_error=False, hidden=True)
+                res = run_host_probe_cmd(pc_print_cmd, env_vars=PKG_CONFIG_ENV_VARS, fail_on_error=False,
+                                         persist=False)
                 self.log.info("Output of '%s': %s", pc_print_cmd, res.output)
 
                 if res.output:
@@ -513,12 +518,14 @@ Version: %(version)s
                 pc_file['cflags'] = "Cflags: -I${includedir}"
                 # infer private libs through pkg-config
                 pc_libs_cmd = "pkg-config --libs %s" % pc_name
-                res = run_shell_cmd(pc_libs_cmd, fail_on_error=False, hidden=True)
+                res = run_host_probe_cmd(pc_libs_cmd, env_vars=PKG_CONFIG_ENV_VARS, fail_on_error=False,
+                                         persist=False)
                 self.log.info("Output of '%s': %s", pc_libs_cmd, res.output)
                 linker_libs = res.output
 
                 pc_libs_static_cmd = "pkg-config --libs --static %s" % pc_name
-                res = run_shell_cmd(pc_libs_static_cmd, fail_on_error=False, hidden=True)
+                res = run_host_probe_cmd(pc_libs_static_cmd, env_vars=PKG_CONFIG_ENV_VARS,
+                                         fail_on_error=False, persist=False)
                 self.log.info("Output of '%s': %s", pc_libs_static_cmd, res.output)
 
                 libs_priv = "%s " % res.output.rstrip()
@@ -35,10 +35,12 @@ EasyBuild support for building and installing Python, implemented as an easybloc
 """
 import difflib
 import glob
+import hashlib
 import json
 import os
 import re
 import fileinput
+import shlex
 import sys
 import tempfile
 from easybuild.tools import LooseVersion
@@ -49,10 +51,10 @@ from easybuild.easyblocks.generic.configuremake import ConfigureMake
 from easybuild.framework.easyconfig import CUSTOM
 from easybuild.framework.easyconfig.templates import PYPI_SOURCE
 from easybuild.tools.build_log import EasyBuildError, print_warning
-from easybuild.tools.config import build_option, ERROR, EBPYTHONPREFIXES
+from easybuild.tools.config import build_option, build_path, ERROR, EBPYTHONPREFIXES
 from easybuild.tools.modules import get_software_libdir, get_software_root, get_software_version
-from easybuild.tools.filetools import apply_regex_substitutions, change_dir, mkdir
-from easybuild.tools.filetools import read_file, remove_dir, symlink, write_file
+from easybuild.tools.filetools import apply_regex_substitutions, change_dir, compute_checksum, copy_dir, copy_file
+from easybuild.tools.filetools import mkdir, read_file, remove_dir, symlink, write_file
 from easybuild.tools.run import run_shell_cmd
 from easybuild.tools.systemtools import get_shared_lib_ext
 from easybuild.tools.utilities import trace_msg
@@ -65,6 +67,9 @@ EXTS_FILTER_DUMMY_PACKAGES = ("python -m pip show -q '%(ext_name)s'", "")
 # magic value for unlimited stack size
 UNLIMITED = 'unlimited'
 
+# stamp file created by CPython build procedure once training workload for PGO has been run
+PGO_PROFILE_RUN_STAMP = 'profile-run-stamp'
+
 # Environment variables and values to avoid common issues during Python package installations and usage in EasyBuild
 PY_ENV_VARS = {
     # don't add user site directory to sys.path (equivalent to python -s), see https://www.python.org/dev/peps/pep-0370
@@ -419,6 +424,13 @@ class EB_Python(ConfigureMake):
                             "pip & setuptools by installing newer versions as extensions!",
                             CUSTOM],
             'optimized': [True, "Build with expensive, stable optimizations (PGO, etc.) (version >= 3.5.4)", CUSTOM],
+            'pgo_profile_task': [None, "Custom training workload for PGO, as arguments for the Python command "
+                                       "that is built (value for PROFILE_TASK, default: subset of regression tests)",
+                                 CUSTOM],
+            'reuse_pgo_profile': [False, "Cache profile collected by running training workload for PGO, "
+                                         "and reuse it (skipping the training) in subsequent builds with "
+                                         "same sources, compiler and build options (only supported with GCC, "
+                                         "for which profile consists of *.gcda files)", CUSTOM],
             'ulimit_unlimited': [False, "Ensure stack size limit is set to '%s' during build" % UNLIMITED, CUSTOM],
             'use_lto': [None, "Build with Link Time Optimization (>= v3.7.0, potentially unstable on some toolchains). "
                         "If None: auto-detect based on toolchain compiler (version)", CUSTOM],
@@ -776,12 +788,26 @@ class EB_Python(ConfigureMake):
     def build_step(self, *args, **kwargs):
         """Custom build procedure for Python, ensure stack size limit is set to 'unlimited' (if desired)."""
 
+        enable_opts_flag = '--enable-optimizations'
+        pgo = enable_opts_flag in self.cfg['configopts']
+
+        if pgo and self.cfg['pgo_profile_task']:
+            self.cfg.update('buildopts', "PROFILE_TASK=%s" % shlex.quote(self.cfg['pgo_profile_task']))
+
+        pgo_cache_dir = self.det_pgo_profile_cache_dir() if pgo else None
+        reused_pgo_profile = False
+        if pgo_cache_dir and os.path.isdir(pgo_cache_dir):
+            self.log.info("Reusing cached PGO profile from %s, so training workload is not run", pgo_cache_dir)
+            copy_dir(pgo_cache_dir, self.cfg['start_dir'], dirs_exist_ok=True)
+            write_file(os.path.join(self.cfg['start_dir'], PGO_PROFILE_RUN_STAMP), '')
+            reused_pgo_profile = True
+
         # make sure installation directory doesn't already exist when building with --rpath and
         # configuring with --enable-optimizations, since that leads to errors like:
         #   ./python: symbol lookup error: ./python: undefined symbol: __gcov_indirect_call
-        # see also https://bugs.python.org/issue29712
-        enable_opts_flag = '--enable-optimizations'
-        if build_option('rpath') and enable_opts_flag in self.cfg['configopts'] and os.path.exists(self.installdir):
+        # see also https://bugs.python.org/issue29712;
+        # not needed when a cached PGO profile is reused, since the training workload is not run then
+        if build_option('rpath') and pgo and not reused_pgo_profile and os.path.exists(self.installdir):
             warning_msg = "Removing existing installation directory '%s', "
             warning_msg += "because EasyBuild is configured to use RPATH linking "
             warning_msg += "and %s configure option is used." % enable_opts_flag
@@ -813,6 +839,65 @@ class EB_Python(ConfigureMake):
 
         super().build_step(*args, **kwargs)
 
+        if pgo_cache_dir and not reused_pgo_profile:
+            self.cache_pgo_profile(pgo_cache_dir)
+
+    def det_pgo_profile_cache_dir(self):
+        """
+        Determine cache directory for PGO profile (or None if reusing PGO profiles is disabled or not supported),
+        which is specific to the sources and patches being used, the compiler, and the build options.
+        """
+        if not self.cfg['reuse_pgo_profile']:
+            return None
+
+        # only *.gcda files produced by GCC are cached, other compilers collect profiles differently
+        comp_family = self.toolchain.comp_family()
+        if comp_family != toolchain.GCC:
+            self.log.info("Not reusing PGO profile, not supported for compiler family %s", comp_family)
+            return None
+
+        # profile can only be reused if build procedure skips training when profile-run-stamp file is present
+        makefile = os.path.join(self.cfg['start_dir'], 'Makefile')
+        if not os.path.exists(makefile) or not re.search('^%s:' % PGO_PROFILE_RUN_STAMP, read_file(makefile), re.M):
+            self.log.info("Not reusing PGO profile, no '%s' target found in %s", PGO_PROFILE_RUN_STAMP, makefile)
+            return None
+
+        key = hashlib.sha256()
+        for src in sorted(self.src + self.patches, key=lambda x: x['name']):
+            key.update(('%s %s\n' % (src['name'], compute_checksum(src['path'], checksum_type='sha256'))).encode())
+        compiler_version = get_software_version('GCCcore') or get_software_version('GCC') or ''
+        items = [comp_family, compiler_version]
+        items.extend(os.getenv(x, '') for x in ('CC', 'CFLAGS', 'LDFLAGS'))
+        items.extend(self.cfg[x] for x in ('preconfigopts', 'configopts', 'prebuildopts', 'buildopts'))
+        for item in items:
+            key.update((item + '\n').encode())
+
+        return os.path.join(build_path(), 'python-pgo-profiles', '%s-%s' % (self.version, key.hexdigest()[:16]))
+
+    def cache_pgo_profile(self, cache_dir):
+        """Cache PGO profile (*.gcda files in build directory) in specified directory."""
+        start_dir = self.cfg['start_dir']
+        profile_files = []
+        for dirpath, _, filenames in os.walk(start_dir):
+            profile_files.extend(os.path.join(dirpath, fn) for fn in filenames if fn.endswith('.gcda'))
+
+        if not profile_files:
+            self.log.warning("No PGO profile files found in %s, so not caching PGO profile", start_dir)
+            return
+
+        self.log.info("Caching PGO profile (%d files) in %s", len(profile_files), cache_dir)
+        # copy to temporary location first, so a partial PGO profile is never used
+        tmp_cache_dir = '%s.%d' % (cache_dir, os.getpid())
+        try:
+            for path in profile_files:
+                copy_file(path, os.path.join(tmp_cache_dir, os.path.relpath(path, start_dir)))
+            os.rename(tmp_cache_dir, cache_dir)
+        except (EasyBuildError, OSError) as err:
+            # failing to cache the PGO profile should not break the installation
+            self.log.warning("Failed to cache PGO profile in %s: %s", cache_dir, err)
+            if os.path.exists(tmp_cache_dir):
+                remove_dir(tmp_cache_dir)
+
     @property
     def site_packages_path(self):
         return os.path.join('lib', 'python' + self.pyshortver, 'site-packages')
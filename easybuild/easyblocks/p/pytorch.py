@@ -35,6 +35,7 @@ import sys
 import tempfile
 import xml.etree.ElementTree as ET
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from itertools import chain, groupby
 from operator import attrgetter
@@ -43,6 +44,7 @@ from typing import Dict, Iterable, List, Optional
 
 import easybuild.tools.environment as env
 from easybuild.easyblocks.generic.pythonpackage import PythonPackage
+from easybuild.easyblocks.testhistory import TEST_FAILED, TEST_PASSED, TEST_SKIPPED, TestHistory
 from easybuild.framework.easyconfig import CUSTOM
 from easybuild.tools import LooseVersion
 from easybuild.tools.build_log import EasyBuildError, print_warning
@@ -252,6 +254,7 @@ class EB_PyTorch(PythonPackage):
     """Support for building/installing PyTorch."""
 
     GENERATE_TEST_REPORT_VAR_NAME = 'EASYBUILD_WRITE_PYTORCH_TEST_REPORTS'
+    TEST_REPORTS_DIR_VAR_NAME = 'EASYBUILD_PYTORCH_TEST_REPORTS_DIR'
 
     @staticmethod
     def extra_options():
@@ -263,6 +266,10 @@ class EB_PyTorch(PythonPackage):
                                 "set by the PyTorch EasyBlock, for example ['USE_MKLDNN=0'].", CUSTOM],
             'excluded_tests': [{}, "Mapping of architecture strings to list of tests to be excluded", CUSTOM],
             'max_failed_tests': [10, "Maximum number of failing tests", CUSTOM],
+            'test_shards': [1, "Number of shards to split the PyTorch test suite into, "
+                               "which are run concurrently (using the --shard option of run_test.py)", CUSTOM],
+            'max_flaky_test_retries': [10, "Maximum number of failed tests that are known to be flaky "
+                                           "which are retried in isolation (requires $EB_TEST_HISTORY_DIR)", CUSTOM],
             # Relax checking of failed test suites (files)
             'allow_extra_failures': [True, "Do not fail if more failing test suites in XML files are found than shown"
                                            " in stdout of the test command. Can overestimate number of failed tests."
@@ -291,6 +298,8 @@ class EB_PyTorch(PythonPackage):
         super().__init__(*args, **kwargs)
         self.options['modulename'] = 'torch'
         self.has_xml_test_reports = False
+        self.test_history = None
+        self.flaky_test_retries = {}
 
         self.tmpdir = tempfile.mkdtemp(suffix='-pytorch-build')
 
@@ -406,9 +415,13 @@ class EB_PyTorch(PythonPackage):
             else:
                 # Replace the condition to enable the XML test reports to use our variable instead of $IS_CI/$IS_IN_CI
                 # The variable is used because the file gets installed and we shouldn't change the default behavior.
+                # Also allow to specify the directory to write the XML test reports to, used when running test shards.
+                report_path = (f'os.path.join(os.getenv("{self.TEST_REPORTS_DIR_VAR_NAME}", ""), '
+                               '_get_test_report_path())')
                 apply_regex_substitutions('torch/testing/_internal/common_utils.py',
-                                          [(r'(default=_get_test_report_path\(\) if) IS(_IN)?_CI else None',
-                                            fr'\1 os.getenv("{self.GENERATE_TEST_REPORT_VAR_NAME}") else None')],
+                                          [(r'default=_get_test_report_path\(\) if IS(_IN)?_CI else None',
+                                            f'default={report_path} if '
+                                            f'os.getenv("{self.GENERATE_TEST_REPORT_VAR_NAME}") else None')],
                                           backup=False, on_missing_match=ERROR)
                 if pytorch_version < '2.8.0':
                     if pytorch_version >= '2.1.0':
@@ -566,20 +579,124 @@ class EB_PyTorch(PythonPackage):
         self.cfg.update('prebuildopts', ' '.join(unique_options) + ' ')
         self.cfg.update('preinstallopts', ' '.join(unique_options) + ' ')
 
+    def _get_cache_dirs(self, tmpdir):
+        """Return $XDG_CACHE_HOME and $TRITON_HOME to use for specified temporary directory (as dict)"""
+        cache_dir = os.path.join(tmpdir, '.cache')
+        # The path must exist!
+        mkdir(cache_dir, parents=True)
+        # Triton also uses a path defaulting to $HOME
+        triton_home = os.path.join(tmpdir, '.triton_home')
+        return {'XDG_CACHE_HOME': cache_dir, 'TRITON_HOME': triton_home}
+
     def _set_cache_dirs(self):
         """Set $XDG_CACHE_HOME and $TRITON_HOME to avoid PyTorch defaulting to $HOME
         and similar variables to ensure clean build/test environment
         """
-        cache_dir = os.path.join(self.tmpdir, '.cache')
-        # The path must exist!
-        mkdir(cache_dir, parents=True)
-        env.setvar('XDG_CACHE_HOME', cache_dir)
-        # Triton also uses a path defaulting to $HOME
         # Isolate against user-set variables which could lead to reusing caches that may fail test
         env.unset_env_vars(('TRITON_DUMP_DIR', 'TRITON_OVERRIDE_DIR', 'TRITON_CACHE_DIR',
                             'TORCH_HOME', 'TORCHINDUCTOR_CACHE_DIR', 'PYTORCH_KERNEL_CACHE_PATH'))
-        triton_home = os.path.join(self.tmpdir, '.triton_home')
-        env.setvar('TRITON_HOME', triton_home)
+        for key, value in self._get_cache_dirs(self.tmpdir).items():
+            env.setvar(key, value)
+
+    def _get_test_shard_dir(self, shard):
+        """Return (temporary) directory for specified test shard"""
+        return os.path.join(self.tmpdir, f'test-shard-{shard}')
+
+    def _get_test_reports_path(self):
+        """Return path to XML test reports (or list of paths, one per test shard)"""
+        if self.cfg['test_shards'] > 1:
+            return [Path(self._get_test_shard_dir(shard)) for shard in range(1, self.cfg['test_shards'] + 1)]
+        else:
+            return Path(self.start_dir) / 'test' / 'test-reports'
+
+    def _retry_flaky_tests(self, cmd):
+        """
+        Retry failed tests that are known to be flaky (according to the test history) in isolation,
+        and keep track of whether they passed.
+        """
+        self.flaky_test_retries = {}
+        try:
+            xml_results = get_test_results(self._get_test_reports_path())
+        except ValueError as err:
+            self.log.warning("Not retrying flaky tests, failed to parse test results: %s", err)
+            return
+
+        failed_tests = {}
+        for suite in xml_results.values():
+            for test_name in suite.get_errored_tests() + suite.get_failed_tests():
+                failed_tests[f'{suite.name}::{test_name}'] = (suite.name, test_name)
+        flaky_tests = self.test_history.classify_failures(sorted(failed_tests))[1]
+        if not flaky_tests:
+            return
+
+        # run in same environment as test command, but without generating XML test reports
+        testcmd = self.testcmd % {'python': self.python_cmd}
+        cmd_prefix = cmd[:cmd.index(testcmd)] if testcmd in cmd else ''
+        test_dir = os.path.join(self.start_dir, 'test')
+
+        max_retries = self.cfg['max_flaky_test_retries']
+        if len(flaky_tests) > max_retries:
+            self.log.warning("Only retrying %d out of %d failed tests that are known to be flaky",
+                             max_retries, len(flaky_tests))
+        for test in flaky_tests[:max_retries]:
+            suite_name, test_name = failed_tests[test]
+            # tests of distributed variants (like dist-gloo) require a specific configuration to run
+            if suite_name.startswith('dist-') or not os.path.isfile(os.path.join(test_dir, suite_name + '.py')):
+                self.log.info("Not retrying test %s, don't know how to run it in isolation", test)
+                continue
+            # only retain class and method name, since pytest reports also include the module name
+            pattern = '.'.join(test_name.split('.')[-2:])
+            retry_cmd = f'{cmd_prefix} cd {test_dir} && {self.GENERATE_TEST_REPORT_VAR_NAME}= '
+            retry_cmd += f'{self.python_cmd} {suite_name}.py -k {pattern}'
+            res = run_shell_cmd(retry_cmd, fail_on_error=False)
+            self.flaky_test_retries[test] = res.exit_code == 0
+            self.log.info("Retry of flaky test %s in isolation %s", test, 'passed' if res.exit_code == 0 else 'failed')
+
+    def run_test_cmd(self, cmd, return_output_ec=False):
+        """
+        Run test command, split into shards that are run concurrently if 'test_shards' is set.
+        Each shard uses its own cache directories and directory for XML test reports.
+        Failed tests that are known to be flaky are retried in isolation afterwards, if a test history is kept.
+        """
+        num_shards = self.cfg['test_shards']
+        if num_shards <= 1:
+            res = super().run_test_cmd(cmd, return_output_ec=return_output_ec)
+            if self.test_history is not None and self.has_xml_test_reports:
+                self._retry_flaky_tests(cmd)
+            return res
+
+        # divide available cores across shards
+        max_jobs = max(1, self.cfg.parallel // num_shards)
+
+        def run_shard(shard):
+            shard_dir = self._get_test_shard_dir(shard)
+            shard_env = self._get_cache_dirs(shard_dir)
+            shard_env.update({
+                'MAX_JOBS': str(max_jobs),
+                self.TEST_REPORTS_DIR_VAR_NAME: shard_dir,
+            })
+            shard_cmd = 'export %s && %s --shard %d %d' % (
+                ' '.join(f'{key}={value}' for key, value in sorted(shard_env.items())), cmd, shard, num_shards)
+            return run_shell_cmd(shard_cmd, fail_on_error=False)
+
+        self.log.info("Running PyTorch tests in %d shards", num_shards)
+        with ThreadPoolExecutor(max_workers=num_shards) as thread_pool:
+            results = list(thread_pool.map(run_shard, range(1, num_shards + 1)))
+
+        outputs, exit_code = [], 0
+        for shard, res in enumerate(results, start=1):
+            self.log.info("Test shard %d/%d exited with exit code %s", shard, num_shards, res.exit_code)
+            outputs.append(f'Output of test shard {shard}/{num_shards}:\n{res.output}')
+            exit_code = exit_code or res.exit_code
+
+        if not return_output_ec and exit_code:
+            raise EasyBuildError("Tests failed (exit code %s) for shards: %s", exit_code,
+                                 ', '.join(str(shard) for shard, res in enumerate(results, start=1) if res.exit_code))
+
+        if self.test_history is not None and self.has_xml_test_reports:
+            self._retry_flaky_tests(cmd)
+
+        return ('\n'.join(outputs), exit_code) if return_output_ec else (None, None)
 
     def _compare_test_results(self, old_result, xml_result, old_failed_test_names, xml_failed_test_names):
         """Compare test results parsed from stdout and XML files"""
@@ -628,6 +745,47 @@ class EB_PyTorch(PythonPackage):
         if diffs:
             self.log.warning("Found differences when parsing stdout and XML files:\n\t" + "\n\t".join(diffs))
 
+    def _process_test_history(self, xml_results):
+        """
+        Report failed tests as new failures or historically flaky (or known) failures based on the test history,
+        take into account flaky tests that passed when retried in isolation, and record outcome of all tests.
+
+        :return: set of names of test suites that no longer have failed tests
+        """
+        failed_tests = sorted(f'{suite.name}::{test_name}' for suite in xml_results.values()
+                              for test_name in suite.get_errored_tests() + suite.get_failed_tests())
+        new_failures, flaky, known_failures = self.test_history.classify_failures(failed_tests)
+        msgs = []
+        for descr, tests in (('new failures', new_failures), ('historically flaky', flaky),
+                             ('known failures', known_failures)):
+            if tests:
+                msgs.append(f"{len(tests)} failed tests are {descr}: {', '.join(tests)}")
+        if msgs:
+            self.log.warning("Classification of failed tests based on test history in %s:\n%s",
+                             self.test_history.path, '\n'.join(msgs))
+
+        outcomes = {
+            TestState.SUCCESS: TEST_PASSED,
+            TestState.FAILURE: TEST_FAILED,
+            TestState.ERROR: TEST_FAILED,
+            TestState.SKIPPED: TEST_SKIPPED,
+        }
+        fixed_suites = set()
+        for suite in xml_results.values():
+            failed_before = suite.failures + suite.errors
+            for test in list(suite.get_tests()):
+                test_id = f'{suite.name}::{test.name}'
+                self.test_history.record(test_id, outcomes[test.state], duration=test.duration)
+                if self.flaky_test_retries.get(test_id) and test.state in (TestState.FAILURE, TestState.ERROR):
+                    self.log.info("Not counting failure of flaky test %s, since it passed when retried", test_id)
+                    suite.replace_test(TestCase(test.name, state=TestState.SUCCESS, num_reruns=test.num_reruns + 1,
+                                                duration=test.duration))
+            if failed_before and suite.failures + suite.errors == 0:
+                fixed_suites.add(suite.name)
+        self.test_history.save()
+
+        return fixed_suites
+
     def test_step(self):
         """Run unit tests"""
         self._set_cache_dirs()
@@ -651,6 +809,9 @@ class EB_PyTorch(PythonPackage):
             'excluded_tests': ' '.join(excluded_tests)
         })
 
+        self.test_history = TestHistory.for_installation(self.name, self.version, self.cfg['toolchain'])
+        self.flaky_test_retries = {}
+
         test_step_result = super().test_step(return_output_ec=True)
         if test_step_result is None:
             if self.cfg['runtest'] is False:
@@ -665,13 +826,16 @@ class EB_PyTorch(PythonPackage):
         parsed_test_result = parse_test_log(tests_out)
 
         if self.has_xml_test_reports:
-            test_reports_path = Path(self.start_dir) / 'test' / 'test-reports'
+            # test reports of all test shards are merged
+            test_reports_path = self._get_test_reports_path()
             try:
                 xml_results = get_test_results(test_reports_path)
             except ValueError as e:
                 raise EasyBuildError(f"Failed to parse test results at {test_reports_path}: {e}") from e
             if not xml_results:
-                files = [file for file in test_reports_path.rglob('*.*') if file.is_file()]
+                test_reports_paths = test_reports_path if isinstance(test_reports_path, list) else [test_reports_path]
+                files = [str(file) for path in test_reports_paths for file in path.rglob('*.*') if file.is_file()]
+                test_reports_path = ', '.join(str(path) for path in test_reports_paths)
                 if files:
                     msg = f'Did not find any test result at {test_reports_path}. Files: {", ".join(files)}'
                 else:
@@ -691,6 +855,10 @@ class EB_PyTorch(PythonPackage):
             if missing_suites:
                 raise EasyBuildError('Parsing the test result files missed the following failed suites: %s',
                                      ', '.join(sorted(missing_suites)))
+            if self.test_history is not None:
+                # suites for which all failed tests passed when retried should no longer be considered as failed
+                fixed_suites = self._process_test_history(xml_results)
+                parsed_test_result.all_failed_suites.difference_update(fixed_suites)
             # Replace results as the files should be more reliable than the parsed ones
             new_result = TestResult(test_cnt=sum(suite.num_tests for suite in xml_results.values()),
                                     error_cnt=sum(suite.errors for suite in xml_results.values()),
@@ -878,9 +1046,11 @@ if sys.version_info >= (3, 9):
         name: str
         state: TestState
         num_reruns: int
+        duration: float = 0.0  # in seconds
 else:
     from collections import namedtuple
-    TestCase = namedtuple('TestCase', ('name', 'state', 'num_reruns'))
+    TestCase = namedtuple('TestCase', ('name', 'state', 'num_reruns', 'duration'))
+    TestCase.__new__.__defaults__ = (0.0,)
 
 
 class TestSuite:
@@ -980,6 +1150,10 @@ def parse_test_cases(test_suite_el: ET.Element) -> List[TestCase]:
         # Ignore that and only check if it has one of the failure tags at least once.
         failed, errored, skipped = [testcase.find(tag) is not None for tag in ("failure", "error", "skipped")]
         num_reruns = len(testcase.findall("rerun"))
+        try:
+            duration = float(testcase.attrib.get("time", 0))
+        except ValueError:
+            duration = 0.0
 
         if skipped:
             if failed or errored:
@@ -988,7 +1162,7 @@ def parse_test_cases(test_suite_el: ET.Element) -> List[TestCase]:
         else:
             state = TestState.FAILURE if failed else TestState.ERROR if errored else TestState.SUCCESS
 
-        test_cases.append(TestCase(test_name, state=state, num_reruns=num_reruns))
+        test_cases.append(TestCase(test_name, state=state, num_reruns=num_reruns, duration=duration))
     return test_cases
 
 
@@ -1069,27 +1243,68 @@ def determine_suite_name(xml_file: Path, test_suite_xml: List[ET.Element]) -> Op
     return suite_name
 
 
-def parse_test_result_file(xml_file: Path) -> List[TestSuite]:
+# Cache of parsed test result files, see parse_test_result_file
+_test_result_file_cache = {}
+
+# Tags of child elements of <testcase> that are relevant to determine the outcome of a test, see parse_test_cases
+TEST_CASE_OUTCOME_TAGS = ('failure', 'error', 'skipped', 'rerun')
+
+
+def read_test_suite_elements(xml_file: Path) -> Optional[List[ET.Element]]:
     """
-    Parses the given XML file into TestSuite and TestCase objects.
+    Read <testsuite> elements from given XML file in a streaming fashion,
+    only retaining the attributes of the test suites and test cases, and the outcome tags of the test cases.
+    This avoids building the full element tree including (potentially huge) outputs of failed tests.
 
-    :param file_path: Path to an XML file storing test results.
-    :return: A list of TestSuite objects representing the parsed structure.
+    :return: list of (stripped down) <testsuite> elements, or None if the root element is not a <testsuite(s)> tag
+    """
+    test_suites: List[ET.Element] = []
+    root_tag = None
+    # stack of currently open elements, and (stripped down) test suite that is currently being read
+    stack: List[ET.Element] = []
+    test_suite = None
+
+    for event, elem in ET.iterparse(str(xml_file), events=('start', 'end')):
+        if event == 'start':
+            if root_tag is None:
+                root_tag = elem.tag
+                if root_tag not in ('testsuites', 'testsuite'):
+                    return None
+            stack.append(elem)
+            # only <testsuite> as root element or directly below root <testsuites> element are relevant
+            if elem.tag == 'testsuite' and len(stack) == (1 if root_tag == 'testsuite' else 2):
+                test_suite = ET.Element('testsuite', dict(elem.attrib))
+            continue
+
+        stack.pop()
+        if elem.tag == 'testcase' and test_suite is not None and len(stack) == (1 if root_tag == 'testsuite' else 2):
+            test_case = ET.SubElement(test_suite, 'testcase', dict(elem.attrib))
+            for child in elem:
+                if child.tag in TEST_CASE_OUTCOME_TAGS:
+                    ET.SubElement(test_case, child.tag)
+            elem.clear()
+        elif elem.tag == 'testsuite' and test_suite is not None and len(stack) == (0 if root_tag == 'testsuite' else 1):
+            test_suites.append(test_suite)
+            test_suite = None
+            elem.clear()
+
+    return test_suites
+
+
+def _parse_test_result_file(xml_file: Path) -> list:
+    """
+    Parses the given XML file into a list of tuples with name, number of errors/failures/skipped tests,
+    and test cases for each test suite.
     """
     try:
         try:
-            root = ET.parse(xml_file).getroot()
+            test_suite_xml = read_test_suite_elements(xml_file)
         except ET.ParseError:
             if '<test' not in xml_file.read_text():
                 return []  # Empty file, no test results
             raise
 
-        # Normalize root to be a list of test suite elements
-        if root.tag == "testsuites":
-            test_suite_xml: List[ET.Element] = root.findall("testsuite")
-        elif root.tag == "testsuite":
-            test_suite_xml = [root]
-        else:
+        if test_suite_xml is None:
             raise ValueError("Root element must be <testsuites> or <testsuite>.")
 
         # Suite name to correctly deduplicate tests and match against run_test.py output
@@ -1097,7 +1312,7 @@ def parse_test_result_file(xml_file: Path) -> List[TestSuite]:
         if suite_name is None:
             return []
 
-        test_suites: List[TestSuite] = []
+        test_suites = []
 
         for test_suite in test_suite_xml:
             # Those are based on the number of the corresponding elements in all <testcase>-elements.
@@ -1133,16 +1348,38 @@ def parse_test_result_file(xml_file: Path) -> List[TestSuite]:
                     if {old_test_case.state, test_case.state} != {TestState.ERROR, TestState.FAILURE}:
                         raise ValueError(f"Duplicate test case '{test_case}' in test suite {suite_name}")
 
-            test_suites.append(
-                TestSuite(name=suite_name, test_cases=test_cases,
-                          errors=errors, failures=failures, skipped=skipped,
-                          )
-            )
+            # Validate counts right away by creating a TestSuite instance
+            TestSuite(name=suite_name, test_cases=test_cases, errors=errors, failures=failures, skipped=skipped)
+            test_suites.append((suite_name, errors, failures, skipped, test_cases))
     except Exception as e:
         raise ValueError(f"Failed to parse test result file '{xml_file}': {e}") from e
     return test_suites
 
 
+def parse_test_result_file(xml_file: Path) -> List[TestSuite]:
+    """
+    Parses the given XML file into TestSuite and TestCase objects.
+    Parsed results are cached, based on path, size and modification time of the file.
+
+    :param file_path: Path to an XML file storing test results.
+    :return: A list of TestSuite objects representing the parsed structure.
+    """
+    try:
+        file_stat = xml_file.stat()
+    except OSError as e:
+        raise ValueError(f"Failed to parse test result file '{xml_file}': {e}") from e
+    cache_key = (os.path.abspath(str(xml_file)), file_stat.st_size, file_stat.st_mtime_ns)
+
+    parsed_test_suites = _test_result_file_cache.get(cache_key)
+    if parsed_test_suites is None:
+        parsed_test_suites = _parse_test_result_file(xml_file)
+        _test_result_file_cache[cache_key] = parsed_test_suites
+
+    # Always return new TestSuite instances, since those are modified when merging test suites
+    return [TestSuite(name=name, test_cases=dict(test_cases), errors=errors, failures=failures, skipped=skipped)
+            for (name, errors, failures, skipped, test_cases) in parsed_test_suites]
+
+
 def merge_test_suites(test_suites: Iterable[TestSuite]) -> TestSuite:
     """
     Combine results for all given test suites into a single instance.
@@ -1166,17 +1403,25 @@ def merge_test_suites(test_suites: Iterable[TestSuite]) -> TestSuite:
     return result_suite
 
 
-def get_test_results(folder: Path) -> Dict[str, TestSuite]:
-    """Return a dictionary of test results contained in the folder"""
-    if folder.name.startswith('test-reports'):
-        folders = [folder]
-    else:
-        # Gather all folders containing test-reports which might be named "test-reports_1"
-        # Fallback to only the folder
-        folders = [cur_dir for cur_dir in folder.glob('test-reports*') if cur_dir.is_dir()] or [folder]
-
-    files = (file for folder in folders for file in folder.rglob('*.xml'))
-    test_suites = chain.from_iterable(parse_test_result_file(file) for file in files)
+def get_test_results(folder) -> Dict[str, TestSuite]:
+    """
+    Return a dictionary of test results contained in the folder,
+    or in a list of folders (e.g. one per test shard), in which case results for the same suite are merged.
+    """
+    folders = []
+    for cur_folder in (folder if isinstance(folder, (list, tuple)) else [folder]):
+        if cur_folder.name.startswith('test-reports'):
+            folders.append(cur_folder)
+        else:
+            # Gather all folders containing test-reports which might be named "test-reports_1"
+            # Fallback to only the folder
+            folders.extend([cur_dir for cur_dir in cur_folder.glob('test-reports*') if cur_dir.is_dir()]
+                           or [cur_folder])
+
+    files = [file for folder in folders for file in folder.rglob('*.xml')]
+    # parsing is CPU-bound, so files are parsed one by one;
+    # files that were already parsed before (e.g. for a previous test run) are not parsed again
+    test_suites = list(chain.from_iterable(parse_test_result_file(file) for file in files))
     get_name = attrgetter('name')
     test_suites = sorted(test_suites, key=get_name)
     return {name: merge_test_suites(suites) for name, suites in groupby(test_suites, get_name)}
@@ -0,0 +1,158 @@
+##
+# Copyright 2009-2026 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://www.vscentrum.be),
+# Flemish Research Foundation (FWO) (http://www.fwo.be/en)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# https://github.com/easybuilders/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Adjusting permissions of (large) directory trees in a single pass.
+
+Compared to (repeatedly) using adjust_permissions from easybuild.tools.filetools,
+different permission bits can be added/removed for files and directories in one go,
+files are only inspected via (cheap) directory-relative system calls,
+and subdirectories are processed concurrently.
+"""
+import os
+import stat
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from easybuild.base import fancylogger
+from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.config import build_option
+
+_log = fancylogger.getLogger('easyblocks.permissions')
+
+
+def _new_mode(mode, add_bits, remove_bits):
+    """Determine new permissions, by adding/removing specified bits to/from current permissions."""
+    return (mode | add_bits) & ~remove_bits
+
+
+def _adjust_permissions_dir(path, file_bits, dir_bits):
+    """
+    Adjust permissions of files and subdirectories in specified directory (not recursively),
+    using system calls relative to a file descriptor for the directory (if supported).
+
+    :param file_bits: tuple with permission bits to add/remove for files
+    :param dir_bits: tuple with permission bits to add/remove for subdirectories
+    :return: tuple with list of subdirectories, number of checked paths, and list of (path, error) tuples
+    """
+    subdirs, cnt, errors = [], 0, []
+
+    # os.scandir only accepts a file descriptor in Python >= 3.7, fall back to using paths otherwise
+    dir_fd = None
+    if os.scandir in os.supports_fd:
+        try:
+            dir_fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        except OSError as err:
+            return subdirs, 1, [(path, err)]
+
+    try:
+        with os.scandir(path if dir_fd is None else dir_fd) as entries:
+            for entry in entries:
+                cnt += 1
+                try:
+                    # symlinks are never followed nor changed, since they may point out of the installation directory
+                    if entry.is_symlink():
+                        continue
+                    elif entry.is_dir(follow_symlinks=False):
+                        subdirs.append(os.path.join(path, entry.name))
+                        (add_bits, remove_bits) = dir_bits
+                    else:
+                        (add_bits, remove_bits) = file_bits
+
+                    mode = stat.S_IMODE(entry.stat(follow_symlinks=False).st_mode)
+                    new_mode = _new_mode(mode, add_bits, remove_bits)
+                    # only actually do chmod if current permissions are not correct already
+                    # (this is important because chmod requires that files are owned by current user)
+                    if new_mode != mode:
+                        if dir_fd is None:
+                            os.chmod(entry.path, new_mode)
+                        else:
+                            os.chmod(entry.name, new_mode, dir_fd=dir_fd)
+                except OSError as err:
+                    errors.append((os.path.join(path, entry.name), err))
+    except OSError as err:
+        errors.append((path, err))
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+
+    return subdirs, cnt, errors
+
+
+def adjust_permissions_tree(path, add_file_bits=0, remove_file_bits=0, add_dir_bits=0, remove_dir_bits=0,
+                            ignore_errors=False, max_workers=None):
+    """
+    Adjust permissions recursively for specified directory, in a single pass: permission bits to add/remove
+    can be specified separately for files and directories (including the specified directory itself).
+    Symbolic links are skipped. Subdirectories are processed concurrently.
+
+    :param path: path to directory
+    :param add_file_bits: permission bits to add for files
+    :param remove_file_bits: permission bits to remove for files
+    :param add_dir_bits: permission bits to add for directories
+    :param remove_dir_bits: permission bits to remove for directories
+    :param ignore_errors: ignore errors that occur when changing permissions
+                          (up to a maximum ratio specified by --max-fail-ratio-adjust-permissions configuration option)
+    :param max_workers: maximum number of directories to process concurrently
+    """
+    path = os.path.abspath(path)
+    _log.info("Adjusting permissions recursively for %s (files: +%s -%s, directories: +%s -%s)", path,
+              oct(add_file_bits), oct(remove_file_bits), oct(add_dir_bits), oct(remove_dir_bits))
+
+    file_bits = (add_file_bits, remove_file_bits)
+    dir_bits = (add_dir_bits, remove_dir_bits)
+
+    cnt, errors = 1, []
+    try:
+        path_st = os.lstat(path)
+        mode = stat.S_IMODE(path_st.st_mode)
+        if not stat.S_ISLNK(path_st.st_mode) and _new_mode(mode, *dir_bits) != mode:
+            os.chmod(path, _new_mode(mode, *dir_bits))
+    except OSError as err:
+        errors.append((path, err))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as thread_pool:
+        pending = {thread_pool.submit(_adjust_permissions_dir, path, file_bits, dir_bits)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                subdirs, subdir_cnt, subdir_errors = future.result()
+                cnt += subdir_cnt
+                errors.extend(subdir_errors)
+                pending.update(thread_pool.submit(_adjust_permissions_dir, x, file_bits, dir_bits) for x in subdirs)
+
+    if errors and not ignore_errors:
+        raise EasyBuildError("Failed to chmod several paths: %s (last error: %s)",
+                             [x[0] for x in errors], errors[-1][1])
+
+    for failed_path, err in errors:
+        _log.info("Failed to chmod %s (but ignoring it): %s", failed_path, err)
+
+    # we ignore some errors, but if there are too many, something is definitely wrong
+    fail_ratio = len(errors) / float(cnt)
+    max_fail_ratio = float(build_option('max_fail_ratio_adjust_permissions'))
+    if fail_ratio > max_fail_ratio:
+        raise EasyBuildError("%.2f%% of permissions operations failed (more than %.2f%%), "
+                             "something must be wrong...", 100 * fail_ratio, 100 * max_fail_ratio)
+
+    _log.info("Adjusted permissions for %d paths in %s (%d failures)", cnt, path, len(errors))
@@ -0,0 +1,161 @@
+##
+# Copyright 2009-2026 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://www.vscentrum.be),
+# Flemish Research Foundation (FWO) (http://www.fwo.be/en)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# https://github.com/easybuilders/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Profiling of (sections of) installation procedures, like steps, components, stages or variants.
+
+Wall time, CPU time, memory usage and disk I/O are recorded for each section as a trace event,
+and written to a profile trace file next to the build log, in Chrome trace event format.
+
+Sections are profiled by easyblocks that opt in: the steps of bundles and of the GCC, LLVM and GROMACS easyblocks,
+bundle components, GCC/LLVM stages, GROMACS variants, and Python packages installed as extensions.
+Shell commands are not profiled individually, their resource usage is included in that of the enclosing section.
+"""
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+from easybuild.tools.filetools import write_file
+
+
+# suffix for profile trace file, which is written next to the build log
+PROFILE_TRACE_SUFFIX = '-trace.json'
+
+# lock to avoid that profile trace file is written concurrently, when sections are profiled in multiple threads
+_profile_trace_lock = threading.Lock()
+
+
+def _resource_usage():
+    """
+    Return snapshot of resource usage of current process and its (terminated) child processes:
+    CPU time (in seconds), maximum resident set size so far and number of bytes read/written from/to disk
+    """
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return {
+        'cpu_time': sum(ru.ru_utime + ru.ru_stime for ru in usage),
+        # ru_maxrss is expressed in KiB on Linux, ru_inblock/ru_oublock in blocks of 512 bytes
+        'max_rss': max(ru.ru_maxrss for ru in usage) * 1024,
+        'read_bytes': sum(ru.ru_inblock for ru in usage) * 512,
+        'write_bytes': sum(ru.ru_oublock for ru in usage) * 512,
+    }
+
+
+def get_profile_trace_path(easyblock):
+    """Return path to profile trace file for specified easyblock instance (or None if there's no build log)"""
+    logfile = getattr(easyblock, 'logfile', None)
+    if logfile:
+        return os.path.splitext(logfile)[0] + PROFILE_TRACE_SUFFIX
+    return None
+
+
+def write_profile_trace(easyblock):
+    """
+    Write profile trace for specified easyblock instance next to the build log, in Chrome trace event format
+    (see https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU),
+    which can be inspected with chrome://tracing or https://ui.perfetto.dev .
+
+    No profile trace is written if this is disabled for the easyblock instance via the 'profile_write_trace' attribute,
+    for example in subprocesses that send their profile events to the main process.
+    """
+    if not getattr(easyblock, 'profile_write_trace', True):
+        return None
+
+    trace_path = get_profile_trace_path(easyblock)
+    if trace_path:
+        trace = {
+            'traceEvents': getattr(easyblock, 'profile_events', []),
+            'displayTimeUnit': 'ms',
+            'otherData': {'name': easyblock.name, 'version': easyblock.version},
+        }
+        with _profile_trace_lock:
+            write_file(trace_path, json.dumps(trace, indent=1))
+    return trace_path
+
+
+@contextmanager
+def profile_section(easyblock, category, name, **info):
+    """
+    Profile section of installation procedure (a step, component, stage, variant, ...):
+    wall time, CPU time, memory usage and disk I/O are recorded as a trace event.
+    The profile trace is (re)written next to the build log when the outermost active section ends.
+
+    Note: resource usage is determined for the whole process (incl. terminated child processes),
+    so usage reported for sections that run concurrently overlaps. Since only the maximum resident set size
+    of the process so far is known, the memory usage of a section is reported as the maximum resident set size
+    of the process at the end of the section ('process_max_rss'), and how much it increased during the section
+    ('max_rss_increase', which is zero if the section didn't use more memory than an earlier one).
+
+    :param easyblock: easyblock instance to record profile data for (or its 'profile_parent', if it has one)
+    :param category: category of section (e.g. 'step', 'component', 'stage')
+    :param name: name of section
+    :param info: additional information to include in trace event
+    """
+    # sections of e.g. bundle components are recorded in the profile of the easyblock they are part of,
+    # since they share the same build log (and hence profile trace file)
+    easyblock = getattr(easyblock, 'profile_parent', None) or easyblock
+
+    with _profile_trace_lock:
+        if not hasattr(easyblock, 'profile_events'):
+            easyblock.profile_events = []
+        easyblock.profile_active_sections = getattr(easyblock, 'profile_active_sections', 0) + 1
+
+    start_usage = _resource_usage()
+    start_time = time.time()
+    try:
+        yield
+    finally:
+        wall_time = time.time() - start_time
+        end_usage = _resource_usage()
+
+        args = {
+            'wall_time': round(wall_time, 3),
+            'cpu_time': round(end_usage['cpu_time'] - start_usage['cpu_time'], 3),
+            'process_max_rss': end_usage['max_rss'],
+            'max_rss_increase': end_usage['max_rss'] - start_usage['max_rss'],
+            'read_bytes': end_usage['read_bytes'] - start_usage['read_bytes'],
+            'write_bytes': end_usage['write_bytes'] - start_usage['write_bytes'],
+        }
+        args.update(info)
+        easyblock.log.info("Profile for %s '%s': %s", category, name, args)
+
+        with _profile_trace_lock:
+            easyblock.profile_events.append({
+                'name': name,
+                'cat': category,
+                # complete event, with timestamp and duration in microseconds
+                'ph': 'X',
+                'ts': int(start_time * 1000000),
+                'dur': int(wall_time * 1000000),
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': args,
+            })
+            easyblock.profile_active_sections -= 1
+            write_trace = easyblock.profile_active_sections == 0
+
+        if write_trace:
+            write_profile_trace(easyblock)
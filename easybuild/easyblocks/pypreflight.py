@@ -0,0 +1,384 @@
+##
+# Copyright 2009-2026 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://www.vscentrum.be),
+# Flemish Research Foundation (FWO) (http://www.fwo.be/en)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# https://github.com/easybuilders/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Pre-flight check for the extensions of a bundle of Python packages.
+
+Checks whether the source of each extension is available,
+whether a prebuilt wheel that is compatible with the target Python interpreter is available in a wheelhouse,
+and whether the requirements declared in the metadata of the extensions can be satisfied.
+Metadata is read directly from the wheels and sdists (without running pip),
+so the check is cheap enough to run for bundles with hundreds of extensions.
+"""
+import email.parser
+import itertools
+import json
+import os
+import re
+import shlex
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from easybuild.base import fancylogger
+from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.filetools import compute_checksum
+from easybuild.tools.run import run_shell_cmd
+
+try:
+    from packaging.requirements import InvalidRequirement, Requirement
+    from packaging.version import InvalidVersion, Version
+    HAVE_PACKAGING = True
+except ImportError:
+    HAVE_PACKAGING = False
+
+PYTHON_WHEELHOUSE_ENV_VAR = 'EB_PYTHON_WHEELHOUSE'
+
+PREFLIGHT_BUILD = 'build'
+PREFLIGHT_MISSING = 'missing'
+PREFLIGHT_REUSE = 'reuse'
+
+# script that is run with the target Python interpreter to determine the supported wheel tags,
+# the values for environment markers (see PEP 508), and the Python packages that are already available
+PYTHON_TARGET_INFO_SCRIPT = """
+import json, os, platform, sys
+try:
+    from pip._vendor.packaging import tags
+except ImportError:
+    try:
+        from packaging import tags
+    except ImportError:
+        tags = None
+if tags is None:
+    supported = ['py%d%d-none-any' % sys.version_info[:2], 'py%d-none-any' % sys.version_info[0]]
+else:
+    supported = [str(tag) for tag in tags.sys_tags()]
+installed = {}
+try:
+    from importlib import metadata
+    for dist in metadata.distributions():
+        if dist.metadata['Name']:
+            installed.setdefault(dist.metadata['Name'], dist.version)
+except ImportError:
+    pass
+marker_env = {
+    'implementation_name': sys.implementation.name,
+    'implementation_version': '%d.%d.%d' % sys.implementation.version[:3],
+    'os_name': os.name,
+    'platform_machine': platform.machine(),
+    'platform_python_implementation': platform.python_implementation(),
+    'platform_release': platform.release(),
+    'platform_system': platform.system(),
+    'platform_version': platform.version(),
+    'python_full_version': platform.python_version(),
+    'python_version': '.'.join(platform.python_version_tuple()[:2]),
+    'sys_platform': sys.platform,
+}
+print(json.dumps({'tags': supported, 'installed': installed, 'marker_env': marker_env}))
+"""
+
+SDIST_EXTENSIONS = ('.tar.gz', '.tgz', '.tar.bz2', '.tar.xz', '.tar', '.zip')
+
+_log = fancylogger.getLogger('easyblocks.pypreflight')
+
+
+def canonicalize_name(name):
+    """Return canonical name of Python package (see PEP 503)."""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def _normalize_version(version):
+    """Return normalized version (see PEP 440), if possible."""
+    if HAVE_PACKAGING:
+        try:
+            return str(Version(version))
+        except InvalidVersion:
+            pass
+    return version
+
+
+def det_python_target_info(python_cmd):
+    """
+    Determine info on target Python interpreter, as dict with:
+    - 'tags': list of supported wheel tags (most preferred first)
+    - 'marker_env': dict with values for environment markers in requirements
+    - 'installed': dict with (canonical) name and version of Python packages that are already available
+    """
+    cmd = '%s -c %s' % (python_cmd, shlex.quote(PYTHON_TARGET_INFO_SCRIPT))
+    res = run_shell_cmd(cmd, fail_on_error=False, hidden=True, split_stderr=True)
+    try:
+        info = json.loads(res.output.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        raise EasyBuildError("Failed to determine info on Python interpreter '%s' (exit code %s): %s %s",
+                             python_cmd, res.exit_code, res.output, res.stderr)
+
+    info['installed'] = {canonicalize_name(name): version for (name, version) in info['installed'].items()}
+    return info
+
+
+def parse_wheel_filename(filename):
+    """
+    Parse name of wheel file (see PEP 427),
+    returns (canonical) name, version, and set of supported tags (or None if filename is not a valid wheel filename).
+    """
+    if not filename.endswith('.whl'):
+        return None
+
+    parts = filename[:-4].split('-')
+    # optional build tag is included between version and Python tag
+    if len(parts) not in (5, 6):
+        return None
+
+    name, version = parts[0], parts[1]
+    pytags, abitags, plattags = (x.split('.') for x in parts[-3:])
+    tags = set('-'.join(x) for x in itertools.product(pytags, abitags, plattags))
+
+    return canonicalize_name(name), _normalize_version(version), tags
+
+
+def _parse_metadata(txt):
+    """Parse contents of METADATA or PKG-INFO file (see core metadata specifications)."""
+    msg = email.parser.HeaderParser().parsestr(txt)
+    return {
+        'name': msg.get('Name'),
+        'version': msg.get('Version'),
+        'requires_dist': msg.get_all('Requires-Dist') or [],
+        'requires_python': msg.get('Requires-Python'),
+    }
+
+
+def read_dist_metadata(path):
+    """
+    Read metadata from wheel (*.dist-info/METADATA) or sdist (PKG-INFO in top-level directory)
+    without unpacking it; returns None if no metadata is found.
+    """
+    filename = os.path.basename(path)
+    txt = None
+    try:
+        if filename.endswith('.whl'):
+            with zipfile.ZipFile(path) as whl:
+                for member in whl.namelist():
+                    parts = member.split('/')
+                    if len(parts) == 2 and parts[0].endswith('.dist-info') and parts[1] == 'METADATA':
+                        txt = whl.read(member).decode('utf-8', 'replace')
+                        break
+
+        elif filename.endswith('.zip'):
+            with zipfile.ZipFile(path) as sdist:
+                for member in sdist.namelist():
+                    if member.count('/') == 1 and member.endswith('/PKG-INFO'):
+                        txt = sdist.read(member).decode('utf-8', 'replace')
+                        break
+
+        elif filename.endswith(SDIST_EXTENSIONS):
+            # members are read one by one, so we can stop as soon as PKG-INFO is found
+            with tarfile.open(path) as sdist:
+                for member in sdist:
+                    if member.isfile() and member.name.count('/') == 1 and member.name.endswith('/PKG-INFO'):
+                        txt = sdist.extractfile(member).read().decode('utf-8', 'replace')
+                        break
+
+    except (IOError, OSError, tarfile.TarError, zipfile.BadZipFile, EOFError) as err:
+        _log.warning("Failed to read metadata from %s: %s", path, err)
+
+    if txt is None:
+        return None
+
+    return _parse_metadata(txt)
+
+
+def index_wheelhouse(path):
+    """
+    Index wheels in specified wheelhouse directory,
+    as dict with (canonical name, version) as key and list of (path, tags) tuples as value.
+    """
+    res = {}
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                wheel = parse_wheel_filename(entry.name)
+                if wheel and entry.is_file():
+                    name, version, tags = wheel
+                    res.setdefault((name, version), []).append((entry.path, tags))
+    except OSError as err:
+        _log.info("Not using wheelhouse %s: %s", path, err)
+
+    return res
+
+
+def find_compatible_wheel(wheelhouse_index, name, version, supported_tags):
+    """
+    Find wheel for specified Python package in (index of) wheelhouse that is compatible with target interpreter,
+    by picking the wheel with the most preferred supported tag. Returns None if no compatible wheel is found.
+    """
+    wheels = wheelhouse_index.get((canonicalize_name(name), _normalize_version(version)), [])
+
+    res, best_prio = None, len(supported_tags)
+    for path, tags in sorted(wheels):
+        for prio, tag in enumerate(supported_tags[:best_prio]):
+            if tag in tags:
+                res, best_prio = path, prio
+                break
+
+    return res
+
+
+def check_requirements(requires_dist, available, marker_env, requires_python=None):
+    """
+    Check whether requirements (Requires-Dist entries) of a Python package can be satisfied
+    by available Python packages (dict with canonical name and version).
+    Returns list of (requirement, reason) tuples for requirements that can not be satisfied.
+
+    Without the 'packaging' Python package, only names of requirements without environment markers are checked.
+    """
+    res = []
+
+    if requires_python and HAVE_PACKAGING:
+        requirement = 'Python%s' % requires_python
+        try:
+            if not Requirement(requirement).specifier.contains(marker_env['python_full_version'], prereleases=True):
+                res.append((requirement, "Python %s is used" % marker_env['python_full_version']))
+        except (InvalidRequirement, InvalidVersion):
+            _log.debug("Ignoring invalid Requires-Python value: %s", requires_python)
+
+    for requirement in requires_dist:
+        if HAVE_PACKAGING:
+            try:
+                req = Requirement(requirement)
+            except InvalidRequirement:
+                res.append((requirement, "invalid requirement"))
+                continue
+            # requirements for extras are only relevant when an extra is requested, which we can't know here
+            if req.marker is not None and not req.marker.evaluate(dict(marker_env, extra='')):
+                continue
+            name, specifier = canonicalize_name(req.name), req.specifier
+        else:
+            if ';' in requirement:
+                continue
+            name, specifier = canonicalize_name(re.match(r'\s*[A-Za-z0-9._-]*', requirement).group().strip()), None
+
+        if name not in available:
+            res.append((requirement, "not available"))
+        elif specifier:
+            try:
+                if not specifier.contains(available[name], prereleases=True):
+                    res.append((requirement, "version %s is available" % available[name]))
+            except InvalidVersion:
+                _log.debug("Can't check requirement %s for version %s", requirement, available[name])
+
+    return res
+
+
+def _preflight_check_ext(ext, wheelhouse_index, supported_tags):
+    """Pre-flight check for a single extension (see make_python_exts_plan)."""
+    res = {
+        'name': ext['name'],
+        'version': ext['version'],
+        'src': ext.get('src'),
+        'wheel': None,
+        'wheel_checksum': None,
+        'metadata': None,
+    }
+
+    if ext.get('nosource'):
+        res['action'] = PREFLIGHT_BUILD
+        return res
+
+    src = ext.get('src')
+    if not src or not os.path.isfile(src):
+        res['action'] = PREFLIGHT_MISSING
+        return res
+
+    if ext.get('reusable', True) and wheelhouse_index:
+        res['wheel'] = find_compatible_wheel(wheelhouse_index, ext['name'], ext['version'], supported_tags)
+
+    if res['wheel']:
+        # sources are verified by the checksum step, prebuilt wheels are not;
+        # checksum is recorded so it is clear what exactly was installed
+        res['wheel_checksum'] = compute_checksum(res['wheel'], checksum_type='sha256')
+
+    res['action'] = PREFLIGHT_REUSE if res['wheel'] else PREFLIGHT_BUILD
+    res['metadata'] = read_dist_metadata(res['wheel'] or src)
+
+    return res
+
+
+def make_python_exts_plan(exts, target_info, wheelhouse=None, max_workers=None):
+    """
+    Make plan for installing specified extensions: extensions are checked in parallel.
+
+    :param exts: list of dicts with 'name', 'version', 'src' (path to source file),
+                 'nosource' (whether extension has no source) and 'reusable' (whether prebuilt wheel can be used)
+    :param target_info: info on target Python interpreter (see det_python_target_info)
+    :param wheelhouse: path to directory with prebuilt wheels
+    :param max_workers: maximum number of extensions to check concurrently
+    :return: dict with 'exts' (result for each extension, in order) and 'conflicts'
+             (list of (extension name, requirement, reason) tuples for requirements that can not be satisfied)
+    """
+    wheelhouse_index = index_wheelhouse(wheelhouse) if wheelhouse else {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as thread_pool:
+        results = list(thread_pool.map(lambda ext: _preflight_check_ext(ext, wheelhouse_index, target_info['tags']),
+                                       exts))
+
+    # requirements can be satisfied by Python packages that are already available, or by other extensions
+    available = dict(target_info['installed'])
+    for res in results:
+        metadata = res['metadata'] or {}
+        name = metadata.get('name') or res['name']
+        available[canonicalize_name(name)] = metadata.get('version') or res['version']
+
+    conflicts = []
+    for res in results:
+        if res['metadata']:
+            for requirement, reason in check_requirements(res['metadata']['requires_dist'], available,
+                                                          target_info['marker_env'],
+                                                          requires_python=res['metadata']['requires_python']):
+                conflicts.append((res['name'], requirement, reason))
+
+    return {'exts': results, 'conflicts': conflicts}
+
+
+def format_python_exts_plan(plan):
+    """Format plan for installing extensions (see make_python_exts_plan) in human-readable form."""
+    descrs = [
+        (PREFLIGHT_REUSE, "reused from wheelhouse"),
+        (PREFLIGHT_BUILD, "built from source"),
+        (PREFLIGHT_MISSING, "missing source"),
+    ]
+    counts = ', '.join('%d %s' % (len([x for x in plan['exts'] if x['action'] == action]), descr)
+                       for (action, descr) in descrs)
+    summary = "Plan for %d extensions: %s; %d unsatisfied requirements"
+    lines = [summary % (len(plan['exts']), counts, len(plan['conflicts']))]
+
+    for action, descr in descrs:
+        for res in plan['exts']:
+            if res['action'] == action:
+                lines.append("* %s %s: %s (%s)" % (res['name'], res['version'], descr,
+                                                   os.path.basename(res['wheel'] or res['src'] or '-')))
+
+    for name, requirement, reason in plan['conflicts']:
+        lines.append("* %s requires %s: %s" % (name, requirement, reason))
+
+    return '\n'.join(lines)
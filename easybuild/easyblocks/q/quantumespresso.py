@@ -382,9 +382,13 @@ class EB_QuantumESPRESSO(EasyBlock):
             else:
                 concurrent = max(1, self.cfg.parallel // (self._test_nprocs * 4))
                 cmd = f'{pretestopts} ctest -j{concurrent} --output-on-failure'
+            cmd = ' '.join([cmd] + self.ctest_opts())
 
+            self.restore_ctest_cost_data()
             res = run_shell_cmd(cmd, fail_on_error=False)
             out = res.output
+            self.report_ctest_results()
+            self.save_ctest_cost_data()
 
             # Example output:
             # 74% tests passed, 124 tests failed out of 481
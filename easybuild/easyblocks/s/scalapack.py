@@ -37,6 +37,7 @@ import os
 from easybuild.tools import LooseVersion
 
 import easybuild.tools.toolchain as toolchain
+from easybuild.easyblocks.elfscan import sanity_check_linked_shared_libs_elf_only
 from easybuild.easyblocks.generic.cmakemake import CMakeMake
 from easybuild.toolchains.linalg.acml import Acml
 from easybuild.toolchains.linalg.atlas import Atlas
@@ -231,6 +232,11 @@ class EB_ScaLAPACK(CMakeMake):
 
         return res
 
+    def sanity_check_linked_shared_libs(self, subdirs=None):
+        """Check for banned/required linked shared libraries, only for (dynamically linked) ELF files."""
+        return sanity_check_linked_shared_libs_elf_only(self, super().sanity_check_linked_shared_libs,
+                                                        subdirs=subdirs)
+
     def sanity_check_step(self):
         """Custom sanity check for ScaLAPACK."""
 
@@ -0,0 +1,123 @@
+##
+# Copyright 2009-2026 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://www.vscentrum.be),
+# Flemish Research Foundation (FWO) (http://www.fwo.be/en)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# https://github.com/easybuilders/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Compiler smoke tests, which are run concurrently (each in a separate temporary directory)
+as part of the sanity check for compilers and compiler wrappers (GCC, LLVM, MPI libraries, ...).
+"""
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from easybuild.tools.filetools import remove_dir, write_file
+from easybuild.tools.run import EasyBuildExit, run_shell_cmd
+from easybuild.tools.utilities import trace_msg
+
+
+def _run_compiler_smoke_test(smoke_test):
+    """Run single compiler smoke test (see run_compiler_smoke_tests) in a new temporary directory."""
+    work_dir = tempfile.mkdtemp(prefix='eb-compiler-smoke-test-')
+    try:
+        for fn, txt in (smoke_test.get('files') or {}).items():
+            write_file(os.path.join(work_dir, fn), txt)
+
+        start_time = time.time()
+        res = run_shell_cmd(smoke_test['cmd'], work_dir=work_dir, fail_on_error=False, hidden=True)
+        elapsed = time.time() - start_time
+    finally:
+        remove_dir(work_dir)
+
+    result = dict(smoke_test)
+    result.update({
+        'exit_code': res.exit_code,
+        'output': res.output,
+        'time': elapsed,
+    })
+    return result
+
+
+def run_compiler_smoke_tests(smoke_tests, max_workers=None):
+    """
+    Run compiler smoke tests concurrently, each in a separate temporary directory.
+
+    :param smoke_tests: list of dicts with 'name' and 'cmd' for each smoke test, and optionally 'files'
+                        (dict with contents for files to create in temporary directory, like test programs);
+                        smoke tests are started in order, so expensive ones should go first
+    :param max_workers: maximum number of smoke tests to run concurrently (default: as many as there are smoke tests)
+    :return: list of dicts for smoke tests (in same order), with 'exit_code', 'output' and 'time' (in seconds) added
+    """
+    if not smoke_tests:
+        return []
+
+    max_workers = max(1, min(max_workers or len(smoke_tests), len(smoke_tests)))
+    with ThreadPoolExecutor(max_workers=max_workers) as thread_pool:
+        return list(thread_pool.map(_run_compiler_smoke_test, smoke_tests))
+
+
+def sanity_check_compiler_smoke_tests(easyblock, smoke_tests, extra_modules=None, max_workers=None,
+                                      descr='compiler smoke test'):
+    """
+    Run compiler smoke tests as part of sanity check for specified easyblock (see run_compiler_smoke_tests),
+    using the (fake) module for the installation (which is loaded if needed).
+    Failing smoke tests are reported as sanity check failures.
+
+    :param max_workers: maximum number of smoke tests to run concurrently (default: number of parallel build jobs)
+    :param descr: description of smoke tests, used in log messages
+    :return: list of sanity check commands that should be run instead (in dry run mode, or when
+             sanity check commands specified in the easyconfig file replace the ones provided by the easyblock)
+    """
+    if not smoke_tests:
+        return []
+
+    cfg = easyblock.cfg
+    if easyblock.dry_run or (cfg['sanity_check_commands'] and not cfg['enhance_sanity_check']):
+        return [smoke_test['cmd'] for smoke_test in smoke_tests]
+
+    if not easyblock.sanity_check_module_loaded:
+        easyblock.sanity_check_load_module(extra_modules=extra_modules)
+
+    if max_workers is None:
+        max_workers = cfg.parallel
+    easyblock.log.info("Running %d %ss, using up to %d in parallel", len(smoke_tests), descr, max_workers)
+    start_time = time.time()
+    results = run_compiler_smoke_tests(smoke_tests, max_workers=max_workers)
+
+    for result in results:
+        status = 'OK' if result['exit_code'] == EasyBuildExit.SUCCESS else 'FAILED'
+        trace_msg("result for %s '%s': %s (%.2fs)" % (descr, result['name'], status, result['time']))
+        if result['exit_code'] == EasyBuildExit.SUCCESS:
+            easyblock.log.info("%s '%s' (%s) passed in %.2fs (output: %s)",
+                               descr.capitalize(), result['name'], result['cmd'], result['time'], result['output'])
+        else:
+            fail_msg = "%s '%s' (%s) failed with exit code %s (output: %s)" % (
+                descr, result['name'], result['cmd'], result['exit_code'], result['output'])
+            easyblock.sanity_check_fail_msgs.append(fail_msg)
+            easyblock.exit_code = EasyBuildExit.FAIL_SANITY_CHECK
+            easyblock.log.warning("Sanity check: %s", fail_msg)
+
+    easyblock.log.info("%ss completed in %.2fs (sum of times for separate smoke tests: %.2fs)",
+                       descr.capitalize(), time.time() - start_time, sum(result['time'] for result in results))
+
+    return []
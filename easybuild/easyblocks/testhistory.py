@@ -0,0 +1,128 @@
+##
+# Copyright 2009-2026 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://www.vscentrum.be),
+# Flemish Research Foundation (FWO) (http://www.fwo.be/en)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# https://github.com/easybuilders/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+History of outcomes of individual tests in (large) test suites, across installations,
+which can be used to tell apart new test failures from failures of tests that are known to be flaky.
+
+History is only kept if $EB_TEST_HISTORY_DIR is set to the path of a directory,
+in which a (JSON) file is kept for each combination of software name, version and toolchain.
+"""
+import json
+import os
+import time
+
+from easybuild.base import fancylogger
+
+TEST_HISTORY_DIR_ENV_VAR = 'EB_TEST_HISTORY_DIR'
+TEST_HISTORY_FORMAT_VERSION = 1
+
+# outcomes of tests that are tracked
+TEST_PASSED = 'passed'
+TEST_FAILED = 'failed'
+TEST_SKIPPED = 'skipped'
+TEST_OUTCOMES = (TEST_PASSED, TEST_FAILED, TEST_SKIPPED)
+
+_log = fancylogger.getLogger('easyblocks.testhistory')
+
+
+class TestHistory:
+    """History of outcomes and durations of individual tests for a particular installation."""
+
+    def __init__(self, path):
+        """Load test history from specified (JSON) file (may not exist yet)."""
+        self.path = path
+        self.tests = {}
+        try:
+            with open(path) as fh:
+                data = json.load(fh)
+            if data.get('version') == TEST_HISTORY_FORMAT_VERSION:
+                self.tests = data['tests']
+        except (IOError, OSError, ValueError, KeyError, AttributeError) as err:
+            _log.debug("Not using test history from %s: %s", path, err)
+
+    @classmethod
+    def for_installation(cls, name, version, toolchain):
+        """
+        Return test history for installation of specified software, version and toolchain (name/version dict),
+        or None if no test history is kept (see $EB_TEST_HISTORY_DIR).
+        """
+        history_dir = os.getenv(TEST_HISTORY_DIR_ENV_VAR)
+        if not history_dir:
+            return None
+
+        filename = '%s-%s-%s.json' % (version, toolchain['name'], toolchain['version'])
+        return cls(os.path.join(history_dir, name, filename))
+
+    def record(self, test, outcome, duration=None):
+        """Record outcome (and duration, in seconds) of specified test."""
+        if outcome not in TEST_OUTCOMES:
+            raise ValueError("Unknown test outcome '%s' for %s, should be one of %s" % (outcome, test, TEST_OUTCOMES))
+
+        entry = self.tests.setdefault(test, dict((x, 0) for x in TEST_OUTCOMES))
+        entry[outcome] += 1
+        entry['last'] = outcome
+        if outcome == TEST_FAILED:
+            entry['last_failed'] = time.time()
+        if duration is not None and outcome != TEST_SKIPPED:
+            # keep track of running average of duration of (non-skipped) tests
+            cnt = entry[TEST_PASSED] + entry[TEST_FAILED]
+            entry['duration'] = entry.get('duration', 0.0) + (duration - entry.get('duration', 0.0)) / cnt
+
+    def is_flaky(self, test):
+        """Check whether specified test is known to be flaky (i.e. both passed and failed before)."""
+        entry = self.tests.get(test)
+        return bool(entry) and entry[TEST_PASSED] > 0 and entry[TEST_FAILED] > 0
+
+    def classify_failures(self, failed_tests):
+        """
+        Classify specified failed tests (*before* recording their outcome) as new failures (tests that never failed
+        before, including tests that never ran before), historically flaky tests (tests that both passed and failed
+        before), or known failures (tests that always failed before).
+
+        :return: tuple with lists of new failures, historically flaky tests, and known failures
+        """
+        new_failures, flaky, known_failures = [], [], []
+        for test in failed_tests:
+            if self.is_flaky(test):
+                flaky.append(test)
+            elif self.tests.get(test, {}).get(TEST_FAILED, 0) > 0:
+                known_failures.append(test)
+            else:
+                new_failures.append(test)
+        return new_failures, flaky, known_failures
+
+    def save(self):
+        """Save test history."""
+        try:
+            dirpath = os.path.dirname(os.path.abspath(self.path))
+            if not os.path.exists(dirpath):
+                os.makedirs(dirpath)
+            # write to temporary file first and then move it in place, so a partially written file is never read
+            tmp_path = '%s.%d' % (self.path, os.getpid())
+            with open(tmp_path, 'w') as fh:
+                json.dump({'version': TEST_HISTORY_FORMAT_VERSION, 'tests': self.tests}, fh, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except (IOError, OSError) as err:
+            _log.warning("Failed to save test history to %s: %s", self.path, err)
@@ -32,10 +32,10 @@ from collections import defaultdict
 from itertools import chain
 import os
 
-from easybuild.easyblocks.generic.configuremake import ConfigureMake
+from easybuild.easyblocks.generic.configuremake import ConfigureMake, run_make_in_subdirs
 from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.modules import get_software_root
-from easybuild.tools.run import run_shell_cmd, subprocess_popen_text
+from easybuild.tools.run import subprocess_popen_text
 from easybuild.tools.systemtools import get_shared_lib_ext
 
 
@@ -104,14 +104,14 @@ class EB_UCX_Plugins(ConfigureMake):
         super().configure_step()
 
     def build_step(self):
-        """Build plugins"""
-        for makefile_dir in self.makefile_dirs:
-            run_shell_cmd('make -C src/%s V=1' % makefile_dir)
+        """Build plugins (concurrently, since plugin directories are independent of each other)"""
+        subdirs = [os.path.join('src', x) for x in self.makefile_dirs]
+        run_make_in_subdirs(subdirs, make_args='V=1', parallel=self.cfg.parallel)
 
     def install_step(self):
         """Install plugins"""
-        for makefile_dir in self.makefile_dirs:
-            run_shell_cmd('make -C src/%s install' % (makefile_dir))
+        subdirs = [os.path.join('src', x) for x in self.makefile_dirs]
+        run_make_in_subdirs(subdirs, make_args='install', parallel=self.cfg.parallel)
 
     def make_module_extra(self, *args, **kwargs):
         """Add extra statements to generated module file specific to UCX plugins"""
@@ -34,6 +34,9 @@ EasyBuild support for building and installing WRF, implemented as an easyblock
 """
 import os
 import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from easybuild.tools import LooseVersion
 
@@ -44,9 +47,9 @@ from easybuild.framework.easyblock import EasyBlock
 from easybuild.framework.easyconfig import CUSTOM, MANDATORY
 from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.config import build_option
-from easybuild.tools.filetools import apply_regex_substitutions, change_dir
+from easybuild.tools.filetools import apply_regex_substitutions, copy_dir
 from easybuild.tools.filetools import patch_perl_script_autoflush, read_file, which
-from easybuild.tools.filetools import remove_file, symlink
+from easybuild.tools.filetools import remove_dir, remove_file, symlink
 from easybuild.tools.modules import get_software_root, get_software_version
 from easybuild.tools.run import run_shell_cmd
 
@@ -85,6 +88,9 @@ class EB_WRF(EasyBlock):
         extra_vars = {
             'buildtype': [None, "Specify the type of build (serial, smpar (OpenMP), "
                                 "dmpar (MPI), dm+sm (hybrid OpenMP/MPI)).", MANDATORY],
+            'concurrent_testcases': [1, "Number of test cases to build and run concurrently, each in an isolated "
+                                        "copy of the WRF directory (available cores are split across test cases)",
+                                     CUSTOM],
             'rewriteopts': [True, "Replace -O3 with CFLAGS/FFLAGS", CUSTOM],
             'runtest': [True, "Build and run WRF tests", CUSTOM],
         }
@@ -338,10 +344,14 @@ class EB_WRF(EasyBlock):
                     if test in self.testcases:
                         self.testcases.remove(test)
 
+            concurrent_testcases = max(1, min(self.cfg['concurrent_testcases'], len(self.testcases)))
+            # core budget for each test case that is being built/run
+            test_cores = max(1, self.cfg.parallel // concurrent_testcases)
+
             # determine number of MPI ranks to use in tests (1/2 of available processors + 1);
             # we need to limit max number of MPI ranks (8 is too high for some tests, 4 is OK),
             # since otherwise run may fail because domain size is too small
-            n_mpi_ranks = min(self.cfg.parallel // 2 + 1, 4)
+            n_mpi_ranks = min(test_cores // 2 + 1, 4)
 
             # prepare run command
 
@@ -355,81 +365,146 @@ class EB_WRF(EasyBlock):
                 test_cmd += f' && {pretestopts} ./ideal.exe'
                 test_cmd += f' && {pretestopts} ./wrf.exe >rsl.error.0000 2>&1'
 
-            # regex to check for successful test run
-            re_success = re.compile("SUCCESS COMPLETE WRF")
+            self.test_results = {}
 
-            def run_test():
-                """Run a single test and check for success."""
+            if concurrent_testcases > 1:
+                self.log.info("Building and running %d WRF test cases concurrently, using %d cores for each",
+                              concurrent_testcases, test_cores)
+                tests_tmpdir = tempfile.mkdtemp(prefix='wrf-testcases-')
+                build_par = f'-j {test_cores}'
 
-                # run test
-                res = run_shell_cmd(test_cmd, fail_on_error=False)
+                def build_and_run_testcase_copy(test):
+                    """Build and run test case in isolated copy of WRF directory."""
+                    test_src_dir = os.path.join(tests_tmpdir, test)
+                    copy_dir(self.start_dir, test_src_dir, symlinks=True)
+                    try:
+                        return self.build_and_run_testcase(test, test_src_dir, test_cmd, build_par)
+                    finally:
+                        remove_dir(test_src_dir)
 
-                # read output file
-                out_fn = 'rsl.error.0000'
-                if os.path.exists(out_fn):
-                    out_txt = read_file(out_fn)
-                else:
-                    out_txt = 'FILE NOT FOUND'
-
-                if res.exit_code == 0:
-                    # exit code zero suggests success, but let's make sure...
-                    if re_success.search(out_txt):
-                        self.log.info("Test %s ran successfully (found '%s' in %s)", test, re_success.pattern, out_fn)
-                    else:
-                        raise EasyBuildError("Test %s failed, pattern '%s' not found in %s: %s",
-                                             test, re_success.pattern, out_fn, out_txt)
-                else:
-                    # non-zero exit code means trouble, show command output
-                    raise EasyBuildError("Test %s failed with exit code %s, output: %s", test, res.exit_code, out_txt)
+                try:
+                    with ThreadPoolExecutor(max_workers=concurrent_testcases) as thread_pool:
+                        results = thread_pool.map(build_and_run_testcase_copy, self.testcases)
+                        self.test_results = dict(zip(self.testcases, results))
+                finally:
+                    remove_dir(tests_tmpdir)
+            else:
+                # build and run each test case individually
+                for test in self.testcases:
+                    self.test_results[test] = self.build_and_run_testcase(test, self.start_dir, test_cmd, self.par,
+                                                                          clean_up=True)
+                    if self.test_results[test]['error']:
+                        break
+
+            for test, res in self.test_results.items():
+                self.log.info("Test %s: %s (%.1f sec)", test, 'FAILED' if res['error'] else 'PASSED', res['time'])
+
+            failed = [test for (test, res) in self.test_results.items() if res['error']]
+            if failed:
+                raise EasyBuildError("WRF test(s) failed:\n%s",
+                                     '\n'.join(self.test_results[test]['error'] for test in failed))
+
+    def build_and_run_testcase(self, test, src_dir, test_cmd, build_par, clean_up=False):
+        """
+        Build and run specified WRF test case.
+
+        :param test: name of test case
+        :param src_dir: WRF directory in which test case should be built and run
+        :param test_cmd: command to run test
+        :param build_par: option to control parallelism of compile script
+        :param clean_up: clean up output files of test run
+        :return: dict with error message (None if test was successful) and time spent on building/running test case
+        """
+        start_time = time.time()
+        res = {'error': None}
 
-                # clean up stuff that gets in the way
-                fn_prefs = ["wrfinput_", "namelist.output", "wrfout_", "rsl.out.", "rsl.error."]
-                for filename in os.listdir('.'):
-                    for pref in fn_prefs:
-                        if filename.startswith(pref):
-                            remove_file(filename)
-                            self.log.debug("Cleaned up file %s", filename)
+        self.log.debug("Building and running test %s in %s", test, src_dir)
 
-            # build and run each test case individually
-            for test in self.testcases:
+        # build and install
+        cmd = "./compile %s %s" % (build_par, test)
+        cmd_res = run_shell_cmd(cmd, work_dir=src_dir, fail_on_error=False)
+        if cmd_res.exit_code:
+            # only include tail of output, full output is included in the log
+            output_tail = '\n'.join(cmd_res.output.splitlines()[-50:])
+            res['error'] = "Building test %s failed with exit code %s, output (last 50 lines):\n%s" % (
+                test, cmd_res.exit_code, output_tail)
 
-                self.log.debug("Building and running test %s" % test)
+        # run test
+        run_dir = os.path.join(src_dir, 'run')
+        if res['error'] is None:
+            try:
+                if test in ["em_fire"]:
 
-                # build and install
-                cmd = "./compile %s %s" % (self.par, test)
-                run_shell_cmd(cmd)
+                    # handle tests with subtests seperately
+                    testdir = os.path.join(src_dir, "test", test)
 
-                # run test
-                try:
-                    prev_dir = change_dir('run')
+                    for subtest in [x for x in os.listdir(testdir) if os.path.isdir(os.path.join(testdir, x))]:
 
-                    if test in ["em_fire"]:
+                        subtestdir = os.path.join(testdir, subtest)
 
-                        # handle tests with subtests seperately
-                        testdir = os.path.join("..", "test", test)
+                        # link required files
+                        for filename in os.listdir(subtestdir):
+                            path = os.path.join(run_dir, filename)
+                            if os.path.exists(path):
+                                remove_file(path)
+                            symlink(os.path.join(subtestdir, filename), path)
 
-                        for subtest in [x for x in os.listdir(testdir) if os.path.isdir(x)]:
+                        # run test
+                        res['error'] = self.run_testcase(test, run_dir, test_cmd, clean_up=clean_up)
+                        if res['error']:
+                            break
+                else:
+                    # run test
+                    res['error'] = self.run_testcase(test, run_dir, test_cmd, clean_up=clean_up)
 
-                            subtestdir = os.path.join(testdir, subtest)
+            except OSError as err:
+                res['error'] = "An error occured when running test %s: %s" % (test, err)
 
-                            # link required files
-                            for filename in os.listdir(subtestdir):
-                                if os.path.exists(filename):
-                                    remove_file(filename)
-                                symlink(os.path.join(subtestdir, filename), filename)
+        res['time'] = time.time() - start_time
+        return res
 
-                            # run test
-                            run_test()
+    def run_testcase(self, test, run_dir, test_cmd, clean_up=False):
+        """
+        Run a single test and check for success.
 
-                    else:
+        :return: error message if test failed, None otherwise
+        """
+        error = None
 
-                        # run test
-                        run_test()
+        # run test
+        res = run_shell_cmd(test_cmd, work_dir=run_dir, fail_on_error=False)
 
-                    change_dir(prev_dir)
+        # read output file
+        out_fn = os.path.join(run_dir, 'rsl.error.0000')
+        if os.path.exists(out_fn):
+            out_txt = read_file(out_fn)
+        else:
+            out_txt = 'FILE NOT FOUND'
+
+        # regex to check for successful test run
+        re_success = re.compile("SUCCESS COMPLETE WRF")
 
-                except OSError as err:
-                    raise EasyBuildError("An error occured when running test %s: %s", test, err)
+        if res.exit_code == 0:
+            # exit code zero suggests success, but let's make sure...
+            if re_success.search(out_txt):
+                self.log.info("Test %s ran successfully (found '%s' in %s)", test, re_success.pattern, out_fn)
+            else:
+                msg = "Test %s failed, pattern '%s' not found in %s: %s"
+                error = msg % (test, re_success.pattern, out_fn, out_txt)
+        else:
+            # non-zero exit code means trouble, show command output
+            error = "Test %s failed with exit code %s, output: %s" % (test, res.exit_code, out_txt)
+
+        if clean_up:
+            # clean up stuff that gets in the way
+            fn_prefs = ["wrfinput_", "namelist.output", "wrfout_", "rsl.out.", "rsl.error."]
+            for filename in os.listdir(run_dir):
+                for pref in fn_prefs:
+                    if filename.startswith(pref):
+                        remove_file(os.path.join(run_dir, filename))
+                        self.log.debug("Cleaned up file %s", filename)
+
+        return error
 
     # building/installing is done in build_step, so we can run tests
     def install_step(self):
@@ -35,10 +35,12 @@ or
 import os
 import sys
 from distutils import log
+from distutils.command.build_py import build_py
 from distutils.core import setup
 
 sys.path.append('easybuild')
 from easyblocks import VERSION  # noqa
+from easyblocks.easyblocks_index import write_easyblocks_index  # noqa
 
 FRAMEWORK_MAJVER = VERSION.split('.')[0]
 
@@ -51,6 +53,16 @@ def read(fname):
     return open(os.path.join(os.path.dirname(__file__), fname)).read()
 
 
+class BuildPyWithEasyblocksIndex(build_py):
+    """Also generate index of easyblock classes for the easyblock modules being installed (not in source tree)."""
+
+    def run(self):
+        build_py.run(self)
+        if not self.dry_run:
+            easyblocks_dir = os.path.join(self.build_lib, 'easybuild', 'easyblocks')
+            log.info("Generated index of easyblock classes: %s" % write_easyblocks_index(easyblocks_dir))
+
+
 log.info("Installing version %s (required versions: API >= %s)" % (VERSION, FRAMEWORK_MAJVER))
 
 setup(
@@ -66,6 +78,7 @@ setup(
     packages=["easybuild", "easybuild.easyblocks", "easybuild.easyblocks.generic"],
     package_dir={"easybuild.easyblocks": "easybuild/easyblocks"},
     package_data={'easybuild.easyblocks': ["[a-z0-9]/*.py"]},
+    cmdclass={'build_py': BuildPyWithEasyblocksIndex},
     long_description=read("README.rst"),
     classifiers=[
         "Development Status :: 5 - Production/Stable",
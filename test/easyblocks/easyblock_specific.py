@@ -28,37 +28,71 @@ Unit tests for specific easyblocks.
 @author: Kenneth Hoste (Ghent University)
 """
 import copy
+import glob
+import gzip
+import json
+import lzma
 import os
 import re
 import stat
+import struct
+import subprocess
 import sys
 import tempfile
 import textwrap
+import time
+import zipfile
 from io import StringIO
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from unittest import TestLoader, TextTestRunner
 from test.easyblocks.module import cleanup
 
+import easybuild.tools.environment as env
 import easybuild.tools.options as eboptions
 import easybuild.tools.tomllib as tomllib
+import easybuild.easyblocks.generic.pythonbundle as pythonbundle
 import easybuild.easyblocks.generic.pythonpackage as pythonpackage
+import easybuild.easyblocks.generic.bundle as bundle
 import easybuild.easyblocks.generic.cargo as cargo
+import easybuild.easyblocks.generic.conda as conda
+import easybuild.easyblocks.generic.rpm as rpm
+import easybuild.easyblocks.generic.rubygem as rubygem
+import easybuild.easyblocks.b.boost as boost
+import easybuild.easyblocks.c.cp2k as cp2k
+import easybuild.easyblocks.g.gcc as gcc
 import easybuild.easyblocks.l.lammps as lammps
+import easybuild.easyblocks.o.openfoam as openfoam
 import easybuild.easyblocks.p.python as python
 import easybuild.easyblocks.p.pytorch as pytorch
+import easybuild.easyblocks.w.wrf as wrf
+from easybuild.base import fancylogger
 from easybuild.base.testing import TestCase
+import easybuild.easyblocks.generic.cmakemake as cmakemake
+import easybuild.easyblocks.buildorder as buildorder
+import easybuild.easyblocks.elfscan as elfscan
+import easybuild.easyblocks.hostfacts as hostfacts
+import easybuild.easyblocks.mpibench as mpibench
+import easybuild.easyblocks.permissions as permissions
+import easybuild.easyblocks.profiling as profiling
+import easybuild.easyblocks.pypreflight as pypreflight
+import easybuild.easyblocks.smoketests as smoketests
+import easybuild.easyblocks.testhistory as testhistory
 from easybuild.easyblocks.generic.cmakemake import det_cmake_version
+from easybuild.easyblocks.generic.configuremake import run_make_in_subdirs
 from easybuild.easyblocks.generic.toolchain import Toolchain
 from easybuild.framework.easyblock import EasyBlock, get_easyblock_instance
 from easybuild.framework.easyconfig.easyconfig import process_easyconfig
-from easybuild.tools import config
+from easybuild.tools import LooseVersion, config
 from easybuild.tools.build_log import EasyBuildError
-from easybuild.tools.config import GENERAL_CLASS, get_module_syntax
+from easybuild.tools.config import GENERAL_CLASS, build_option, build_path, get_module_syntax, update_build_option
 from easybuild.tools.environment import modify_env
-from easybuild.tools.filetools import adjust_permissions, mkdir, move_file, remove_dir, symlink, write_file
+from easybuild.tools.filetools import adjust_permissions, change_dir, compute_checksum, mkdir, move_file, read_file
+from easybuild.tools.filetools import remove, remove_dir, remove_file, symlink, which, write_file
 from easybuild.tools.modules import modules_tool
 from easybuild.tools.options import set_tmpdir
-from easybuild.tools.run import RunShellCmdResult
+from easybuild.tools.run import RunShellCmdError, RunShellCmdResult, run_shell_cmd
+from easybuild.tools.toolchain.utilities import search_toolchain
 
 
 class EasyBlockSpecificTest(TestCase):
@@ -86,6 +120,8 @@ class EasyBlockSpecificTest(TestCase):
         self.orig_environ = copy.deepcopy(os.environ)
         self.orig_pythonpackage_run_shell_cmd = pythonpackage.run_shell_cmd
 
+        hostfacts.clear_host_facts_cache()
+
     def tearDown(self):
         """Test cleanup."""
         remove_dir(self.tmpdir)
@@ -276,6 +312,1124 @@ class EasyBlockSpecificTest(TestCase):
         """))
         self.assertEqual(det_cmake_version(), '1.2.3-rc4')
 
+    def test_run_make_in_subdirs(self):
+        """Test run_make_in_subdirs function provided along with ConfigureMake generic easyblock."""
+        self.assertEqual(run_make_in_subdirs([]), {})
+
+        makefile = '\n'.join([
+            "all:",
+            "\t@echo \"building in $(notdir $(CURDIR)) with $(MAKEFLAGS)\"",
+            "install:",
+            "\t@echo \"installing $(notdir $(CURDIR))\"",
+            "",
+        ])
+        for subdir in ('cuda', 'rocm'):
+            write_file(os.path.join(self.tmpdir, 'src', subdir, 'Makefile'), makefile)
+
+        subdirs = [os.path.join('src', 'cuda'), os.path.join('src', 'rocm')]
+        res = run_make_in_subdirs(subdirs, parallel=8, work_dir=self.tmpdir)
+        self.assertEqual(sorted(res), subdirs)
+        # parallel build jobs are divided across subdirectories
+        self.assertTrue(re.search('building in cuda with .*j4', res['src/cuda']), res['src/cuda'])
+        self.assertTrue(re.search('building in rocm with .*j4', res['src/rocm']), res['src/rocm'])
+
+        res = run_make_in_subdirs(subdirs, make_args='install', parallel=1, work_dir=self.tmpdir)
+        self.assertIn("installing cuda", res['src/cuda'])
+        self.assertIn("installing rocm", res['src/rocm'])
+
+        # make completes in all subdirectories, before an error is raised for failing ones
+        write_file(os.path.join(self.tmpdir, 'src', 'rocm', 'Makefile'), "all:\n\t@echo oops && false\n")
+        error_pattern = r"Running make failed in 1 subdirectories: src/rocm \(exit code 2\):\n[\s\S]*oops"
+        self.assertErrorRegex(EasyBuildError, error_pattern, run_make_in_subdirs, subdirs, work_dir=self.tmpdir)
+
+    def test_host_facts(self):
+        """Test caching of host facts."""
+        probes = []
+
+        def probe():
+            probes.append(len(probes))
+            return 'fact%d' % len(probes)
+
+        self.assertEqual(hostfacts.get_host_fact('test', probe), 'fact1')
+        self.assertEqual(hostfacts.get_host_fact('test', probe), 'fact1')
+        self.assertEqual(hostfacts.get_host_fact('other', probe), 'fact2')
+        self.assertEqual(len(probes), 2)
+
+        # probe commands are run only once, unless command or specified environment variables change
+        test_cmd = os.path.join(self.tmpdir, 'test_cmd')
+        write_file(test_cmd, '#!/bin/bash\necho "$TEST_VAR $@" >> %s.log\necho "$TEST_VAR $@"' % test_cmd)
+        adjust_permissions(test_cmd, stat.S_IXUSR)
+        os.environ['PATH'] = '%s:%s' % (self.tmpdir, os.getenv('PATH'))
+
+        os.environ['TEST_VAR'] = 'one'
+        for _ in range(3):
+            res = hostfacts.run_host_probe_cmd('test_cmd --version', env_vars=['TEST_VAR'])
+            self.assertEqual(res, (0, 'one --version\n'))
+        self.assertEqual(read_file(test_cmd + '.log'), 'one --version\n')
+        os.environ['TEST_VAR'] = 'two'
+        self.assertEqual(hostfacts.run_host_probe_cmd('test_cmd', env_vars=['TEST_VAR']).output, 'two \n')
+        # value of environment variables that are not specified is not taken into account
+        os.environ['TEST_VAR'] = 'three'
+        self.assertEqual(hostfacts.run_host_probe_cmd('test_cmd').output, 'three \n')
+        self.assertEqual(hostfacts.run_host_probe_cmd('test_cmd').output, 'three \n')
+        self.assertEqual(read_file(test_cmd + '.log'), 'one --version\ntwo \nthree \n')
+
+        # failing probe commands result in an error by default
+        write_file(test_cmd, '#!/bin/bash\necho oops\nexit 1')
+        self.assertErrorRegex(EasyBuildError, "Probing host system with 'test_cmd' failed .*: oops",
+                              hostfacts.run_host_probe_cmd, 'test_cmd')
+        self.assertEqual(hostfacts.run_host_probe_cmd('test_cmd', fail_on_error=False), (1, 'oops\n'))
+
+        # host facts can be persisted across sessions
+        cache_path = os.path.join(self.tmpdir, 'subdir', 'host_facts.json')
+        os.environ['EB_HOST_FACTS_CACHE'] = cache_path
+        hostfacts.clear_host_facts_cache()
+        self.assertEqual(hostfacts.get_host_fact('test', probe), 'fact3')
+        self.assertEqual(hostfacts.get_host_fact('session_only', probe, persist=False), 'fact4')
+        self.assertEqual(sorted(json.loads(read_file(cache_path))['facts']), ['test'])
+
+        # results of probe commands that depend on other files (like pkg-config) are not persisted
+        hostfacts.run_host_probe_cmd('test_cmd', fail_on_error=False, persist=False)
+        self.assertEqual(sorted(json.loads(read_file(cache_path))['facts']), ['test'])
+
+        hostfacts.clear_host_facts_cache()
+        self.assertEqual(hostfacts.get_host_fact('test', probe), 'fact3')
+        self.assertEqual(hostfacts.get_host_fact('session_only', probe, persist=False), 'fact5')
+
+        # persisted facts expire
+        os.environ['EB_HOST_FACTS_CACHE_TTL'] = '0'
+        hostfacts.clear_host_facts_cache()
+        self.assertEqual(hostfacts.get_host_fact('test', probe), 'fact6')
+        del os.environ['EB_HOST_FACTS_CACHE_TTL']
+
+        # persisted facts are only used on same host
+        data = json.loads(read_file(cache_path))
+        data['host'] = 'another_host'
+        write_file(cache_path, json.dumps(data))
+        hostfacts.clear_host_facts_cache()
+        self.assertEqual(hostfacts.get_host_fact('test', probe), 'fact7')
+        self.assertEqual(json.loads(read_file(cache_path))['host'], hostfacts.det_host_fingerprint())
+
+    def test_elfscan(self):
+        """Test scanning for ELF files."""
+        test_dir = os.path.join(self.tmpdir, 'elfscan')
+        mkdir(os.path.join(test_dir, 'lib'), parents=True)
+        mkdir(os.path.join(test_dir, 'bin'))
+        write_file(os.path.join(test_dir, 'foo.c'), "#include <stdio.h>\nint foo(void) { return puts(\"foo\"); }\n")
+        write_file(os.path.join(test_dir, 'main.c'), "#include <stdio.h>\nint main(void) { return puts(\"main\"); }\n")
+        write_file(os.path.join(test_dir, 'bin', 'script.sh'), "#!/bin/bash\necho hello\n")
+        write_file(os.path.join(test_dir, 'bin', 'truncated'), b'\x7fELF\x02\x01\x01', forced=True)
+
+        libfoo = os.path.join(test_dir, 'lib', 'libfoo.so.1.2.3')
+        cmds = [
+            "gcc -shared -fPIC -Wl,-soname,libfoo.so.1 -Wl,-rpath,/opt/test/lib -o %s foo.c" % libfoo,
+            "gcc -c -o lib/main.o main.c",
+            "gcc -o bin/main main.c",
+        ]
+        for cmd in cmds:
+            run_shell_cmd(cmd, work_dir=test_dir, hidden=True)
+        symlink(libfoo, os.path.join(test_dir, 'lib', 'libfoo.so'))
+
+        elf_index = elfscan.scan_elf_files(test_dir)
+        expected_paths = [os.path.join(test_dir, 'bin', 'main'), os.path.join(test_dir, 'lib', 'libfoo.so.1.2.3'),
+                          os.path.join(test_dir, 'lib', 'main.o')]
+        self.assertEqual(sorted(elf_index), expected_paths)
+
+        libfoo_info = elf_index[libfoo]
+        self.assertEqual(libfoo_info['type'], elfscan.ELF_SHARED_LIBRARY)
+        self.assertTrue(libfoo_info['dynamic'])
+        self.assertEqual(libfoo_info['soname'], 'libfoo.so.1')
+        self.assertIn('libc.so.6', libfoo_info['needed'])
+        self.assertEqual(libfoo_info['rpath'] + libfoo_info['runpath'], ['/opt/test/lib'])
+
+        main_info = elf_index[os.path.join(test_dir, 'bin', 'main')]
+        self.assertEqual(main_info['type'], elfscan.ELF_EXECUTABLE)
+        self.assertTrue(main_info['interp'])
+        self.assertEqual(main_info['soname'], None)
+        self.assertIn('libc.so.6', main_info['needed'])
+
+        main_obj_info = elf_index[os.path.join(test_dir, 'lib', 'main.o')]
+        self.assertEqual(main_obj_info['type'], elfscan.ELF_OBJECT)
+        self.assertFalse(main_obj_info['dynamic'])
+
+        self.assertEqual(elfscan.read_elf_info(os.path.join(test_dir, 'bin', 'script.sh')), None)
+        self.assertEqual(elfscan.read_elf_info(os.path.join(test_dir, 'bin', 'truncated')), None)
+
+        # symlinks named after SONAME are created like 'ldconfig -N' does
+        lib_dir = os.path.join(test_dir, 'lib')
+        self.assertEqual(elfscan.create_soname_symlinks(lib_dir), [os.path.join(lib_dir, 'libfoo.so.1')])
+        self.assertEqual(os.readlink(os.path.join(lib_dir, 'libfoo.so.1')), 'libfoo.so.1.2.3')
+        self.assertEqual(elfscan.create_soname_symlinks(lib_dir), [])
+
+        # check for banned/required linked shared libraries is only done for dynamically linked ELF files
+        class FakeToolchain(object):
+            def banned_linked_shared_libs(self):
+                return []
+
+            def required_linked_shared_libs(self):
+                return []
+
+        class FakeConfig(dict):
+            parallel = 2
+            toolchain = FakeToolchain()
+
+        class FakeEasyBlock(EasyBlock):
+            def __init__(self):
+                self.cfg = FakeConfig(bin_lib_subdirs=None, banned_linked_shared_libs=[],
+                                      required_linked_shared_libs=[])
+                self.installdir = test_dir
+                self.log = fancylogger.getLogger('test_elfscan')
+
+        eb = FakeEasyBlock()
+        fallback_subdirs = []
+
+        def fallback(subdirs=None):
+            fallback_subdirs.append(subdirs)
+            return 'fallback'
+
+        # no index of ELF files is determined if there are no banned/required libraries
+        self.assertEqual(elfscan.sanity_check_linked_shared_libs_elf_only(eb, fallback), None)
+        self.assertFalse(hasattr(eb, '_elf_index'))
+
+        eb.cfg['required_linked_shared_libs'] = ['libc.so.6']
+        self.assertEqual(elfscan.sanity_check_linked_shared_libs_elf_only(eb, fallback), None)
+        self.assertEqual(sorted(elfscan.get_elf_index(eb)), expected_paths)
+
+        # only dynamically linked ELF files are checked (incl. symlinks to them), not scripts or object files
+        eb.cfg['required_linked_shared_libs'] = ['libfoo.so.1']
+        expected_failed = [os.path.join(test_dir, 'bin', 'main')]
+        expected_failed.extend(os.path.join(lib_dir, x) for x in ('libfoo.so', 'libfoo.so.1', 'libfoo.so.1.2.3'))
+        res = elfscan.sanity_check_linked_shared_libs_elf_only(eb, fallback)
+        self.assertEqual(res, "Check for banned/required shared libraries failed for %s" % ', '.join(expected_failed))
+
+        eb.cfg['required_linked_shared_libs'] = []
+        eb.cfg['banned_linked_shared_libs'] = ['c']
+        res = elfscan.sanity_check_linked_shared_libs_elf_only(eb, fallback, subdirs=['lib'])
+        expected_failed = expected_failed[1:]
+        self.assertEqual(res, "Check for banned/required shared libraries failed for %s" % ', '.join(expected_failed))
+        self.assertEqual(fallback_subdirs, [])
+
+        # index of ELF files is only determined once
+        eb._elf_index = (test_dir, {})
+        self.assertEqual(elfscan.get_elf_index(eb), {})
+        self.assertEqual(sorted(elfscan.get_elf_index(eb, refresh=True)), expected_paths)
+
+        # all files are checked as usual if no ELF files are found
+        mkdir(os.path.join(test_dir, 'share'))
+        write_file(os.path.join(test_dir, 'share', 'README'), 'readme')
+        self.assertEqual(elfscan.sanity_check_linked_shared_libs_elf_only(eb, fallback, subdirs=['share']), 'fallback')
+        self.assertEqual(fallback_subdirs, [['share']])
+
+    def test_adjust_permissions_tree(self):
+        """Test adjusting permissions of directory tree in a single pass."""
+        test_dir = os.path.join(self.tmpdir, 'perms')
+        for subdir in ('a/b/c', 'd'):
+            mkdir(os.path.join(test_dir, subdir), parents=True)
+        for path in ('foo.txt', 'a/bar.txt', 'a/b/c/baz.txt', 'd/qux.sh'):
+            write_file(os.path.join(test_dir, path), path)
+        symlink(os.path.join(test_dir, 'a', 'bar.txt'), os.path.join(test_dir, 'd', 'bar.txt'))
+
+        outside_file = os.path.join(self.tmpdir, 'outside.txt')
+        write_file(outside_file, 'outside')
+        symlink(outside_file, os.path.join(test_dir, 'outside.txt'))
+
+        for root, dirs, files in os.walk(test_dir):
+            for name in dirs + files:
+                os.chmod(os.path.join(root, name), 0o700 if name in dirs else 0o644)
+        os.chmod(outside_file, 0o600)
+        os.chmod(test_dir, 0o700)
+
+        permissions.adjust_permissions_tree(test_dir, add_file_bits=stat.S_IROTH | stat.S_IXUSR,
+                                            add_dir_bits=stat.S_IROTH | stat.S_IXOTH, remove_file_bits=stat.S_IWGRP,
+                                            max_workers=2)
+
+        def get_perms(path):
+            return stat.S_IMODE(os.lstat(path).st_mode)
+
+        for subdir in ('', 'a', 'a/b', 'a/b/c', 'd'):
+            self.assertEqual(get_perms(os.path.join(test_dir, subdir)), 0o705)
+        for path in ('foo.txt', 'a/bar.txt', 'a/b/c/baz.txt', 'd/qux.sh'):
+            self.assertEqual(get_perms(os.path.join(test_dir, path)), 0o744)
+
+        # files symlinks point to are not touched
+        self.assertEqual(get_perms(outside_file), 0o600)
+
+        error_pattern = "Failed to chmod several paths"
+        self.assertErrorRegex(EasyBuildError, error_pattern, permissions.adjust_permissions_tree,
+                              os.path.join(test_dir, 'nosuchdir'))
+
+    def test_test_history(self):
+        """Test keeping history of test outcomes."""
+        toolchain = {'name': 'foss', 'version': '2025a'}
+        self.assertEqual(testhistory.TestHistory.for_installation('PyTorch', '2.7.1', toolchain), None)
+
+        history_dir = os.path.join(self.tmpdir, 'test_history')
+        os.environ['EB_TEST_HISTORY_DIR'] = history_dir
+        history = testhistory.TestHistory.for_installation('PyTorch', '2.7.1', toolchain)
+        self.assertEqual(history.path, os.path.join(history_dir, 'PyTorch', '2.7.1-foss-2025a.json'))
+        self.assertEqual(history.tests, {})
+
+        history.record('test_nn::TestNN.test_ok', testhistory.TEST_PASSED, duration=1.0)
+        history.record('test_nn::TestNN.test_flaky', testhistory.TEST_PASSED, duration=2.0)
+        history.record('test_nn::TestNN.test_flaky', testhistory.TEST_FAILED, duration=4.0)
+        history.record('test_nn::TestNN.test_broken', testhistory.TEST_FAILED)
+        self.assertErrorRegex(ValueError, "Unknown test outcome", history.record, 'test_nn::TestNN.test_ok', 'oops')
+        self.assertEqual(history.tests['test_nn::TestNN.test_flaky']['duration'], 3.0)
+        history.save()
+
+        history = testhistory.TestHistory.for_installation('PyTorch', '2.7.1', toolchain)
+        self.assertTrue(history.is_flaky('test_nn::TestNN.test_flaky'))
+        self.assertFalse(history.is_flaky('test_nn::TestNN.test_ok'))
+        failed_tests = ['test_nn::TestNN.test_broken', 'test_nn::TestNN.test_flaky', 'test_nn::TestNN.test_new',
+                        'test_nn::TestNN.test_ok']
+        expected = (['test_nn::TestNN.test_new', 'test_nn::TestNN.test_ok'], ['test_nn::TestNN.test_flaky'],
+                    ['test_nn::TestNN.test_broken'])
+        self.assertEqual(history.classify_failures(failed_tests), expected)
+
+        # history is specific to software name, version and toolchain
+        history = testhistory.TestHistory.for_installation('PyTorch', '2.8.0', toolchain)
+        self.assertEqual(history.tests, {})
+
+    def test_mpi_microbenchmark(self):
+        """Test parsing and checking results of on-node MPI microbenchmark."""
+        output = '\n'.join([
+            "some warning from the MPI runtime",
+            "ranks: 4",
+            "pingpong_latency_us: 0.412",
+            "pingpong_bandwidth_MBps: 9876.5",
+            "allreduce_latency_us: 1.234",
+        ])
+        results = mpibench.parse_mpi_microbenchmark_output(output)
+        expected = {
+            'ranks': 4,
+            'pingpong_latency_us': 0.412,
+            'pingpong_bandwidth_MBps': 9876.5,
+            'allreduce_latency_us': 1.234,
+        }
+        self.assertEqual(results, expected)
+
+        error_pattern = "Failed to determine allreduce_latency_us from output of MPI microbenchmark"
+        self.assertErrorRegex(EasyBuildError, error_pattern, mpibench.parse_mpi_microbenchmark_output,
+                              output.replace('allreduce', 'reduce'))
+
+        self.assertEqual(mpibench.check_mpi_microbenchmark_results(results, {}), [])
+        thresholds = {'max_latency': 1.0, 'min_bandwidth': 5000, 'max_allreduce_latency': 2}
+        self.assertEqual(mpibench.check_mpi_microbenchmark_results(results, thresholds), [])
+
+        thresholds = {'max_latency': 0.4, 'min_bandwidth': 10000, 'max_allreduce_latency': 2}
+        expected = [
+            "MPI microbenchmark result pingpong_latency_us=0.412 does not meet threshold max_latency=0.4",
+            "MPI microbenchmark result pingpong_bandwidth_MBps=9876.5 does not meet threshold min_bandwidth=10000",
+        ]
+        self.assertEqual(sorted(mpibench.check_mpi_microbenchmark_results(results, thresholds)), sorted(expected))
+
+        error_pattern = "Unknown threshold.*: max_bandwidth"
+        self.assertErrorRegex(EasyBuildError, error_pattern, mpibench.check_mpi_microbenchmark_results,
+                              results, {'max_bandwidth': 1})
+
+    def test_det_build_order_levels(self):
+        """Test det_build_order_levels function."""
+        # GCC stage 2: GMP first, then ISL and PPL, then CLooG (which uses ISL or PPL)
+        deps = {'gmp': [], 'isl': ['gmp'], 'ppl': ['gmp'], 'cloog': ['gmp', 'isl']}
+        self.assertEqual(buildorder.det_build_order_levels(deps), [['gmp'], ['isl', 'ppl'], ['cloog']])
+        deps = {'gmp': [], 'ppl': ['gmp'], 'cloog': ['gmp', 'ppl']}
+        self.assertEqual(buildorder.det_build_order_levels(deps), [['gmp'], ['ppl'], ['cloog']])
+        self.assertEqual(buildorder.det_build_order_levels({'gmp': []}), [['gmp']])
+        self.assertEqual(buildorder.det_build_order_levels({}), [])
+
+        # dependencies on items that are not being built are ignored
+        self.assertEqual(buildorder.det_build_order_levels({'isl': ['gmp'], 'cloog': ['isl']}), [['isl'], ['cloog']])
+
+        error_pattern = "Circular dependencies found between a, b"
+        self.assertErrorRegex(EasyBuildError, error_pattern, buildorder.det_build_order_levels,
+                              {'a': ['b'], 'b': ['a']})
+
+    def test_gcc_stage2(self):
+        """Test building libraries in stage 2 and caching them in GCC easyblock."""
+
+        class FakeConfig(dict):
+            parallel = 4
+
+        class FakeGCC(gcc.EB_GCC):
+            version = '13.2.0'
+
+            def run_configure_cmd(self, cmd, work_dir=None):
+                return run_shell_cmd(cmd, work_dir=work_dir)
+
+        gcc_eb = object.__new__(FakeGCC)
+        gcc_eb.log = fancylogger.getLogger('test_gcc_stage2')
+        gcc_eb.stage2_install_lock = gcc.threading.Lock()
+
+        srcs = []
+        for name in ['gcc-13.2.0.tar.gz', 'gmp-6.3.0.tar.bz2']:
+            path = os.path.join(self.tmpdir, name)
+            write_file(path, name)
+            srcs.append({'name': name, 'path': path})
+        gcc_eb.src = srcs
+
+        prefix = os.path.join(self.tmpdir, 'stage2_stuff')
+        gcc_eb.cfg = FakeConfig(cache_stage2=False, preconfigopts='', start_dir=self.tmpdir)
+        cmds = {'gmp': './configure --prefix=%s' % prefix}
+        self.assertEqual(gcc_eb.det_stage2_cache_dir(cmds), None)
+
+        gcc_eb.cfg['cache_stage2'] = True
+        cache_dir = gcc_eb.det_stage2_cache_dir(cmds)
+        self.assertTrue(os.path.basename(cache_dir).startswith('13.2.0-'))
+        self.assertEqual(gcc_eb.det_stage2_cache_dir(cmds), cache_dir)
+
+        # cache directory is specific to sources, configure commands and compiler flags
+        write_file(srcs[1]['path'], 'changed')
+        self.assertNotEqual(gcc_eb.det_stage2_cache_dir(cmds), cache_dir)
+        write_file(srcs[1]['path'], srcs[1]['name'])
+        self.assertNotEqual(gcc_eb.det_stage2_cache_dir({'gmp': cmds['gmp'] + ' --enable-cxx'}), cache_dir)
+        os.environ['CFLAGS'] = '-O2 -march=native'
+        self.assertNotEqual(gcc_eb.det_stage2_cache_dir(cmds), cache_dir)
+        del os.environ['CFLAGS']
+        self.assertEqual(gcc_eb.det_stage2_cache_dir(cmds), cache_dir)
+
+        # libraries built concurrently in stage 2 are installed one at a time, since they share the same prefix
+        makefile = '\n'.join([
+            'all:',
+            '\ttouch built',
+            'install:',
+            '\tmkdir %s/installing' % prefix,
+            '\tsleep 1',
+            '\trmdir %s/installing' % prefix,
+            '',
+        ])
+        for lib in ['isl', 'ppl']:
+            write_file(os.path.join(prefix, lib, 'Makefile'), makefile)
+        with ThreadPoolExecutor(max_workers=2) as thread_pool:
+            futures = [thread_pool.submit(gcc_eb.build_stage2_lib, lib, prefix, 'true', '-j 2')
+                       for lib in ['isl', 'ppl']]
+            for future in futures:
+                future.result()
+        for lib in ['isl', 'ppl']:
+            self.assertExists(os.path.join(prefix, lib, 'built'))
+            log_txt = read_file(os.path.join(self.tmpdir, 'stage2_logs', '%s.log' % lib))
+            self.assertIn('== make install\n', log_txt)
+
+        # failing commands are reported, and their output is included in log file for library
+        write_file(os.path.join(prefix, 'cloog', 'Makefile'), 'all:\n\t@echo cloog is broken && false\n')
+        error_pattern = r"Building cloog in stage 2 failed: 'make -j 2' exited with exit code 2 \(see also .*\)"
+        self.assertErrorRegex(EasyBuildError, error_pattern, gcc_eb.build_stage2_lib, 'cloog', prefix, 'true', '-j 2')
+        log_txt = read_file(os.path.join(self.tmpdir, 'stage2_logs', 'cloog.log'))
+        self.assertIn('== make -j 2\n', log_txt)
+        self.assertIn('cloog is broken', log_txt)
+
+    def test_run_compiler_smoke_tests(self):
+        """Test run_compiler_smoke_tests function."""
+        self.assertEqual(smoketests.run_compiler_smoke_tests([]), [])
+
+        smoke_tests = [
+            {'name': 'sleep', 'cmd': "sleep 1 && cat test.c", 'files': {'test.c': 'int main() { return 0; }\n'}},
+            {'name': 'pwd', 'cmd': "ls -A && touch a.out && pwd"},
+            {'name': 'fail', 'cmd': "echo oops && exit 3"},
+            {'name': 'also_sleep', 'cmd': "sleep 1 && ls"},
+        ]
+        start_time = time.time()
+        results = smoketests.run_compiler_smoke_tests(smoke_tests)
+        # smoke tests are run concurrently
+        self.assertTrue(time.time() - start_time < 2)
+
+        self.assertEqual([(res['name'], res['exit_code']) for res in results],
+                         [('sleep', 0), ('pwd', 0), ('fail', 3), ('also_sleep', 0)])
+        self.assertEqual(results[0]['output'], 'int main() { return 0; }\n')
+        self.assertEqual(results[2]['output'], 'oops\n')
+        self.assertTrue(results[0]['time'] >= 1)
+        # each smoke test is run in a separate empty temporary directory, which is cleaned up afterwards
+        pwd = results[1]['output'].strip()
+        self.assertTrue(os.path.basename(pwd).startswith('eb-compiler-smoke-test-'))
+        self.assertFalse(os.path.exists(pwd))
+        self.assertEqual(results[3]['output'], '')
+
+        # smoke tests can be run one by one
+        start_time = time.time()
+        results = smoketests.run_compiler_smoke_tests(smoke_tests, max_workers=1)
+        self.assertTrue(time.time() - start_time >= 2)
+        self.assertEqual([res['exit_code'] for res in results], [0, 0, 3, 0])
+
+    def test_boost_stage_headers(self):
+        """Test stage_headers function provided by Boost easyblock."""
+        src_dir = os.path.join(self.tmpdir, 'boost_1_88_0', 'boost')
+        for fn in ('version.hpp', os.path.join('detail', 'workaround.h'), os.path.join('spirit', 'impl.ipp'),
+                   os.path.join('preprocessor', 'iter.inc'), os.path.join('doc', 'README.md')):
+            write_file(os.path.join(src_dir, fn), fn)
+
+        target_dir = os.path.join(self.tmpdir, 'install', 'include', 'boost')
+        # existing files are replaced
+        write_file(os.path.join(target_dir, 'version.hpp'), 'old')
+
+        self.assertEqual(boost.stage_headers(src_dir, target_dir, max_workers=2), 4)
+        for fn in ('version.hpp', os.path.join('detail', 'workaround.h'), os.path.join('spirit', 'impl.ipp'),
+                   os.path.join('preprocessor', 'iter.inc')):
+            target = os.path.join(target_dir, fn)
+            self.assertEqual(read_file(target), fn)
+            # timestamps are retained, so b2 considers headers to be up-to-date
+            self.assertEqual(os.stat(target).st_mtime, os.stat(os.path.join(src_dir, fn)).st_mtime)
+        self.assertFalse(os.path.exists(os.path.join(target_dir, 'doc')))
+
+    def test_python_exts_preflight(self):
+        """Test pre-flight check for extensions of bundle of Python packages."""
+        self.assertEqual(pypreflight.parse_wheel_filename('Foo_Bar-1.0-1-py2.py3-none-any.whl'),
+                         ('foo-bar', '1.0', {'py2-none-any', 'py3-none-any'}))
+        self.assertEqual(pypreflight.parse_wheel_filename('foo-1.0.tar.gz'), None)
+
+        def pkg_info(name, version, requires):
+            lines = ['Metadata-Version: 2.2', 'Name: ' + name, 'Version: ' + version]
+            return '\n'.join(lines + ['Requires-Dist: ' + x for x in requires]) + '\n\nDescription\n'
+
+        # sdist with PKG-INFO in top-level directory
+        sdist_dir = os.path.join(self.tmpdir, 'sdist')
+        write_file(os.path.join(sdist_dir, 'foo-1.0', 'PKG-INFO'),
+                   pkg_info('foo', '1.0', ['bar>=2.0', 'baz', 'pytest; extra == "test"']))
+        write_file(os.path.join(sdist_dir, 'foo-1.0', 'tests', 'PKG-INFO'), pkg_info('oops', '0.0', []))
+        sdist = os.path.join(self.tmpdir, 'foo-1.0.tar.gz')
+        run_shell_cmd("tar czf %s foo-1.0" % sdist, work_dir=sdist_dir, hidden=True)
+        metadata = pypreflight.read_dist_metadata(sdist)
+        self.assertEqual((metadata['name'], metadata['version']), ('foo', '1.0'))
+        self.assertEqual(metadata['requires_dist'], ['bar>=2.0', 'baz', 'pytest; extra == "test"'])
+
+        # wheel in wheelhouse, sdist that is not used
+        wheelhouse = os.path.join(self.tmpdir, 'wheelhouse')
+        wheel = os.path.join(wheelhouse, 'bar-1.5-py3-none-any.whl')
+        mkdir(wheelhouse)
+        with zipfile.ZipFile(wheel, 'w') as whl:
+            whl.writestr('bar-1.5.dist-info/METADATA', pkg_info('bar', '1.5', []))
+        write_file(os.path.join(wheelhouse, 'bar-1.5-cp27-cp27m-linux_x86_64.whl'), '')
+        bar_sdist = os.path.join(self.tmpdir, 'bar-1.5.tar.gz')
+        write_file(bar_sdist, 'not used')
+
+        exts = [
+            {'name': 'bar', 'version': '1.5', 'src': bar_sdist},
+            {'name': 'foo', 'version': '1.0', 'src': sdist, 'reusable': False},
+            {'name': 'missing', 'version': '0.1', 'src': None},
+        ]
+        target_info = {
+            'tags': ['cp312-cp312-linux_x86_64', 'py3-none-any'],
+            'installed': {},
+            'marker_env': {'python_full_version': '3.12.3', 'python_version': '3.12', 'sys_platform': 'linux'},
+        }
+        plan = pypreflight.make_python_exts_plan(exts, target_info, wheelhouse=wheelhouse, max_workers=2)
+        self.assertEqual([x['action'] for x in plan['exts']], ['reuse', 'build', 'missing'])
+        self.assertEqual(plan['exts'][0]['wheel'], wheel)
+        self.assertEqual(plan['exts'][0]['wheel_checksum'], compute_checksum(wheel, checksum_type='sha256'))
+        self.assertEqual(plan['exts'][1]['wheel_checksum'], None)
+        expected = [('foo', 'baz', "not available")]
+        if pypreflight.HAVE_PACKAGING:
+            expected.insert(0, ('foo', 'bar>=2.0', "version 1.5 is available"))
+        self.assertEqual(plan['conflicts'], expected)
+        regex = re.compile(r"^Plan for 3 extensions: 1 reused from wheelhouse, 1 built from source, 1 missing source")
+        self.assertTrue(regex.search(pypreflight.format_python_exts_plan(plan)))
+
+        # default wheelhouse is specific to toolchain and versions of (non-Python) dependencies
+        class FakeToolchain:
+            name, version = 'foss', '2025a'
+
+        class FakeConfig(dict):
+            toolchain = FakeToolchain()
+
+            def dependencies(self):
+                return self['deps']
+
+        pybundle_eb = object.__new__(pythonbundle.PythonBundle)
+        pybundle_eb.cfg = FakeConfig(wheelhouse=None, deps=[
+            {'name': 'Python', 'version': '3.13.1', 'versionsuffix': ''},
+            {'name': 'FlexiBLAS', 'version': '3.4.5', 'versionsuffix': ''},
+        ])
+        self.assertEqual(pybundle_eb.det_wheelhouse(), None)
+
+        os.environ[pypreflight.PYTHON_WHEELHOUSE_ENV_VAR] = wheelhouse
+        regex = re.compile(r'^%s/foss-2025a-[0-9a-f]{12}$' % re.escape(wheelhouse))
+        default_wheelhouse = pybundle_eb.det_wheelhouse()
+        self.assertTrue(regex.match(default_wheelhouse), "Pattern '%s' matches '%s'" % (regex.pattern,
+                                                                                        default_wheelhouse))
+        pybundle_eb.cfg['deps'][0]['version'] = '3.13.2'
+        self.assertEqual(pybundle_eb.det_wheelhouse(), default_wheelhouse)
+        pybundle_eb.cfg['deps'][1]['version'] = '3.4.6'
+        self.assertNotEqual(pybundle_eb.det_wheelhouse(), default_wheelhouse)
+
+        pybundle_eb.cfg['wheelhouse'] = wheelhouse
+        self.assertEqual(pybundle_eb.det_wheelhouse(), wheelhouse)
+
+    def test_extract_rpms(self):
+        """Test extracting RPMs without using 'rpm'."""
+
+        def cpio_entry(name, mode, data=b'', ino=1, nlink=1):
+            name = name.encode() + b'\0'
+            fields = [ino, mode, 0, 0, nlink, 1700000000, len(data), 0, 0, 0, 0, len(name), 0]
+            entry = b'070701' + ''.join('%08X' % x for x in fields).encode() + name
+            entry += b'\0' * ((4 - len(entry) % 4) % 4) + data
+            return entry + b'\0' * ((4 - len(data) % 4) % 4)
+
+        def rpm_file(name, compressor, compress, entries):
+            tags = [(rpm.RPMTAG_NAME, name), (rpm.RPMTAG_PAYLOADFORMAT, 'cpio'),
+                    (rpm.RPMTAG_PAYLOADCOMPRESSOR, compressor)]
+            index, data = b'', b''
+            for tag, value in tags:
+                index += struct.pack('>IIII', tag, 6, len(data), 1)
+                data += value.encode() + b'\0'
+            header = rpm.RPM_HEADER_MAGIC + b'\0' * 4 + struct.pack('>II', len(tags), len(data)) + index + data
+            signature = rpm.RPM_HEADER_MAGIC + b'\0' * 12
+            payload = compress(b''.join(entries) + cpio_entry(rpm.CPIO_TRAILER, 0, ino=0))
+            path = os.path.join(self.tmpdir, name + '.rpm')
+            write_file(path, rpm.RPM_LEAD_MAGIC + b'\0' * 92 + signature + header + payload)
+            return path
+
+        rpm_paths = [
+            rpm_file('foo', 'gzip', gzip.compress, [
+                cpio_entry('./opt/foo', stat.S_IFDIR | 0o755),
+                cpio_entry('./opt/foo/bin/foo', stat.S_IFREG | 0o755, b'#!/bin/sh\necho foo\n'),
+                cpio_entry('./opt/foo/bin/bar', stat.S_IFLNK | 0o777, b'foo'),
+                cpio_entry('./opt/foo/.config', stat.S_IFREG | 0o644, b'config'),
+                cpio_entry('./opt/foo/lib/libfoo.so.1', stat.S_IFREG | 0o644, ino=7, nlink=2),
+                cpio_entry('./opt/foo/lib/libfoo.so', stat.S_IFREG | 0o644, b'ELF', ino=7, nlink=2),
+            ]),
+            rpm_file('foo-doc', 'xz', lzma.compress, [
+                cpio_entry('./opt/foo/share/doc/README', stat.S_IFREG | 0o444, b'read me'),
+            ]),
+        ]
+        installdir = os.path.join(self.tmpdir, 'install')
+        res = rpm.extract_rpms(rpm_paths, installdir, max_workers=2)
+
+        self.assertEqual(sorted(res), ['foo-doc.rpm', 'foo.rpm'])
+        self.assertEqual(res['foo-doc.rpm'], ['opt/foo/share/doc/README'])
+        self.assertEqual(len(res['foo.rpm']), 6)
+
+        foo = os.path.join(installdir, 'opt', 'foo', 'bin', 'foo')
+        self.assertEqual(read_file(foo), "#!/bin/sh\necho foo\n")
+        self.assertTrue(os.access(foo, os.X_OK))
+        self.assertEqual(os.stat(foo).st_mtime, 1700000000)
+        self.assertEqual(os.readlink(os.path.join(installdir, 'opt', 'foo', 'bin', 'bar')), 'foo')
+        self.assertEqual(read_file(os.path.join(installdir, 'opt', 'foo', '.config')), 'config')
+        libfoo = os.path.join(installdir, 'opt', 'foo', 'lib', 'libfoo.so')
+        self.assertEqual(os.stat(libfoo).st_ino, os.stat(libfoo + '.1').st_ino)
+        self.assertEqual(read_file(os.path.join(installdir, 'opt', 'foo', 'share', 'doc', 'README')), 'read me')
+
+        # staging directories used for extracting RPMs are cleaned up
+        self.assertEqual(sorted(os.listdir(installdir)), ['opt'])
+
+        # files included in multiple RPMs are installed in order of RPMs, and must have the same contents
+        foo_extra = rpm_file('foo-extra', 'gzip', gzip.compress, [
+            cpio_entry('./opt/foo/bin/bar', stat.S_IFLNK | 0o777, b'foo'),
+            cpio_entry('./opt/foo/.config', stat.S_IFREG | 0o644, b'config'),
+            cpio_entry('./opt/foo/extra.txt', stat.S_IFREG | 0o644, b'extra'),
+        ])
+        installdir = os.path.join(self.tmpdir, 'install-dups')
+        res = rpm.extract_rpms(rpm_paths + [foo_extra], installdir, max_workers=3)
+        self.assertEqual(list(res), ['foo.rpm', 'foo-doc.rpm', 'foo-extra.rpm'])
+        self.assertEqual(read_file(os.path.join(installdir, 'opt', 'foo', 'extra.txt')), 'extra')
+
+        foo_conflict = rpm_file('foo-conflict', 'gzip', gzip.compress, [
+            cpio_entry('./opt/foo/.config', stat.S_IFREG | 0o644, b'other config'),
+        ])
+        installdir = os.path.join(self.tmpdir, 'install-conflict')
+        error_pattern = "File opt/foo/.config from foo-conflict.rpm differs from file installed from foo.rpm"
+        self.assertErrorRegex(EasyBuildError, error_pattern, rpm.extract_rpms, rpm_paths + [foo_conflict],
+                              installdir, max_workers=3)
+        self.assertEqual(read_file(os.path.join(installdir, 'opt', 'foo', '.config')), 'config')
+        self.assertEqual(sorted(os.listdir(installdir)), ['opt'])
+
+        # paths outside of installation directory are not allowed
+        bad_rpm = rpm_file('bad', 'gzip', gzip.compress, [cpio_entry('./../../etc/passwd', stat.S_IFREG | 0o644)])
+        error_pattern = "Failed to extract bad.rpm: Path in RPM payload is outside of installation prefix"
+        self.assertErrorRegex(EasyBuildError, error_pattern, rpm.extract_rpm, bad_rpm, installdir)
+
+        # also not via symlinks to directories, included in the same RPM or in another RPM
+        outside_dir = os.path.join(self.tmpdir, 'outside')
+        mkdir(outside_dir)
+        lib_symlink = cpio_entry('./opt/x/lib', stat.S_IFLNK | 0o777, outside_dir.encode())
+        libx = cpio_entry('./opt/x/lib/libx.so', stat.S_IFREG | 0o644, b'ELF')
+        bad_rpm = rpm_file('bad-symlink', 'gzip', gzip.compress, [lib_symlink, libx])
+        error_pattern = "Path in RPM payload is outside of installation prefix \\(via symlink to %s\\)" % outside_dir
+        installdir = os.path.join(self.tmpdir, 'install-symlink')
+        self.assertErrorRegex(EasyBuildError, error_pattern, rpm.extract_rpms, [bad_rpm], installdir)
+        bad_rpms = [rpm_file('x', 'gzip', gzip.compress, [lib_symlink]),
+                    rpm_file('x-libs', 'gzip', gzip.compress, [libx])]
+        installdir = os.path.join(self.tmpdir, 'install-symlinks')
+        self.assertErrorRegex(EasyBuildError, error_pattern, rpm.extract_rpms, bad_rpms, installdir)
+        self.assertEqual(os.listdir(outside_dir), [])
+
+        # errors when decompressing payload mention the RPM
+        corrupt_rpm = rpm_file('corrupt', 'xz', lambda data: lzma.compress(data)[:5000], [
+            cpio_entry('./opt/foo/share/corrupt.bin', stat.S_IFREG | 0o644, os.urandom(10000)),
+        ])
+        error_pattern = "Failed to extract corrupt.rpm: "
+        self.assertErrorRegex(EasyBuildError, error_pattern, rpm.extract_rpm, corrupt_rpm, installdir)
+
+        # pre/post install scripts are not run when RPMs are extracted, so that combination is not allowed
+        rpm_eb = object.__new__(rpm.Rpm)
+        rpm_eb.cfg = {'extract_rpms': True, 'preinstall': True, 'postinstall': False}
+        rpm_eb.log = fancylogger.getLogger('test_extract_rpms')
+        error_pattern = "'extract_rpms' can not be combined with 'preinstall' or 'postinstall'"
+        self.assertErrorRegex(EasyBuildError, error_pattern, rpm_eb.configure_step)
+        rpm_eb.cfg['preinstall'] = False
+        rpm_eb.configure_step()
+
+        # zstd payload, decompressed with 'zstd' command (if available)
+        if which('zstd', log_ok=False):
+            def zstd_compress(data):
+                return subprocess.run(['zstd', '-cq'], input=data, stdout=subprocess.PIPE, check=True).stdout
+
+            zstd_rpm = rpm_file('foo-zstd', 'zstd', zstd_compress, [
+                cpio_entry('./opt/foo/share/zstd.txt', stat.S_IFREG | 0o644, b'zstd' * 1000),
+            ])
+            orig_zstandard = rpm.zstandard
+            try:
+                rpm.zstandard = None
+                res = rpm.extract_rpm(zstd_rpm, installdir)
+            finally:
+                rpm.zstandard = orig_zstandard
+            self.assertEqual(res, ['opt/foo/share/zstd.txt'])
+            self.assertEqual(read_file(os.path.join(installdir, 'opt', 'foo', 'share', 'zstd.txt')), 'zstd' * 1000)
+
+    def test_openfoam_incremental_build(self):
+        """Test incremental builds for OpenFOAM, using cached wmake object tree of failed installation attempt."""
+        builddir = os.path.join(self.tmpdir, 'build')
+        openfoamdir = 'OpenFOAM-eb-test-incremental'
+        write_file(os.path.join(builddir, openfoamdir, 'etc', 'bashrc'), '\n'.join([
+            "export WM_PROJECT_DIR=$TEST_INSTALLDIR/%s" % openfoamdir,
+            "export WM_COMPILER=${TEST_WM_COMPILER:-Gcc}",
+            "wclean() { rm -rf $WM_PROJECT_DIR/platforms; }",
+        ]))
+        # fake build script: builds objects that are not there yet, and fails after first object if requested
+        write_file(os.path.join(builddir, openfoamdir, 'Allwmake'), '\n'.join([
+            "mkdir -p $WM_PROJECT_DIR/platforms/obj",
+            "for obj in a b; do",
+            "    if [ ! -f $WM_PROJECT_DIR/platforms/obj/$obj.o ]; then",
+            "        echo $obj >> %s" % os.path.join(self.tmpdir, 'built.txt'),
+            "        touch $WM_PROJECT_DIR/platforms/obj/$obj.o",
+            "    fi",
+            "    [ -z $TEST_FAIL_BUILD ] || exit 1",
+            "done",
+        ]))
+        src_path = os.path.join(self.tmpdir, 'OpenFOAM-test.tgz')
+        write_file(src_path, 'source')
+        patch_path = os.path.join(self.tmpdir, 'OpenFOAM-test-fix.patch')
+        write_file(patch_path, 'patch')
+
+        class FakeToolchain(object):
+            def get_variable(self, name, typ):
+                return []
+
+        class FakeConfig(dict):
+            toolchain = FakeToolchain()
+
+        def get_openfoam_eb():
+            """Get (fake) OpenFOAM easyblock instance, for new installation attempt."""
+            eb = object.__new__(openfoam.EB_OpenFOAM)
+            eb.cfg = FakeConfig(incremental_build=True, prebuildopts='')
+            eb.log = fancylogger.getLogger('test_openfoam_incremental_build')
+            eb.builddir = builddir
+            eb.installdir = os.path.join(self.tmpdir, 'install')
+            eb.openfoamdir = openfoamdir
+            eb.looseversion = LooseVersion('2312')
+            eb.is_extend = False
+            eb.src = [{'name': os.path.basename(src_path), 'path': src_path}]
+            eb.patches = []
+            eb.build_cache_dir = None
+            eb.object_tree_built = False
+            # sources are unpacked in installation directory, since OpenFOAM is built in installation directory
+            remove_dir(eb.installdir)
+            mkdir(os.path.join(eb.installdir, openfoamdir), parents=True)
+            return eb
+
+        def built():
+            """Return list of objects built so far (and reset it)."""
+            built_path = os.path.join(self.tmpdir, 'built.txt')
+            res = read_file(built_path).split() if os.path.exists(built_path) else []
+            remove_file(built_path)
+            return res
+
+        os.environ['TEST_INSTALLDIR'] = os.path.join(self.tmpdir, 'install')
+        cache_prefix = os.path.join(build_path(), 'openfoam-build-cache', openfoamdir)
+        orig_easyblock_methods = (EasyBlock.run_all_steps, EasyBlock.post_processing_step)
+        try:
+            # no cache directory if incremental builds are not enabled
+            eb = get_openfoam_eb()
+            eb.cfg['incremental_build'] = False
+            self.assertEqual(eb.det_build_cache_dir('true'), None)
+
+            # cache directory is specific to sources and build settings, but not to patches
+            eb = get_openfoam_eb()
+            precmd = 'source %s' % os.path.join(builddir, openfoamdir, 'etc', 'bashrc')
+            cache_dir = eb.det_build_cache_dir(precmd)
+            self.assertTrue(cache_dir.startswith(cache_prefix + '-'))
+            eb.patches = [{'name': os.path.basename(patch_path), 'path': patch_path}]
+            self.assertEqual(eb.det_build_cache_dir(precmd), cache_dir)
+            os.environ['TEST_WM_COMPILER'] = 'Icx'
+            self.assertNotEqual(eb.det_build_cache_dir(precmd), cache_dir)
+            del os.environ['TEST_WM_COMPILER']
+            eb.cfg['prebuildopts'] = 'FOO=bar'
+            self.assertNotEqual(eb.det_build_cache_dir(precmd), cache_dir)
+            eb.cfg['prebuildopts'] = ''
+            write_file(src_path, 'other source')
+            self.assertNotEqual(eb.det_build_cache_dir(precmd), cache_dir)
+            write_file(src_path, 'source')
+
+            # object tree is cached when build fails
+            os.environ['TEST_FAIL_BUILD'] = '1'
+            eb = get_openfoam_eb()
+            self.assertErrorRegex(RunShellCmdError, "Shell command 'source' failed", eb.build_step)
+            self.assertEqual(built(), ['a'])
+            self.assertEqual(eb.build_cache_dir, cache_dir)
+            self.assertEqual(os.listdir(os.path.join(cache_dir, 'platforms', 'obj')), ['a.o'])
+
+            # next attempt continues from cached object tree (also when a patch is added);
+            # cached object tree is kept after build succeeded
+            del os.environ['TEST_FAIL_BUILD']
+            eb = get_openfoam_eb()
+            eb.patches = [{'name': os.path.basename(patch_path), 'path': patch_path}]
+            eb.build_step()
+            self.assertEqual(built(), ['b'])
+            self.assertTrue(eb.object_tree_built)
+            self.assertTrue(os.path.exists(os.path.join(cache_dir, 'platforms', 'obj', 'a.o')))
+
+            # object tree is cached again if a later step fails, like the test or install step
+            def failing_run_all_steps(self, *args, **kwargs):
+                raise EasyBuildError("test step failed")
+
+            EasyBlock.run_all_steps = failing_run_all_steps
+            self.assertErrorRegex(EasyBuildError, "test step failed", eb.run_all_steps, False)
+            self.assertEqual(sorted(os.listdir(os.path.join(cache_dir, 'platforms', 'obj'))), ['a.o', 'b.o'])
+            eb = get_openfoam_eb()
+            eb.build_step()
+            self.assertEqual(built(), [])
+
+            # cached object tree is removed once installation succeeded
+            EasyBlock.post_processing_step = lambda self: None
+            eb.post_processing_step()
+            self.assertFalse(os.path.exists(cache_dir))
+            eb = get_openfoam_eb()
+            eb.build_step()
+            self.assertEqual(built(), ['a', 'b'])
+        finally:
+            EasyBlock.run_all_steps, EasyBlock.post_processing_step = orig_easyblock_methods
+            for path in glob.glob(cache_prefix + '*'):
+                remove_dir(path)
+
+    def test_cp2k_regtest(self):
+        """Test det_regtest_layout and parse_regtest_output functions from CP2K easyblock"""
+        self.assertEqual(cp2k.det_regtest_layout(128), (4, 1, 128))
+        self.assertEqual(cp2k.det_regtest_layout(128, openmp=True), (2, 2, 128))
+        self.assertEqual(cp2k.det_regtest_layout(30, openmp=True), (2, 2, 28))
+        self.assertEqual(cp2k.det_regtest_layout(3), (3, 1, 3))
+        self.assertEqual(cp2k.det_regtest_layout(1, openmp=True), (1, 1, 1))
+        self.assertEqual(cp2k.det_regtest_layout(128, openmp=True, ompthreads=8), (1, 8, 128))
+        self.assertEqual(cp2k.det_regtest_layout(16, openmp=True, ompthreads='3'), (1, 3, 15))
+        self.assertEqual(cp2k.det_regtest_layout(2, openmp=True, ompthreads=4), (1, 2, 2))
+
+        regtest_output = textwrap.dedent("""
+            --------------------------------------------------------------------------
+            >>> /tmp/cp2k-9.1/tests/QS/regtest-gpw-1
+                H2O-gpw.inp                                      -17.14603641       OK (   1.23 sec)
+                H2O-gpw-2.inp                                    -17.14603645 WRONG RESULT (   0.50 sec)
+            <<< /tmp/cp2k-9.1/tests/QS/regtest-gpw-1 (1 of 2) done in 1.73 sec
+            >>> /tmp/cp2k-9.1/tests/Fist/regtest-1
+                water_1.inp                                       RUNTIME FAIL
+                water_2.inp                                        -0.12345678       OK (  12.50 sec)
+            <<< /tmp/cp2k-9.1/tests/Fist/regtest-1 (2 of 2) done in 12.50 sec
+            --------------------------------- Summary --------------------------------
+            Number of FAILED  tests 1
+            Number of WRONG   tests 1
+            Number of CORRECT tests 2
+            Total number of   tests 4
+        """)
+        self.assertEqual(cp2k.parse_regtest_output(regtest_output), {
+            'QS/regtest-gpw-1/H2O-gpw.inp': {'status': 'OK', 'time': 1.23},
+            'QS/regtest-gpw-1/H2O-gpw-2.inp': {'status': 'WRONG RESULT', 'time': 0.5},
+            'Fist/regtest-1/water_1.inp': {'status': 'RUNTIME FAIL', 'time': None},
+            'Fist/regtest-1/water_2.inp': {'status': 'OK', 'time': 12.5},
+        })
+        self.assertEqual(cp2k.parse_regtest_output(''), {})
+
+    def test_cp2k_test_step(self):
+        """Test running regression test in test step of CP2K easyblock, using all available cores"""
+        start_dir = os.path.join(self.tmpdir, 'cp2k-2023.1')
+        regtest_script = os.path.join(start_dir, 'tools', 'regtesting', 'do_regtest')
+        write_file(regtest_script, '\n'.join([
+            '#!/bin/bash',
+            'echo "OMP_NUM_THREADS=$OMP_NUM_THREADS"',
+            'echo ">>> /tmp/cp2k/tests/QS/regtest-gpw-1"',
+            'echo "    H2O-gpw.inp      -17.14603641       OK (   1.23 sec)"',
+            'echo "    H2O-gpw-2.inp    -17.14603645       OK (   0.50 sec)"',
+            'cat cp2k_regtest.cfg',
+            'echo "Number of FAILED  tests 0"',
+            'echo "Number of WRONG   tests 0"',
+            'echo "Number of CORRECT tests 2"',
+            'echo "Total number of   tests 2"',
+        ]))
+        adjust_permissions(regtest_script, stat.S_IXUSR)
+
+        class FakeConfig(dict):
+            parallel = 16
+
+        class FakeToolchain:
+            def mpi_cmd_for(self, cmd, nr_ranks):
+                return 'mpirun -np %s %s' % (nr_ranks, cmd)
+
+        class FakeCP2K(cp2k.EB_CP2K):
+            version = '2023.1'
+            toolchain = FakeToolchain()
+
+        cp2k_eb = object.__new__(FakeCP2K)
+        cp2k_eb.log = fancylogger.getLogger('test_cp2k_test_step')
+        cp2k_eb.builddir = self.tmpdir
+        cp2k_eb.installdir = os.path.join(self.tmpdir, 'install')
+        cp2k_eb.regtest_results = None
+        cp2k_eb.typearch = 'Linux-x86-64-gfortran'
+        cp2k_eb.postmsg = ''
+        cp2k_eb.cfg = FakeConfig(runtest=True, start_dir=start_dir, type='psmp', omp_num_threads=None,
+                                 regtest_use_all_cores=True, ignore_regtest_fails=False, maxtasks=4)
+
+        orig_get_avail_core_count = cp2k.get_avail_core_count
+        cp2k.get_avail_core_count = lambda: 32
+        cwd = os.getcwd()
+        try:
+            cp2k_eb.test_step()
+            self.assertEqual(os.getenv('OMP_NUM_THREADS'), '2')
+            cfg_txt = read_file(os.path.join(self.tmpdir, 'cp2k_regtest.cfg'))
+            self.assertIn('maxtasks=16', cfg_txt)
+            self.assertIn('cp2k_run_prefix="mpirun -np 2 "', cfg_txt)
+
+            # number of OpenMP threads specified via omp_num_threads is taken into account
+            cp2k_eb.cfg['omp_num_threads'] = 3
+            cp2k_eb.test_step()
+            self.assertEqual(os.getenv('OMP_NUM_THREADS'), '3')
+            cfg_txt = read_file(os.path.join(self.tmpdir, 'cp2k_regtest.cfg'))
+            self.assertIn('maxtasks=15', cfg_txt)
+            self.assertIn('cp2k_run_prefix="mpirun -np 1 "', cfg_txt)
+
+            # results of individual tests are written to installation directory (only) in install step
+            expected_results = {
+                'QS/regtest-gpw-1/H2O-gpw.inp': {'status': 'OK', 'time': 1.23},
+                'QS/regtest-gpw-1/H2O-gpw-2.inp': {'status': 'OK', 'time': 0.5},
+            }
+            self.assertEqual(cp2k_eb.regtest_results, expected_results)
+            self.assertFalse(os.path.exists(cp2k_eb.installdir))
+            cp2k_eb.write_regtest_results()
+            report_path = os.path.join(cp2k_eb.installdir, config.log_path(), cp2k.REGTEST_RESULTS_FILE)
+            self.assertEqual(json.loads(read_file(report_path)), expected_results)
+        finally:
+            cp2k.get_avail_core_count = orig_get_avail_core_count
+            change_dir(cwd)
+
+    def test_ctest_resource_spec(self):
+        """Test create_ctest_resource_spec function from CMakeMake easyblock"""
+        self.assertEqual(cmakemake.parse_cpu_list('0-3,8,10-11\n'), [0, 1, 2, 3, 8, 10, 11])
+        self.assertEqual(cmakemake.parse_cpu_list('5'), [5])
+
+        numa_domains = cmakemake.det_numa_domains()
+        self.assertTrue(numa_domains)
+        self.assertTrue(all(cpus for cpus in numa_domains.values()))
+
+        numa_domains = {0: [0, 1, 2, 3], 1: [4, 5, 6, 7]}
+        spec = cmakemake.create_ctest_resource_spec(8, numa_domains=numa_domains)
+        self.assertEqual(spec['version'], {'major': 1, 'minor': 0})
+        self.assertEqual(spec['local'], [{
+            'cores': [{'id': '0', 'slots': 4}, {'id': '1', 'slots': 4}],
+            'numa': [{'id': '0', 'slots': 1}, {'id': '1', 'slots': 1}],
+            'mpi': [{'id': '0', 'slots': 8}],
+        }])
+
+        # only use part of the available cores
+        spec = cmakemake.create_ctest_resource_spec(3, numa_domains=numa_domains, mpi_slots=2)
+        self.assertEqual(spec['local'], [{
+            'cores': [{'id': '0', 'slots': 3}],
+            'numa': [{'id': '0', 'slots': 1}],
+            'mpi': [{'id': '0', 'slots': 2}],
+        }])
+
+        # more cores than available (oversubscription)
+        spec = cmakemake.create_ctest_resource_spec(10, numa_domains=numa_domains)
+        self.assertEqual(spec['local'][0]['cores'], [{'id': '0', 'slots': 6}, {'id': '1', 'slots': 4}])
+
+    def test_parse_ctest_junit(self):
+        """Test parse_ctest_junit function from CMakeMake easyblock"""
+        junit_path = os.path.join(self.tmpdir, 'ctest-junit.xml')
+        write_file(junit_path, textwrap.dedent("""
+            <?xml version="1.0" encoding="UTF-8"?>
+            <testsuite name="Linux-c++" tests="4" failures="1" disabled="1" skipped="0" hostname="" time="12">
+                <testcase name="test_fast" classname="test_fast" time="0.25" status="run">
+                    <system-out>ok</system-out>
+                </testcase>
+                <testcase name="test_slow" classname="test_slow" time="10.5" status="run"/>
+                <testcase name="test_broken" classname="test_broken" time="1.5" status="fail">
+                    <failure message="Failed"/>
+                </testcase>
+                <testcase name="test_disabled" classname="test_disabled" time="0" status="disabled">
+                    <skipped message="Disabled"/>
+                </testcase>
+            </testsuite>
+        """).lstrip())
+        self.assertEqual(cmakemake.parse_ctest_junit(junit_path), {
+            'test_fast': ('passed', 0.25),
+            'test_slow': ('passed', 10.5),
+            'test_broken': ('failed', 1.5),
+            'test_disabled': ('skipped', 0.0),
+        })
+
+        write_file(junit_path, "<testsuite><testcase")
+        self.assertErrorRegex(EasyBuildError, "Failed to parse CTest JUnit report", cmakemake.parse_ctest_junit,
+                              junit_path)
+
+    def test_ctest_cost_data(self):
+        """Test saving and restoring of CTest cost data in CMakeMake easyblock"""
+        class FakeConfig(dict):
+            pass
+
+        cmake_eb = object.__new__(cmakemake.CMakeMake)
+        cmake_eb.cfg = FakeConfig(name='test-ctest-cost-data', version='1.2.3', ctest_persist_cost_data=False)
+        cmake_eb.log = fancylogger.getLogger('test_ctest_cost_data')
+        cmake_eb.dry_run = False
+
+        saved_dir = os.path.join(build_path(), 'ctest-cost-data', 'test-ctest-cost-data', '1.2')
+        self.assertEqual(cmake_eb.ctest_cost_data_dir(), saved_dir)
+        remove_dir(saved_dir)
+
+        ctest_dir = os.path.join(self.tmpdir, 'build1')
+        write_file(os.path.join(ctest_dir, 'Testing', 'Temporary', 'CTestCostData.txt'), 'test_slow 1 100.0\n---\n')
+        write_file(os.path.join(ctest_dir, 'Testing', 'Temporary', 'LastTestsFailed.log'), '3:test_broken\n')
+
+        try:
+            # nothing is saved if ctest_persist_cost_data is not enabled (default)
+            cmake_eb.save_ctest_cost_data(ctest_dir=ctest_dir)
+            self.assertFalse(os.path.exists(saved_dir))
+
+            cmake_eb.cfg['ctest_persist_cost_data'] = True
+            cmake_eb.save_ctest_cost_data(ctest_dir=ctest_dir)
+            self.assertEqual(sorted(os.listdir(saved_dir)), ['CTestCostData.txt', 'LastTestsFailed.log'])
+
+            # cost data is restored for next build of same version series, without overwriting existing files
+            cmake_eb.cfg['version'] = '1.2.4'
+            ctest_dir = os.path.join(self.tmpdir, 'build2')
+            write_file(os.path.join(ctest_dir, 'Testing', 'Temporary', 'CTestCostData.txt'), 'test_new 1 1.0\n')
+            cmake_eb.restore_ctest_cost_data(ctest_dir=ctest_dir)
+            restored_dir = os.path.join(ctest_dir, 'Testing', 'Temporary')
+            self.assertEqual(read_file(os.path.join(restored_dir, 'CTestCostData.txt')), 'test_new 1 1.0\n')
+            self.assertEqual(read_file(os.path.join(restored_dir, 'LastTestsFailed.log')), '3:test_broken\n')
+
+            # stale list of failed tests is removed when no tests failed
+            remove_file(os.path.join(restored_dir, 'LastTestsFailed.log'))
+            cmake_eb.save_ctest_cost_data(ctest_dir=ctest_dir)
+            self.assertEqual(os.listdir(saved_dir), ['CTestCostData.txt'])
+            self.assertEqual(read_file(os.path.join(saved_dir, 'CTestCostData.txt')), 'test_new 1 1.0\n')
+
+            # nothing is restored for another version series
+            cmake_eb.cfg['version'] = '1.3.0'
+            ctest_dir = os.path.join(self.tmpdir, 'build3')
+            cmake_eb.restore_ctest_cost_data(ctest_dir=ctest_dir)
+            self.assertFalse(os.path.exists(ctest_dir))
+        finally:
+            remove_dir(os.path.dirname(saved_dir))
+
+    def test_conda_explicit_lockfile(self):
+        """Test handling of explicit lockfiles in Conda easyblock."""
+        url_stub = 'https://conda.anaconda.org/conda-forge/linux-64/'
+        txt = '\n'.join([
+            "# This file may be used to create an environment using:",
+            "# $ conda create --name <env> --file <this file>",
+            "# platform: linux-64",
+            "@EXPLICIT",
+            url_stub + "zlib-1.3.1-hb9d3cd8_2.conda#c9f075ab2f33b3bbee9e62d4ad0a6cd8",
+            url_stub + "python-3.12.8-h9e4cc4f_1_cpython.conda",
+            "",
+        ])
+        urls = conda.read_explicit_lockfile(txt)
+        self.assertEqual(urls, [url_stub + "zlib-1.3.1-hb9d3cd8_2.conda#c9f075ab2f33b3bbee9e62d4ad0a6cd8",
+                                url_stub + "python-3.12.8-h9e4cc4f_1_cpython.conda"])
+
+        self.assertErrorRegex(EasyBuildError, "No packages found", conda.read_explicit_lockfile, "@EXPLICIT\n")
+
+        # package cache can only be used as local channel if all packages are available
+        pkgs_dir = os.path.join(self.tmpdir, 'pkgs')
+        write_file(os.path.join(pkgs_dir, 'zlib-1.3.1-hb9d3cd8_2.conda'), 'zlib')
+        self.assertEqual(conda.localize_explicit_lockfile(urls, pkgs_dir), None)
+
+        write_file(os.path.join(pkgs_dir, 'python-3.12.8-h9e4cc4f_1_cpython.conda'), 'python')
+        expected = [
+            'file://' + os.path.join(pkgs_dir, 'zlib-1.3.1-hb9d3cd8_2.conda') + '#c9f075ab2f33b3bbee9e62d4ad0a6cd8',
+            'file://' + os.path.join(pkgs_dir, 'python-3.12.8-h9e4cc4f_1_cpython.conda'),
+        ]
+        self.assertEqual(conda.localize_explicit_lockfile(urls, pkgs_dir), expected)
+
+        # packages installed with pip are not included in explicit lockfile
+        conda_list = [
+            {'name': 'zlib', 'version': '1.3.1', 'channel': 'conda-forge', 'platform': 'linux-64'},
+            {'name': 'example', 'version': '1.2.3', 'channel': 'pypi', 'platform': 'pypi'},
+        ]
+        self.assertEqual(conda.det_pip_packages(json.dumps(conda_list)), ['example==1.2.3'])
+        self.assertEqual(conda.det_pip_packages(json.dumps(conda_list[:1])), [])
+        self.assertErrorRegex(EasyBuildError, "Failed to parse", conda.det_pip_packages, "not JSON")
+
+    def test_conda_cached_lockfile(self):
+        """Test caching of lockfiles for conda environments in persistent conda package cache."""
+        url_stub = 'https://conda.anaconda.org/conda-forge/linux-64/'
+        cmd_log = os.path.join(self.tmpdir, 'conda_cmds.log')
+        conda_list = os.path.join(self.tmpdir, 'conda_list.json')
+        write_file(conda_list, '[]')
+
+        # fake 'conda' command that logs how it was run
+        bin_dir = os.path.join(self.tmpdir, 'bin')
+        write_file(os.path.join(bin_dir, 'conda'), '\n'.join([
+            '#!/bin/bash',
+            'echo "$@" >> %s' % cmd_log,
+            'case "$*" in',
+            '    --version) echo "conda 24.5.0";;',
+            '    "list --explicit"*) echo "@EXPLICIT"; echo "%szlib-1.3.1-hb9d3cd8_2.conda";;' % url_stub,
+            '    "list --json"*) cat %s;;' % conda_list,
+            'esac',
+        ]))
+        adjust_permissions(os.path.join(bin_dir, 'conda'), stat.S_IXUSR)
+        os.environ['PATH'] = bin_dir + os.pathsep + os.environ['PATH']
+        os.environ['EBROOTMINICONDA3'] = self.tmpdir
+        pkgs_dir = os.path.join(self.tmpdir, 'pkgs')
+        os.environ['EB_CONDA_PKGS_DIR'] = pkgs_dir
+
+        class FakeConda(conda.Conda):
+            name = 'example'
+            version = '1.0'
+
+        conda_eb = object.__new__(FakeConda)
+        conda_eb.log = fancylogger.getLogger('test_conda_cached_lockfile')
+        conda_eb.builddir = self.tmpdir
+        conda_eb.installdir = os.path.join(self.tmpdir, 'install')
+        conda_eb.cfg = {'preinstallopts': '', 'requirements': 'zlib', 'channels': None, 'environment_file': None,
+                        'remote_environment': None, 'conda_lockfile': None, 'use_cached_lockfile': True}
+
+        def install():
+            remove_file(cmd_log)
+            conda_eb.install_step()
+            return [line for line in read_file(cmd_log).splitlines() if line.startswith('create')]
+
+        orig_build_options = {key: build_option(key) for key in ('force', 'rebuild')}
+        try:
+            for key in orig_build_options:
+                update_build_option(key, False)
+
+            cached_lockfile = os.path.join(pkgs_dir, conda.CONDA_LOCKFILES_SUBDIR, conda_eb.det_lockfile_name())
+            self.assertEqual(install(), ['create --yes -y -p %s -y zlib' % conda_eb.installdir])
+            self.assertExists(cached_lockfile)
+
+            # environment is created from cached lockfile, unless this is disabled or when rebuilding
+            self.assertEqual(install(), ['create --yes -y -p %s --file %s' % (conda_eb.installdir, cached_lockfile)])
+            conda_eb.cfg['use_cached_lockfile'] = False
+            self.assertEqual(install(), ['create --yes -y -p %s -y zlib' % conda_eb.installdir])
+            conda_eb.cfg['use_cached_lockfile'] = True
+            update_build_option('rebuild', True)
+            self.assertEqual(install(), ['create --yes -y -p %s -y zlib' % conda_eb.installdir])
+            update_build_option('rebuild', False)
+
+            # lockfile is not cached for environment that includes packages installed with pip
+            write_file(conda_list, json.dumps([{'name': 'example', 'version': '1.2.3', 'channel': 'pypi'}]))
+            install()
+            self.assertNotExists(cached_lockfile)
+            self.assertEqual(install(), ['create --yes -y -p %s -y zlib' % conda_eb.installdir])
+            self.assertExists(os.path.join(conda_eb.installdir, 'easybuild', conda.CONDA_LOCKFILE_NAME))
+        finally:
+            for key, value in orig_build_options.items():
+                update_build_option(key, value)
+
     def test_det_installed_python_packages(self):
         """
         Test det_installed_python_packages function providyed by PythonPackage easyblock
@@ -327,6 +1481,315 @@ class EasyBlockSpecificTest(TestCase):
         res = pythonpackage.det_py_install_scheme()
         self.assertTrue(isinstance(res, str))
 
+    def test_python_pgo_profile(self):
+        """Test caching and reusing PGO profile in Python easyblock."""
+        # make sure that constants for compiler families are defined
+        search_toolchain('GCC')
+
+        start_dir = os.path.join(self.tmpdir, 'Python-3.12.3')
+        # fake Makefile that mimics how CPython runs training workload for PGO
+        makefile = '\n'.join([
+            'all: profile-run-stamp',
+            '\techo built > python',
+            'profile-run-stamp:',
+            '\tprintenv PROFILE_TASK > training.txt',
+            '\tmkdir -p Modules && echo profile > Modules/foo.gcda && echo object > Modules/foo.o',
+            '\ttouch profile-run-stamp',
+            '',
+        ])
+        write_file(os.path.join(start_dir, 'Makefile'), makefile)
+
+        class FakeConfig(dict):
+            def update(self, key, value):
+                self[key] += ' ' + value
+
+        class FakeToolchain:
+            comp_fam = 'GCC'
+
+            def comp_family(self):
+                return self.comp_fam
+
+        class FakePython(python.EB_Python):
+            version = '3.12.3'
+            parallel_flag = ''
+            toolchain = FakeToolchain()
+
+        py_eb = object.__new__(FakePython)
+        py_eb.log = fancylogger.getLogger('test_python_pgo_profile')
+        py_eb.installdir = os.path.join(self.tmpdir, 'install')
+        py_eb.cfg = FakeConfig(configopts='--enable-optimizations', buildopts='', preconfigopts='', prebuildopts='',
+                               pgo_profile_task="-c \"print('hello')\"", reuse_pgo_profile=False,
+                               start_dir=start_dir, ulimit_unlimited=False)
+        # make sure that cache directory is unique to this test run
+        src_path = os.path.join(self.tmpdir, 'Python-3.12.3.tgz')
+        write_file(src_path, self.tmpdir)
+        py_eb.src = [{'name': 'Python-3.12.3.tgz', 'path': src_path}]
+        py_eb.patches = []
+
+        self.assertEqual(py_eb.det_pgo_profile_cache_dir(), None)
+        py_eb.cfg['reuse_pgo_profile'] = True
+        cache_dir = py_eb.det_pgo_profile_cache_dir()
+        self.assertTrue(os.path.basename(cache_dir).startswith('3.12.3-'))
+        self.assertEqual(py_eb.det_pgo_profile_cache_dir(), cache_dir)
+        os.environ['CFLAGS'] = '-O3'
+        self.assertNotEqual(py_eb.det_pgo_profile_cache_dir(), cache_dir)
+        del os.environ['CFLAGS']
+
+        # only supported when building with GCC, and when Makefile has target for profile-run-stamp
+        FakeToolchain.comp_fam = 'Clang'
+        self.assertEqual(py_eb.det_pgo_profile_cache_dir(), None)
+        FakeToolchain.comp_fam = 'GCC'
+        write_file(os.path.join(start_dir, 'Makefile'), 'all:\n')
+        self.assertEqual(py_eb.det_pgo_profile_cache_dir(), None)
+        write_file(os.path.join(start_dir, 'Makefile'), makefile)
+
+        cwd = os.getcwd()
+        try:
+            change_dir(start_dir)
+            py_eb.build_step()
+            # custom training workload is passed down correctly, and is taken into account to determine cache dir
+            self.assertNotEqual(py_eb.det_pgo_profile_cache_dir(), cache_dir)
+            cache_dir = py_eb.det_pgo_profile_cache_dir()
+            self.assertEqual(read_file(os.path.join(start_dir, 'training.txt')), "-c \"print('hello')\"\n")
+            # only *.gcda files are cached
+            self.assertEqual(os.listdir(os.path.join(cache_dir, 'Modules')), ['foo.gcda'])
+
+            # cached profile is reused, so training workload is not run again
+            for path in ('training.txt', 'profile-run-stamp', 'python', 'Modules'):
+                remove(os.path.join(start_dir, path))
+            py_eb.cfg['buildopts'] = ''
+            py_eb.build_step()
+            self.assertNotExists(os.path.join(start_dir, 'training.txt'))
+            self.assertEqual(read_file(os.path.join(start_dir, 'Modules', 'foo.gcda')), 'profile\n')
+            self.assertExists(os.path.join(start_dir, 'python'))
+        finally:
+            change_dir(cwd)
+            remove_dir(cache_dir)
+
+    def test_profile_section(self):
+        """Test profile_section function"""
+        class FakeEasyBlock:
+            name = 'foo'
+            version = '1.2.3'
+            log = fancylogger.getLogger('test_profile_section')
+            logfile = os.path.join(self.tmpdir, 'easybuild-foo-1.2.3-20260101.000000.log')
+
+        eb = FakeEasyBlock()
+        with profiling.profile_section(eb, 'stage', 'stage 1', extra='info'):
+            run_shell_cmd("sleep 0.1 && echo profiled", hidden=True)
+        with profiling.profile_section(eb, 'component', 'bar build'):
+            pass
+
+        trace_path = os.path.join(self.tmpdir, 'easybuild-foo-1.2.3-20260101.000000-trace.json')
+        self.assertEqual(profiling.get_profile_trace_path(eb), trace_path)
+        self.assertTrue(os.path.exists(trace_path))
+
+        trace = json.loads(read_file(trace_path))
+        self.assertEqual(trace['otherData'], {'name': 'foo', 'version': '1.2.3'})
+        events = trace['traceEvents']
+        self.assertEqual([(e['cat'], e['name'], e['ph']) for e in events],
+                         [('stage', 'stage 1', 'X'), ('component', 'bar build', 'X')])
+        self.assertTrue(events[0]['dur'] >= 100000)
+        self.assertTrue(events[0]['args']['wall_time'] >= 0.1)
+        self.assertEqual(events[0]['args']['extra'], 'info')
+        for key in ('cpu_time', 'max_rss_increase', 'process_max_rss', 'read_bytes', 'write_bytes'):
+            self.assertIn(key, events[1]['args'])
+        self.assertTrue(events[1]['args']['process_max_rss'] > 0)
+
+        # trace file is only written when outermost section ends
+        remove_file(trace_path)
+        with profiling.profile_section(eb, 'step', 'build'):
+            with profiling.profile_section(eb, 'stage', 'stage 2'):
+                pass
+            self.assertFalse(os.path.exists(trace_path))
+        self.assertEqual(len(json.loads(read_file(trace_path))['traceEvents']), 4)
+
+        # no build log => no trace file
+        eb.logfile = None
+        self.assertEqual(profiling.get_profile_trace_path(eb), None)
+        with profiling.profile_section(eb, 'stage', 'stage 3'):
+            pass
+        self.assertEqual(len(eb.profile_events), 5)
+
+        # sections of e.g. bundle components are recorded in profile of parent easyblock
+        comp = FakeEasyBlock()
+        comp.profile_parent = eb
+        with profiling.profile_section(comp, 'step', 'install'):
+            pass
+        self.assertEqual(len(eb.profile_events), 6)
+        self.assertEqual((eb.profile_events[-1]['cat'], eb.profile_events[-1]['name']), ('step', 'install'))
+        self.assertFalse(hasattr(comp, 'profile_events'))
+
+        # steps of bundles are profiled
+        bundle_eb = object.__new__(bundle.Bundle)
+        bundle_eb.log, bundle_eb.logfile = eb.log, None
+        orig_run_step = EasyBlock.run_step
+        try:
+            EasyBlock.run_step = lambda self, step, step_methods: [method(self)() for method in step_methods]
+            bundle_eb.run_step('build', [lambda x: x.build_step])
+        finally:
+            EasyBlock.run_step = orig_run_step
+        self.assertEqual([(e['cat'], e['name']) for e in bundle_eb.profile_events], [('step', 'build')])
+
+    def test_bundle_env_changes(self):
+        """Test det_env_changes and apply_env_changes functions from Bundle easyblock"""
+        os.environ['TEST_PATH'] = '/base/bin'
+        os.environ['TEST_FLAGS'] = '-O2'
+        os.environ['TEST_UNSET'] = 'yes'
+        os.environ.pop('TEST_NEW', None)
+        env_before = dict(os.environ)
+
+        # changes made while installing two components concurrently (starting from same environment)
+        changes_foo = bundle.det_env_changes(env_before, dict(env_before, TEST_PATH='/foo/bin:/base/bin',
+                                                              TEST_FLAGS='-O2 -g', TEST_NEW='foo'))
+        self.assertEqual(changes_foo, {'TEST_PATH': '/foo/bin:/base/bin', 'TEST_FLAGS': '-O2 -g', 'TEST_NEW': 'foo'})
+        env_after_bar = dict(env_before, TEST_PATH='/bar/bin:/base/bin')
+        del env_after_bar['TEST_UNSET']
+        changes_bar = bundle.det_env_changes(env_before, env_after_bar)
+        self.assertEqual(changes_bar, {'TEST_PATH': '/bar/bin:/base/bin', 'TEST_UNSET': None})
+
+        bundle.apply_env_changes(env_before, changes_foo)
+        bundle.apply_env_changes(env_before, changes_bar)
+        # entries added to path-like variables are merged, other variables are set/unset
+        self.assertEqual(os.getenv('TEST_PATH'), '/bar/bin:/foo/bin:/base/bin')
+        self.assertEqual(os.getenv('TEST_FLAGS'), '-O2 -g')
+        self.assertEqual(os.getenv('TEST_NEW'), 'foo')
+        self.assertEqual(os.getenv('TEST_UNSET'), None)
+
+        # if entries are removed, the new value is used as is
+        bundle.apply_env_changes(env_before, {'TEST_PATH': '/other/bin'})
+        self.assertEqual(os.getenv('TEST_PATH'), '/other/bin')
+
+    def test_bundle_concurrent_components(self):
+        """Test installing independent components of bundle concurrently"""
+        test_ec_path = os.path.join(self.tmpdir, 'test.eb')
+        test_ec_txt = '\n'.join([
+            "easyblock = 'Bundle'",
+            "name = 'test-bundle'",
+            "version = '1.0'",
+            "homepage = 'https://example.com'",
+            "description = 'just a test'",
+            "toolchain = SYSTEM",
+            "default_easyblock = 'Binary'",
+            "default_component_specs = {'sources': [SOURCE_TAR_GZ]}",
+            "components = [",
+            "    ('foo', '1.2'),",
+            "    ('bar', '3.4'),",
+            "    ('baz', '5.6'),",
+            "]",
+            "component_deps = {'baz': ['foo', 'bar']}",
+        ])
+        write_file(test_ec_path, test_ec_txt)
+
+        def get_bundle(component_deps=None, parallel=2):
+            """Get Bundle easyblock instance, with fake install step for components."""
+            ec = process_easyconfig(test_ec_path)[0]
+            if component_deps is not None:
+                ec['ec']['component_deps'] = component_deps
+            bundle_eb = get_easyblock_instance(ec)
+            bundle_eb.silent = True
+            bundle_eb.cfg.parallel = parallel
+            bundle_eb.installdir = os.path.join(self.tmpdir, 'install')
+            bundle_eb.src = []
+            for _, comp in bundle_eb.comp_instances:
+                src_fn = '%s-%s.tar.gz' % (comp.name, comp.version)
+                bundle_eb.src.append({'name': src_fn, 'path': os.path.join(self.tmpdir, src_fn)})
+                comp.builddir = self.tmpdir
+                comp.install_step = fake_install_step(comp)
+            return bundle_eb
+
+        def fake_install_step(comp):
+            """Create fake install step for specified component."""
+            def install_step():
+                start = time.time()
+                time.sleep(1)
+                if os.getenv('TEST_FAIL_%s' % comp.name.upper()):
+                    raise EasyBuildError("Failed to install %s", comp.name)
+                env.setvar('PATH', os.pathsep.join(['/%s/bin' % comp.name, os.getenv('PATH')]))
+                env.setvar('TEST_%s' % comp.name.upper(), 'installed')
+                comp.log.info("Installed component %s", comp.name)
+                comp.installed = (os.getpid(), start, time.time(), comp.cfg.parallel)
+            return install_step
+
+        cwd = os.getcwd()
+
+        def install(bundle_eb):
+            """Install components of specified bundle."""
+            self.mock_stdout(True)
+            try:
+                bundle_eb.install_step()
+            finally:
+                self.mock_stdout(False)
+                change_dir(cwd)
+
+        pid = os.getpid()
+        bundle_eb = get_bundle()
+        self.assertEqual(bundle_eb.det_component_install_order(), [[0, 1], [2]])
+        install(bundle_eb)
+
+        foo, bar, baz = [comp for _, comp in bundle_eb.comp_instances]
+        # foo and bar are installed concurrently in separate processes, baz is installed after that in main process
+        self.assertNotEqual(foo.installed[0], pid)
+        self.assertNotEqual(bar.installed[0], pid)
+        self.assertNotEqual(foo.installed[0], bar.installed[0])
+        self.assertTrue(foo.installed[1] < bar.installed[2] and bar.installed[1] < foo.installed[2])
+        self.assertEqual(baz.installed[0], pid)
+        self.assertTrue(baz.installed[1] >= max(foo.installed[2], bar.installed[2]))
+        # changes to environment are passed back to main process
+        self.assertEqual([os.getenv('TEST_%s' % x) for x in ('FOO', 'BAR', 'BAZ')], ['installed'] * 3)
+        paths = os.getenv('PATH').split(os.pathsep)
+        self.assertEqual(paths[0], '/baz/bin')
+        self.assertEqual(sorted(paths[1:3]), ['/bar/bin', '/foo/bin'])
+        # available cores are shared across components that are installed concurrently
+        self.assertEqual([foo.installed[3], bar.installed[3]], [1, 1])
+
+        # at most as many components as there are cores available are installed at the same time,
+        # log of each subprocess is merged into main log, and only main process writes profile trace
+        bundle_eb = get_bundle(parallel=1)
+        logfile = os.path.join(self.tmpdir, 'test.log')
+        bundle_eb.logfile = logfile
+        fancylogger.logToFile(logfile)
+        try:
+            install(bundle_eb)
+        finally:
+            fancylogger.logToFile(logfile, enable=False)
+        foo, bar, _ = [comp for _, comp in bundle_eb.comp_instances]
+        self.assertNotEqual(foo.installed[0], bar.installed[0])
+        self.assertTrue(foo.installed[2] <= bar.installed[1])
+        self.assertEqual([foo.installed[3], bar.installed[3]], [1, 1])
+        log_txt = read_file(logfile)
+        for name, version in (('foo', '1.2'), ('bar', '3.4')):
+            regex = re.compile(r"Log for installation of component %s v%s \(in separate process\):\n"
+                               r"(.*\n)*.*Installed component %s" % (name, version, name))
+            self.assertTrue(regex.search(log_txt), "Pattern '%s' found in: %s" % (regex.pattern, log_txt))
+        self.assertEqual(len(re.findall("Installed component foo", log_txt)), 1)
+        trace = json.loads(read_file(os.path.join(self.tmpdir, 'test-trace.json')))
+        self.assertEqual(sorted(set(ev['name'].split(' ')[0] for ev in trace['traceEvents'])), ['bar', 'baz', 'foo'])
+        remove_file(logfile)
+
+        # errors for components that are installed concurrently are collected
+        os.environ['TEST_FAIL_FOO'] = '1'
+        os.environ['TEST_FAIL_BAR'] = '1'
+        bundle_eb = get_bundle()
+        logfile = os.path.join(self.tmpdir, 'test.log')
+        fancylogger.logToFile(logfile)
+        try:
+            error_pattern = "Installation of 2 bundle component\\(s\\) failed:\n"
+            error_pattern += "foo v1.2: Failed to install foo\nbar v3.4: Failed to install bar"
+            self.assertErrorRegex(EasyBuildError, error_pattern, install, bundle_eb)
+        finally:
+            fancylogger.logToFile(logfile, enable=False)
+        # traceback for failed installation is logged
+        self.assertIn("Installation of component foo v1.2 failed:\nTraceback", read_file(logfile))
+        self.assertEqual(os.getenv('TEST_BAZ'), 'installed')
+
+        # component dependencies are validated
+        error_pattern = "Unknown component\\(s\\) specified in 'component_deps': qux"
+        self.assertErrorRegex(EasyBuildError, error_pattern, get_bundle({'baz': ['qux']}).det_component_install_order)
+        error_pattern = "Circular dependencies found between bar, foo"
+        self.assertErrorRegex(EasyBuildError, error_pattern,
+                              get_bundle({'foo': ['bar'], 'bar': ['foo']}).det_component_install_order)
+
     def test_cargo_get_workspace_members(self):
         """Test get_workspace_members in the Cargo easyblock"""
         # Simple crate
@@ -718,6 +2181,21 @@ class EasyBlockSpecificTest(TestCase):
             self.assertEqual((name, suite.summary), (name, results2[name].summary))
         del results2
 
+        # results of multiple folders (e.g. for test shards) are merged
+        results_shards = pytorch.get_test_results([test_log_dir / 'test-reports', test_log_dir])
+        self.assertEqual(results.keys(), results_shards.keys())
+        for name, suite in results.items():
+            self.assertEqual((name, suite.summary), (name, results_shards[name].summary))
+        del results_shards
+
+        # parsed test result files are cached, but new TestSuite instances are always returned
+        xml_file = sorted((test_log_dir / 'test-reports').rglob('*.xml'))[0]
+        suites = pytorch.parse_test_result_file(xml_file)
+        suites2 = pytorch.parse_test_result_file(xml_file)
+        self.assertTrue(suites)
+        self.assertEqual([(x.name, x.summary) for x in suites], [(x.name, x.summary) for x in suites2])
+        self.assertFalse(any(x is y or x.test_cases is y.test_cases for x, y in zip(suites, suites2)))
+
         self.assertEqual(len(results), 15)
 
         # 2 small test suites used as a smoke test using a most features
@@ -865,6 +2343,98 @@ class EasyBlockSpecificTest(TestCase):
         self.assertErrorRegex(ValueError, "Duplicate test",
                               pytorch.get_test_results, error_log_dir / 'duplicate')
 
+    def test_rubygem_parse_gem_runtime_deps(self):
+        """Test parse_gem_runtime_deps function from RubyGem easyblock"""
+        metadata = textwrap.dedent("""
+            --- !ruby/object:Gem::Specification
+            name: example
+            version: !ruby/object:Gem::Version
+              version: 1.2.3
+            dependencies:
+            - !ruby/object:Gem::Dependency
+              name: ffi
+              requirement: !ruby/object:Gem::Requirement
+                requirements:
+                - - "~>"
+                  - !ruby/object:Gem::Version
+                    version: '1.0'
+              type: :runtime
+              prerelease: false
+            - !ruby/object:Gem::Dependency
+              name: rake
+              requirement: !ruby/object:Gem::Requirement
+                requirements:
+                - - ">="
+                  - !ruby/object:Gem::Version
+                    version: '0'
+              type: :development
+              prerelease: false
+            - !ruby/object:Gem::Dependency
+              name: "rb-inotify"
+              type: :runtime
+            description: example gem
+            files: []
+        """)
+        self.assertEqual(rubygem.parse_gem_runtime_deps(metadata), ['ffi', 'rb-inotify'])
+        self.assertEqual(rubygem.parse_gem_runtime_deps("name: example\ndependencies: []\n"), [])
+
+    def test_rubygem_prepare_gem_install(self):
+        """Test composing 'gem install' command in RubyGem easyblock"""
+
+        class FakeConfig(dict):
+            parallel = 8
+
+        gem = object.__new__(rubygem.RubyGem)
+        gem.cfg = FakeConfig(preinstallopts='export FOO=bar && ')
+        gem.is_extension = False
+        gem.installdir = self.tmpdir
+        gem.ext_src = 'example-1.2.3.gem'
+
+        os.environ['EBROOTRUBY'] = self.tmpdir
+        os.environ.pop('MAKEFLAGS', None)
+        cmd = gem.prepare_gem_install()
+        self.assertTrue(cmd.startswith('export FOO=bar &&  MAKEFLAGS=-j8 gem install --bindir '), cmd)
+        self.assertEqual(gem.prepare_gem_install(concurrent=3).split('&&')[1].split()[0], 'MAKEFLAGS=-j2')
+        self.assertNotIn('MAKEFLAGS', gem.prepare_gem_install(concurrent=8))
+        # $MAKEFLAGS is not set in environment of EasyBuild itself
+        self.assertNotIn('MAKEFLAGS', os.environ)
+
+        os.environ['MAKEFLAGS'] = '-j1'
+        self.assertNotIn('MAKEFLAGS', gem.prepare_gem_install())
+
+    def test_wrf_build_and_run_testcase(self):
+        """Test build_and_run_testcase method of WRF easyblock"""
+        src_dir = os.path.join(self.tmpdir, 'WRF')
+        compile_script = os.path.join(src_dir, 'compile')
+        write_file(compile_script, "#!/bin/bash\necho 'compiling $2'\necho 'fatal error: netcdf.inc not found'\nexit 1")
+        adjust_permissions(compile_script, stat.S_IXUSR)
+
+        class FakeWRF(wrf.EB_WRF):
+            def run_testcase(self, test, run_dir, test_cmd, clean_up=False):
+                self.runs.append((test, sorted(os.listdir(run_dir))))
+                return None
+
+        wrf_eb = object.__new__(FakeWRF)
+        wrf_eb.log = fancylogger.getLogger('test_wrf_build_and_run_testcase')
+        wrf_eb.runs = []
+
+        res = wrf_eb.build_and_run_testcase('em_b_wave', src_dir, './wrf.exe', '-j 2')
+        regex = re.compile(r"Building test em_b_wave failed with exit code 1, .*\n.*\nfatal error: netcdf.inc", re.M)
+        self.assertTrue(regex.search(res['error']), res['error'])
+        self.assertEqual(wrf_eb.runs, [])
+
+        # subtests of em_fire are run one by one
+        write_file(compile_script, "#!/bin/bash\necho 'compiling $2'")
+        for subtest in ('hill2d_grass', 'two_fires'):
+            write_file(os.path.join(src_dir, 'test', 'em_fire', subtest, 'namelist.input'), subtest)
+        write_file(os.path.join(src_dir, 'test', 'em_fire', 'README'), '')
+        mkdir(os.path.join(src_dir, 'run'))
+
+        res = wrf_eb.build_and_run_testcase('em_fire', src_dir, './wrf.exe', '-j 2')
+        self.assertEqual(res['error'], None)
+        self.assertEqual(len(wrf_eb.runs), 2)
+        self.assertEqual(wrf_eb.runs[0], ('em_fire', ['namelist.input']))
+
 
 def suite(loader):
     """Return all easyblock-specific tests."""
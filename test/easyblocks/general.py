@@ -27,14 +27,21 @@ General unit tests for the easybuild-easyblocks repo.
 
 @author: Kenneth Hoste (Ghent University)
 """
+import json
 import os
+import re
 import shutil
 import sys
 import tempfile
 from unittest import TestLoader, TextTestRunner
 
 from easybuild.base.testing import TestCase
+import easybuild.easyblocks.easyblocks_index as easyblocks_index
 from easybuild.easyblocks import VERSION
+from easybuild.easyblocks.easyblocks_index import EASYBLOCKS_INDEX_FILENAME, build_easyblocks_index
+from easybuild.easyblocks.easyblocks_index import get_easyblock_class_from_index, get_easyblock_classes_for_path
+from easybuild.easyblocks.easyblocks_index import get_easyblock_info, get_easyblocks_index
+from easybuild.easyblocks.easyblocks_index import is_valid_easyblocks_index, write_easyblocks_index
 from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.run import run_shell_cmd
 
@@ -180,6 +187,152 @@ class GeneralEasyblockTest(TestCase):
         # importing EB_R class from easybuild.easyblocks.r still works fine
         run_shell_cmd("python -c 'from easybuild.easyblocks.r import EB_R'", hidden=True)
 
+    def test_import_easyblocks_package(self):
+        """Test importing of easybuild.easyblocks package: should be fast, and not run any commands."""
+        easyblocks_path = up(os.path.abspath(__file__), 3)
+        import easybuild.framework
+        framework_path = up(easybuild.framework.__file__, 3)
+        pythonpath = os.pathsep.join([easyblocks_path, framework_path, os.environ.get('PYTHONPATH', '')])
+
+        # this test should be run out of the easyblocks repository,
+        # to avoid that the working directory that is prepended to the Python search path affects the test results
+        os.chdir(self.tmpdir)
+
+        script = '\n'.join([
+            "import sys, time",
+            "start = time.time()",
+            "import easybuild.easyblocks",
+            "print('import time: %.6f' % (time.time() - start))",
+            "print('git imported: %s' % ('git' in sys.modules))",
+            "print('lazy verbose version: %s' % ('VERBOSE_VERSION' not in vars(easybuild.easyblocks)))",
+            "print('verbose version: %s' % easybuild.easyblocks.VERBOSE_VERSION)",
+            "import easybuild.easyblocks.gcc",
+        ])
+        cmd = "PYTHONPATH=%s %s -c \"%s\"" % (pythonpath, sys.executable, script)
+
+        # run multiple times, only retain fastest import time to limit impact of noise
+        import_times = []
+        for _ in range(3):
+            res = run_shell_cmd(cmd, hidden=True)
+            import_times.append(float(re.search('^import time: ([0-9.]+)$', res.output, re.M).group(1)))
+
+        self.assertIn('git imported: False', res.output)
+        if sys.version_info >= (3, 7):
+            self.assertIn('lazy verbose version: True', res.output)
+        regex = re.compile('^verbose version: %s(-r[0-9a-f]{40})?$' % re.escape(VERSION), re.M)
+        self.assertTrue(regex.search(res.output), "Pattern '%s' found in: %s" % (regex.pattern, res.output))
+
+        # regression guard: importing easybuild.easyblocks package should take (a lot) less than a second
+        self.assertTrue(min(import_times) < 1, "Importing easybuild.easyblocks is fast: %s" % import_times)
+
+    def test_easyblocks_index(self):
+        """Test index of easyblock classes."""
+        easyblocks_dir = os.path.join(self.tmpdir, 'easybuild', 'easyblocks')
+        for subdir in ('f', 'generic'):
+            os.makedirs(os.path.join(easyblocks_dir, subdir))
+
+        def write_easyblock(rel_path, txt):
+            """Write easyblock module with specified contents."""
+            with open(os.path.join(easyblocks_dir, rel_path), 'w') as handle:
+                handle.write(txt)
+
+        write_easyblock(os.path.join('generic', 'toy.py'), '\n'.join([
+            "from easybuild.framework.easyblock import EasyBlock",
+            "from easybuild.framework.easyconfig import CUSTOM",
+            "class Toy(EasyBlock):",
+            "    @staticmethod",
+            "    def extra_options(extra_vars=None):",
+            "        extra_vars = EasyBlock.extra_options(extra_vars)",
+            "        extra_vars.update({'toy_opt': [None, 'toy option', CUSTOM]})",
+            "        extra_vars['toy_flag'] = [False, 'toy flag', CUSTOM]",
+            "        return extra_vars",
+        ]))
+        write_easyblock(os.path.join('f', 'foo.py'), '\n'.join([
+            "from easybuild.easyblocks.generic.toy import Toy",
+            "class EB_foo(Toy):",
+            "    pass",
+            "class FooHelper(object):",
+            "    pass",
+        ]))
+
+        index = build_easyblocks_index(easyblocks_dir)
+        self.assertEqual(sorted(index['files']), ['f/foo.py', 'generic/toy.py'])
+        self.assertEqual(list(index['classes']), ['EB_foo', 'FooHelper', 'Toy'])
+        self.assertEqual(index['classes']['EB_foo'], {
+            'module': 'easybuild.easyblocks.foo',
+            'path': 'f/foo.py',
+            'bases': ['Toy'],
+            'extra_options': [],
+        })
+        self.assertEqual(index['classes']['Toy'], {
+            'module': 'easybuild.easyblocks.generic.toy',
+            'path': 'generic/toy.py',
+            'bases': ['EasyBlock'],
+            'extra_options': ['toy_flag', 'toy_opt'],
+        })
+        self.assertTrue(is_valid_easyblocks_index(index, easyblocks_dir))
+
+        # index is not written when it's obtained, only when explicitly requested (at installation time)
+        index_path = os.path.join(easyblocks_dir, EASYBLOCKS_INDEX_FILENAME)
+        self.assertEqual(get_easyblocks_index(easyblocks_dir), index)
+        self.assertFalse(os.path.exists(index_path))
+        self.assertEqual(get_easyblock_info('Toy', easyblocks_dir=easyblocks_dir)['bases'], ['EasyBlock'])
+        self.assertEqual(get_easyblock_info('EB_bar', easyblocks_dir=easyblocks_dir), None)
+        foo_path = os.path.join(easyblocks_dir, 'f', 'foo.py')
+        self.assertEqual(get_easyblock_classes_for_path(foo_path, easyblocks_dir=easyblocks_dir),
+                         ['EB_foo', 'FooHelper'])
+
+        # index is validated against contents of easyblock modules, not their modification times,
+        # since those are not preserved by every installation method
+        self.assertEqual(write_easyblocks_index(easyblocks_dir), index_path)
+        foo_mtime = os.stat(foo_path).st_mtime
+        write_easyblock(os.path.join('f', 'foo.py'), "class EB_foo(object):\n    pass\n")
+        os.utime(foo_path, (foo_mtime, foo_mtime))
+        self.assertFalse(is_valid_easyblocks_index(index, easyblocks_dir))
+        os.utime(foo_path, (0, 0))
+        with open(os.path.join(easyblocks_dir, 'generic', 'toy.py'), 'a') as handle:
+            handle.write('')
+        self.assertTrue(is_valid_easyblocks_index(build_easyblocks_index(easyblocks_dir), easyblocks_dir))
+
+        # index is validated only once per process;
+        # stale index file is not used, index is rebuilt in memory (but index file is left untouched)
+        self.assertEqual(get_easyblock_info('EB_foo', easyblocks_dir=easyblocks_dir)['bases'], ['Toy'])
+        easyblocks_index._easyblocks_index.pop(easyblocks_dir)
+        with open(index_path) as handle:
+            index_txt = handle.read()
+        self.assertEqual(get_easyblock_info('EB_foo', easyblocks_dir=easyblocks_dir)['bases'], ['object'])
+        with open(index_path) as handle:
+            self.assertEqual(handle.read(), index_txt)
+
+        write_easyblock(os.path.join('f', 'bar.py'), "class EB_bar(object):\n    pass\n")
+        easyblocks_index._easyblocks_index.pop(easyblocks_dir)
+        self.assertEqual(get_easyblock_info('EB_bar', easyblocks_dir=easyblocks_dir)['path'], 'f/bar.py')
+        self.assertTrue(is_valid_easyblocks_index(get_easyblocks_index(easyblocks_dir), easyblocks_dir))
+
+        # valid index file is used as is
+        write_easyblocks_index(easyblocks_dir)
+        with open(index_path) as handle:
+            index = json.load(handle)
+        index['classes']['EB_bar']['bases'] = ['Foo']
+        with open(index_path, 'w') as handle:
+            json.dump(index, handle)
+        easyblocks_index._easyblocks_index.pop(easyblocks_dir)
+        self.assertEqual(get_easyblock_info('EB_bar', easyblocks_dir=easyblocks_dir)['bases'], ['Foo'])
+
+        # easyblock classes can be obtained via index, only importing the module that provides them
+        from easybuild.easyblocks.generic.configuremake import ConfigureMake
+        from easybuild.easyblocks.gcc import EB_GCC
+        self.assertTrue(get_easyblock_class_from_index('ConfigureMake') is ConfigureMake)
+        self.assertTrue(get_easyblock_class_from_index('EB_GCC') is EB_GCC)
+        self.assertEqual(get_easyblock_class_from_index('EB_no_such_software'), None)
+
+        # index is used to obtain easyblock class for components of a bundle
+        from easybuild.easyblocks.generic.bundle import get_component_easyblock_class
+        self.assertTrue(get_component_easyblock_class('ConfigureMake') is ConfigureMake)
+        self.assertTrue(get_component_easyblock_class(None, name='GCC') is EB_GCC)
+        self.assertEqual(get_component_easyblock_class(None, name='no_such_software',
+                                                       error_on_missing_easyblock=False), None)
+
 
 def suite(loader):
     """Return all general easybuild-easyblocks tests."""
@@ -29,6 +29,7 @@ Unit tests for initializing easyblocks.
 """
 
 import glob
+import importlib
 import os
 import re
 import sys
@@ -37,6 +38,7 @@ from unittest import TestCase, TestLoader, TextTestRunner
 
 import easybuild.tools.options as eboptions
 from easybuild.base import fancylogger
+from easybuild.easyblocks.easyblocks_index import get_easyblock_classes_for_path, get_easyblock_info
 from easybuild.framework.easyblock import EasyBlock
 from easybuild.framework.easyconfig import MANDATORY
 from easybuild.framework.easyconfig.easyconfig import EasyConfig, get_easyblock_class
@@ -119,8 +121,6 @@ def template_init_test(self, easyblock, name='foo', version='1.3.2', toolchain=N
 
             self.assertTrue(res.co_names, (key, ))
 
-    class_regex = re.compile(r"^class (.*)\(.*", re.M)
-
     self.log.debug("easyblock: %s" % easyblock)
 
     # read easyblock Python module
@@ -145,10 +145,11 @@ def template_init_test(self, easyblock, name='foo', version='1.3.2', toolchain=N
         regex = re.compile(r"\.prepare_step\(.*\*args,.*\*\*kwargs\.*\)")
         self.assertTrue(regex.search(txt), "Pattern '%s' found in %s" % (regex.pattern, easyblock))
 
-    # obtain easyblock class name using regex
-    res = class_regex.search(txt)
-    if res:
-        ebname = res.group(1)
+    # obtain easyblock class name from index of easyblock classes
+    easyblocks_dir = os.path.dirname(os.path.dirname(easyblock))
+    ebnames = get_easyblock_classes_for_path(easyblock, easyblocks_dir=easyblocks_dir)
+    if ebnames:
+        ebname = ebnames[0]
         self.log.debug("Found class name for easyblock %s: %s" % (easyblock, ebname))
 
         # figure out list of mandatory variables, and define with dummy values as necessary
@@ -156,6 +157,13 @@ def template_init_test(self, easyblock, name='foo', version='1.3.2', toolchain=N
         extra_options = app_class.extra_options()
         check_extra_options_format(extra_options)
 
+        # make sure index of easyblock classes is in sync with actual easyblock class
+        eb_info = get_easyblock_info(ebname, easyblocks_dir=easyblocks_dir)
+        self.assertTrue(getattr(importlib.import_module(eb_info['module']), ebname) is app_class)
+        self.assertEqual(eb_info['bases'], [base.__name__ for base in app_class.__bases__])
+        missing = [key for key in eb_info['extra_options'] if key not in extra_options]
+        self.assertEqual(missing, [], "Custom easyconfig parameters in index for %s are defined" % ebname)
+
         # extend easyconfig to make sure mandatory custom easyconfig parameters are defined
         extra_txt = ''
         for (key, val) in extra_options.items():
@@ -53,6 +53,7 @@ from easybuild.easyblocks.fftw import EB_FFTW
 from easybuild.easyblocks.fftwmpi import EB_FFTW_period_MPI
 from easybuild.easyblocks.imkl_fftw import EB_imkl_minus_FFTW
 from easybuild.easyblocks.openfoam import EB_OpenFOAM
+from easybuild.easyblocks.easyblocks_index import get_easyblock_classes_for_path
 from easybuild.framework.easyconfig import easyconfig
 from easybuild.framework.easyblock import EasyBlock
 from easybuild.framework.easyconfig import MANDATORY
@@ -255,19 +256,12 @@ def template_module_only_test(self, easyblock, name, version='1.3.2', extra_txt=
     if tmpdir is None:
         tmpdir = tempfile.mkdtemp()
 
-    class_regex = re.compile(r"^class (.*)\(.*", re.M)
-
     self.log.debug("easyblock: %s" % easyblock)
 
-    # read easyblock Python module
-    f = open(easyblock, "r")
-    txt = f.read()
-    f.close()
-
-    # obtain easyblock class name using regex
-    res = class_regex.search(txt)
-    if res:
-        ebname = res.group(1)
+    # obtain easyblock class name from index of easyblock classes, rather than parsing easyblock Python module
+    ebnames = get_easyblock_classes_for_path(easyblock, easyblocks_dir=os.path.dirname(os.path.dirname(easyblock)))
+    if ebnames:
+        ebname = ebnames[0]
         self.log.debug("Found class name for easyblock %s: %s" % (easyblock, ebname))
 
         toolchain = None